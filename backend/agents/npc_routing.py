@@ -0,0 +1,114 @@
+import hashlib
+import os
+import random
+import threading
+from .persona_data import STYLES
+
+# --- NPC Model Routing ---
+# Not every NPC reply needs the same model. The council planner's stance gates
+# check_victory, while a low-influence resident far from any stance boundary
+# in round one barely moves the outcome. Each NPC gets an importance score
+# from influence, stance volatility (closeness to a category boundary) and
+# round stakes, and is routed to a tier with its own model, token budget and
+# latency budget. A tier whose model is "template" is answered locally from
+# persona_data.STYLES without an LLM call; that is the minor tier's default,
+# which is where the savings are. Every LLM tier keeps the full JSON token
+# budget: a reply cut short fails to parse. Tiers in FALLBACK_TIERS answer from
+# the template when their call fails or its reply does not parse.
+
+TEMPLATE_MODEL = 'template'
+DECISIVE_ROLES = {'council_planner'}  # Council stance decides vetoes in check_victory
+MAX_INFLUENCE = 3
+JSON_REPLY_TOKENS = 250  # dialogue + thought_process + score_delta
+
+MODEL_TIERS = {
+    'decisive': {
+        'model': os.environ.get('LLM_MODEL_DECISIVE', 'gpt-4o-mini'),
+        'max_tokens': JSON_REPLY_TOKENS,
+        'timeout': float(os.environ.get('LLM_TIMEOUT_DECISIVE', 20.0))
+    },
+    'standard': {
+        'model': os.environ.get('LLM_MODEL_STANDARD', 'gpt-4o-mini'),
+        'max_tokens': JSON_REPLY_TOKENS,
+        'timeout': float(os.environ.get('LLM_TIMEOUT_STANDARD', 12.0))
+    },
+    'minor': {
+        'model': os.environ.get('LLM_MODEL_MINOR', TEMPLATE_MODEL),
+        'max_tokens': JSON_REPLY_TOKENS,
+        'timeout': float(os.environ.get('LLM_TIMEOUT_MINOR', 6.0))
+    }
+}
+FALLBACK_TIERS = {'standard', 'minor'}  # The decisive tier's errors stay visible
+DECISIVE_THRESHOLD = 0.75
+MINOR_THRESHOLD = 0.45
+
+ROUTING_STATS = {tier: {'calls': 0, 'seconds': 0.0, 'template_replies': 0, 'fallbacks': 0} for tier in MODEL_TIERS}
+_stats_lock = threading.Lock()
+
+
+def npc_importance(ai, current_round, max_rounds):
+    """0..1 score: 50% influence, 30% stance volatility, 20% round stakes."""
+    influence = min(1.0, ai.get('influence', 1) / MAX_INFLUENCE)
+    score = ai.get('stance_score', 50)
+    distance_to_boundary = min(abs(score - 39.5), abs(score - 60.5))  # Oppose <= 39, Support >= 61
+    volatility = max(0.0, 1.0 - distance_to_boundary / 20.0)
+    stakes = min(1.0, current_round / max_rounds) if max_rounds else 1.0
+    return 0.5 * influence + 0.3 * volatility + 0.2 * stakes
+
+
+def route_npc(ai, current_round, max_rounds):
+    """Returns the tier name for this NPC's reply."""
+    if ai.get('role_id') in DECISIVE_ROLES:
+        return 'decisive'
+    importance = npc_importance(ai, current_round, max_rounds)
+    if importance >= DECISIVE_THRESHOLD:
+        return 'decisive'
+    if importance < MINOR_THRESHOLD:
+        return 'minor'
+    return 'standard'
+
+
+def record_tier_call(tier, seconds, template=False, fallback=False):
+    with _stats_lock:
+        stats = ROUTING_STATS[tier]
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        if template:
+            stats['template_replies'] += 1
+        if fallback:
+            stats['fallbacks'] += 1
+
+
+def routing_report():
+    with _stats_lock:
+        return {
+            tier: {**stats, 'seconds': round(stats['seconds'], 3), 'model': MODEL_TIERS[tier]['model'],
+                   'avg_seconds': round(stats['seconds'] / stats['calls'], 3) if stats['calls'] else 0.0}
+            for tier, stats in ROUTING_STATS.items()
+        }
+
+
+def template_reply(ai, persona, player_statement):
+    """A local, deterministic reply in the NPC's speaking style (same JSON shape as the LLM prompt asks for)."""
+    seed = int(hashlib.sha256(f"{ai['id']}|{player_statement}".encode('utf-8')).hexdigest(), 16)
+    rng = random.Random(seed)
+    style = STYLES.get(persona['style'], {})
+    keywords = style.get('keywords') or ['this']
+
+    openers = {
+        'street': "Listen, mate,",
+        'corporate': "From our perspective,",
+        'academic': "If we consider the broader implications,",
+        'nimby': "With respect to the existing policy,",
+        'activist': "Let's be clear:"
+    }
+    opener = openers.get(persona['style'], "Well,")
+    dialogue = (
+        f"{opener} I hear what you're proposing, but it has to answer the {rng.choice(keywords)} question. "
+        f"My concern hasn't changed: {persona['pain_point']}"
+    )
+    return {
+        'thought_process': "Template reply.",
+        'dialogue': dialogue,
+        'score_delta': rng.choice([-2, -1, 0, 0, 1, 2])
+    }
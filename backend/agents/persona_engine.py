@@ -1,41 +1,52 @@
 import random
+from functools import lru_cache
 from .persona_data import ORIGINS, LIFE_STAGES, PAIN_POINTS, STYLES, QUIRKS, ROLE_MAPPING
 
-def generate_dna_persona(role_id, role_name):
+DEFAULT_MAPPING = {
+    "allowed_origins": ["local_deep", "local_recent", "outsider"],
+    "allowed_pains": ["precariat", "middle_class", "wealthy", "corporate"],
+    "allowed_styles": ["street", "corporate", "academic", "nimby", "activist"],
+    "default_flexibility": [3, 8]
+}
+
+
+def roll_persona_dna(role_id, rng=random):
     """
-    Synthesizes a unique character based on DNA factors tailored to the role.
+    Rolls the DNA factors for a role and returns them as a compact list of indices:
+    [origin_key, origin_idx, life_stage_idx, pain_key, pain_idx, style_key, quirk_idx, flexibility]
+    Use render_persona() to turn it into prompt text.
     """
     # 1. 获取该角色的约束条件 (Constraints)
-    mapping = ROLE_MAPPING.get(role_id, {
-        "allowed_origins": ["local_deep", "local_recent", "outsider"],
-        "allowed_pains": ["precariat", "middle_class", "wealthy", "corporate"],
-        "allowed_styles": ["street", "corporate", "academic", "nimby", "activist"],
-        "default_flexibility": [3, 8]
-    })
+    mapping = ROLE_MAPPING.get(role_id, DEFAULT_MAPPING)
 
     # 2. 抽取 DNA 因子 (Rolling the dice)
-    
-    # Factor A: Origin
-    origin_key = random.choice(mapping["allowed_origins"])
-    origin_story = random.choice(ORIGINS[origin_key])
+    origin_key = rng.choice(mapping["allowed_origins"])            # Factor A: Origin
+    origin_idx = rng.randrange(len(ORIGINS[origin_key]))
+    life_idx = rng.randrange(len(LIFE_STAGES))                     # Factor B: Life Stage
+    pain_key = rng.choice(mapping["allowed_pains"])                # Factor C: Pain Point (Deep Motivation)
+    pain_idx = rng.randrange(len(PAIN_POINTS[pain_key]))
+    style_key = rng.choice(mapping["allowed_styles"])              # Factor D: Style (Voice)
+    quirk_idx = rng.randrange(len(QUIRKS))                         # Factor E: Quirk
+    flex_range = mapping["default_flexibility"]                    # Factor F: Flexibility (Hidden Stat)
+    flexibility = rng.randint(flex_range[0], flex_range[1])
 
-    # Factor B: Life Stage
-    life_stage = random.choice(LIFE_STAGES)
+    return [origin_key, origin_idx, life_idx, pain_key, pain_idx, style_key, quirk_idx, flexibility]
 
-    # Factor C: Pain Point (Deep Motivation)
-    pain_key = random.choice(mapping["allowed_pains"])
-    pain_point = random.choice(PAIN_POINTS[pain_key])
 
-    # Factor D: Style (Voice)
-    style_key = random.choice(mapping["allowed_styles"])
-    style_data = STYLES[style_key]
+def render_persona(dna, role_name):
+    """Materializes the persona text for a compact DNA list (cached per DNA + name)."""
+    # A fresh dict per call: the cached one is shared by every game with this DNA and must not be edited
+    return dict(_render_persona(tuple(dna), role_name))
 
-    # Factor E: Quirk
-    quirk = random.choice(QUIRKS)
 
-    # Factor F: Flexibility (Hidden Stat)
-    flex_range = mapping["default_flexibility"]
-    flexibility = random.randint(flex_range[0], flex_range[1])
+@lru_cache(maxsize=1024)
+def _render_persona(dna, role_name):
+    origin_key, origin_idx, life_idx, pain_key, pain_idx, style_key, quirk_idx, flexibility = dna
+    origin_story = ORIGINS[origin_key][origin_idx]
+    life_stage = LIFE_STAGES[life_idx]
+    pain_point = PAIN_POINTS[pain_key][pain_idx]
+    style_data = STYLES[style_key]
+    quirk = QUIRKS[quirk_idx]
 
     # 3. 合成叙事文本 (Synthesize Narrative)
     # 这是一个“有理有据”的自我介绍，将所有因子串联起来
@@ -68,3 +79,23 @@ def generate_dna_persona(role_id, role_name):
         "pain_point": pain_point, # Added for LLM Prompt
         "quirk": quirk            # Added for LLM Prompt
     }
+
+
+def generate_dna_persona(role_id, role_name, rng=random):
+    """
+    Synthesizes a unique character based on DNA factors tailored to the role.
+    """
+    return render_persona(roll_persona_dna(role_id, rng), role_name)
+
+
+def persona_for(character, rng=random):
+    """
+    Returns the rendered persona for a character dict.
+    Characters store only 'persona_dna'; legacy characters may still carry a full 'persona'.
+    Legacy characters with neither get DNA rolled from rng: pass the game's seeded one so replays match.
+    """
+    if 'persona_dna' not in character:
+        if 'persona' in character:
+            return character['persona']
+        character['persona_dna'] = roll_persona_dna(character['role_id'], rng)
+    return render_persona(character['persona_dna'], character['name'])
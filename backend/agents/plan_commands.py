@@ -0,0 +1,163 @@
+import re
+import threading
+from functools import lru_cache
+
+# --- Local Plan Command Parser ---
+# Every /update-plan command used to be a gpt-4-turbo round-trip, including
+# trivial ones like "remove the residential areas". Most commands follow a
+# few fixed shapes, so they are parsed here first against the scene's own
+# vocabulary (layer/type names with plural and "areas"/"buildings" forms, and
+# entity ids), producing the same change / remove / update_params / scale /
+# rotate / clarify JSON the LLM prompt asks for. Anything that does not match exactly one
+# known layer or entity (a new destination type, several ids, a spatial
+# qualifier, dimensions without a resize/set verb or next to a move...)
+# returns None and goes to the LLM as before.
+
+GENERIC_NOUNS = ('areas', 'area', 'buildings', 'building', 'blocks', 'block', 'units', 'unit', 'zones', 'zone',
+                 'layers', 'layer', 'entities', 'entity', 'ones', 'plots', 'plot', 'sites', 'site')
+RESIZE_WORDS = re.compile(r'\b(smaller|bigger|larger|reduce|increase|resize|shrink|enlarge|expand|size|dimensions?)\b')
+SET_WORDS = re.compile(r'\b(make|set|change|adjust)\b')
+# "move hotel-0 10 by 20" is a displacement, not a size: placement words send the command to the LLM
+PLACEMENT_WORDS = re.compile(r'\b(move|moving|shift|place|put|relocate|translate|slide|from|towards?|north|south|east|west|left|right|up|down)\b')
+NUMBER = r'(\d+(?:\.\d+)?)'
+DIMENSIONS = re.compile(NUMBER + r'\s*(?:m|meters?|metres?)?\s*(?:by|x|×|\*)\s*' + NUMBER)
+NAMED_DIMENSION = re.compile(r'\b(width|length)\s*(?:of|to|=|:|is)?\s*' + NUMBER)
+
+CHANGE = re.compile(r'^(?:change|convert|turn|replace|switch|swap)\s+(?:all\s+(?:of\s+)?)?(?:the\s+)?(?P<source>.+?)'
+                    r'\s+(?:to|into|with)\s+(?:an?\s+|the\s+)?(?P<destination>.+)$')
+SCALE = re.compile(r'^(?P<verb>scale|grow|enlarge|shrink|reduce)\s+(?:all\s+(?:of\s+)?)?(?:the\s+)?(?P<target>.+?)'
+                   r'\s+(?:by\s+)?' + NUMBER + r'\s*(?P<unit>%|percent|x|times)$')
+ROTATE = re.compile(r'^(?:rotate|turn)\s+(?:all\s+(?:of\s+)?)?(?:the\s+)?(?P<target>.+?)'
+                    r'\s+(?:by\s+)?(-?\d+(?:\.\d+)?)\s*(?:°|degrees?|deg)$')
+REMOVE = re.compile(r'^(?:remove|delete|clear|drop|get rid of|take out)\s+(?:all\s+(?:of\s+)?)?(?:the\s+)?(?P<layer>.+)$')
+
+PLAN_COMMAND_STATS = {'local': 0, 'local_clarify': 0, 'llm': 0}
+_stats_lock = threading.Lock()
+
+
+def _aliases(name):
+    """Spellings a command may use for a layer/type name."""
+    base = name.lower()
+    forms = {base, f"{base}s", f"{base}es"}
+    if base.endswith('y'):
+        forms.add(f"{base[:-1]}ies")
+    return forms
+
+
+def build_vocabulary(entities):
+    """Alias -> canonical name for types and layers, plus the set of entity ids (lowercased -> id)."""
+    types = {entity['type'] for entity in entities}
+    layers = {entity['layer'] for entity in entities}
+    ids = {entity['id'].lower(): entity['id'] for entity in entities}
+    return ({alias: name for name in types for alias in _aliases(name)},
+            {alias: name for name in layers for alias in _aliases(name)},
+            ids)
+
+
+@lru_cache(maxsize=32)
+def _id_pattern(prefixes):
+    """Matches "<prefix>-<n>" ids; prefixes may contain spaces ("public services-3"), longest first."""
+    alternatives = '|'.join(re.escape(prefix) for prefix in sorted(prefixes, key=len, reverse=True))
+    return re.compile(rf'(?<![\w&])(?:{alternatives})(?:-\d+)+\b')
+
+
+def _lookup(phrase, aliases):
+    """Canonical name for a phrase like "the residential areas", or None."""
+    phrase = re.sub(r'\s+', ' ', phrase.strip(' .!?,')).removeprefix('the ')
+    if phrase in aliases:
+        return aliases[phrase]
+    for noun in GENERIC_NOUNS:
+        if phrase.endswith(f" {noun}") and phrase[:-len(noun) - 1] in aliases:
+            return aliases[phrase[:-len(noun) - 1]]
+    return None
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def _bulk_target(phrase, layer_aliases, ids):
+    """{'target_id': ...} or {'layer': ...} for the subject of a scale/rotate command, or None."""
+    phrase = phrase.strip()
+    if phrase in ids:
+        return {'target_id': ids[phrase]}
+    layer = _lookup(phrase, layer_aliases)
+    return {'layer': layer} if layer else None
+
+
+def parse_plan_command(command, entities):
+    """The interpreted action for a plan command, or None if it needs the LLM."""
+    text = command.strip().lower().rstrip('.!')
+    type_aliases, layer_aliases, ids = build_vocabulary(entities)
+
+    match = SCALE.match(text)
+    if match:
+        target = _bulk_target(match.group('target'), layer_aliases, ids)
+        amount = float(match.group(3))
+        shrink = match.group('verb') in ('shrink', 'reduce')
+        if match.group('unit') in ('%', 'percent'):
+            amount = 1 + amount / 100 * (-1 if shrink else 1)
+        elif shrink and amount > 0:
+            amount = 1 / amount  # "shrink ... by 2x" halves
+        if target and amount > 0:
+            return {'action': 'scale', **target, 'factor': round(amount, 4)}
+        return None
+
+    match = ROTATE.match(text)
+    if match:
+        target = _bulk_target(match.group('target'), layer_aliases, ids)
+        return {'action': 'rotate', **target, 'degrees': _number(match.group(2))} if target else None
+
+    prefixes = frozenset(entity_id.split('-', 1)[0] for entity_id in ids)
+    mentioned = {ids[token] for token in _id_pattern(prefixes).findall(text) if token in ids}
+    if len(mentioned) > 1:
+        return None
+    if mentioned:
+        target_id = mentioned.pop()
+        if PLACEMENT_WORDS.search(text):
+            return None
+        if not (RESIZE_WORDS.search(text) or SET_WORDS.search(text)):
+            return None  # Dimensions without a resize/set verb are ambiguous
+        dimensions = DIMENSIONS.search(text)
+        if dimensions:
+            params = {'width': _number(dimensions.group(1)), 'length': _number(dimensions.group(2))}
+        else:
+            params = {name: _number(value) for name, value in NAMED_DIMENSION.findall(text)}
+        if params:
+            return {'action': 'update_params', 'target_id': target_id, 'params': params}
+        if RESIZE_WORDS.search(text):
+            return {'action': 'clarify', 'message': f"What specific dimensions should I set for {target_id}?"}
+        return None
+
+    match = CHANGE.match(text)
+    if match:
+        source = _lookup(match.group('source'), type_aliases)
+        destination = _lookup(match.group('destination'), type_aliases)
+        if source and destination and source != destination:
+            return {'action': 'change', 'source': source, 'destination': destination}
+        return None
+
+    match = REMOVE.match(text)
+    if match:
+        layer = _lookup(match.group('layer'), layer_aliases)
+        if layer:
+            return {'action': 'remove', 'layer': layer}
+    return None
+
+
+def record_plan_command(local, clarify=False):
+    with _stats_lock:
+        if not local:
+            PLAN_COMMAND_STATS['llm'] += 1
+        elif clarify:
+            PLAN_COMMAND_STATS['local_clarify'] += 1
+        else:
+            PLAN_COMMAND_STATS['local'] += 1
+
+
+def plan_command_report():
+    with _stats_lock:
+        total = sum(PLAN_COMMAND_STATS.values())
+        local = PLAN_COMMAND_STATS['local'] + PLAN_COMMAND_STATS['local_clarify']
+        return {**PLAN_COMMAND_STATS, 'local_hit_rate': round(local / total, 3) if total else 0.0}
@@ -0,0 +1,91 @@
+import json
+import mimetypes
+import os
+from flask import abort, request, send_from_directory, url_for
+
+# --- Fingerprinted Static Assets ---
+# scripts/assets/build_assets.py writes content-hashed copies of
+# frontend/static into frontend/static/dist plus a manifest. When that
+# manifest exists, url_for('static', filename=...) in templates resolves to
+# /assets/<name>.<hash>.<ext>, served with a one-year immutable Cache-Control,
+# pre-compressed (br/gzip) when the client accepts it and as WebP for PNGs
+# that have a WebP variant. Without a build, templates keep plain /static URLs.
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class AssetManifest:
+    def __init__(self, dist_dir):
+        self.dist_dir = dist_dir
+        self.assets = {}  # original path -> entry
+        self.by_hashed = {}  # hashed path -> entry
+        self.load()
+
+    def load(self):
+        path = os.path.join(self.dist_dir, 'manifest.json')
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            self.assets = json.load(f).get('assets', {})
+        self.by_hashed = {entry['path']: entry for entry in self.assets.values()}
+
+    def hashed(self, filename):
+        entry = self.assets.get(filename)
+        return entry['path'] if entry else None
+
+
+def _guess_mimetype(path):
+    if path.endswith('.webp'):
+        return 'image/webp'
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def _pick_variant(entry):
+    """Returns (file, content_encoding, vary) for the best representation the client accepts."""
+    if entry.get('webp') and 'image/webp' in request.headers.get('Accept', ''):
+        return entry['webp'], None, 'Accept'
+    encodings = entry.get('encodings', [])
+    if encodings:
+        accepted = request.headers.get('Accept-Encoding', '')
+        if 'br' in encodings and 'br' in accepted:
+            return entry['path'] + '.br', 'br', 'Accept-Encoding'
+        if 'gzip' in encodings and 'gzip' in accepted:
+            return entry['path'] + '.gz', 'gzip', 'Accept-Encoding'
+        return entry['path'], None, 'Accept-Encoding'
+    if entry.get('webp'):
+        return entry['path'], None, 'Accept'
+    return entry['path'], None, None
+
+
+def init_assets(app, static_dir):
+    """Registers /assets and makes template url_for('static', ...) emit hashed URLs when a build exists."""
+    manifest = AssetManifest(os.path.join(static_dir, 'dist'))
+    app.extensions['asset_manifest'] = manifest
+
+    @app.route('/assets/<path:filename>')
+    def hashed_asset(filename):
+        entry = manifest.by_hashed.get(filename)
+        if entry is None:
+            abort(404)
+        variant, encoding, vary = _pick_variant(entry)
+        # Compressed variants keep the type of the original file
+        response = send_from_directory(manifest.dist_dir, variant, max_age=IMMUTABLE_MAX_AGE,
+                                       mimetype=_guess_mimetype(entry['path'] if encoding else variant))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if vary:
+            response.vary.add(vary)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def asset_url_for(endpoint, **values):
+        if endpoint == 'static' and manifest.assets:
+            hashed = manifest.hashed(values.get('filename'))
+            if hashed:
+                values['filename'] = hashed
+                return url_for('hashed_asset', **values)
+        return url_for(endpoint, **values)
+
+    app.jinja_env.globals['url_for'] = asset_url_for
+    return manifest
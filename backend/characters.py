@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from telemetry import timed
+
+# --- Character Storage ---
+# The game state's 'characters' used to hold the full character dicts
+# (demographics, personality, backstory, persona...) and was copied and
+# written on every change. Now it only carries the CharacterState fields; the
+# immutable CharacterProfile part is written once per game to PROFILE_STORE
+# and merged back in by load_characters(). Callers keep working with plain dicts.
+
+
+
+@lru_cache(maxsize=1)
+def _models():
+    """models pulls in pydantic (~100 ms), so it is imported on first use rather than at server start."""
+    import models
+    return models
+
+
+@lru_cache(maxsize=1)
+def state_fields():
+    return tuple(_models().CharacterState.model_fields)
+
+
+@lru_cache(maxsize=1)
+def state_only_fields():
+    return frozenset(state_fields()) - {'id'}
+
+
+class ProfileStore:
+    """Immutable character profiles keyed by game id: in-memory LRU backed by one JSON file per game."""
+
+    def __init__(self, directory, capacity=256):
+        self.directory = directory
+        self.capacity = capacity
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, game_id):
+        return os.path.join(self.directory, f"{game_id}.json")
+
+    def put(self, game_id, profiles):
+        profiles = [_models().CharacterProfile(**p).model_dump(exclude_none=True) for p in profiles]
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(game_id), 'w') as f:
+            json.dump(profiles, f)
+        with self._lock:
+            self._remember(game_id, profiles)
+
+    def get(self, game_id):
+        with self._lock:
+            profiles = self._cache.get(game_id)
+            if profiles is not None:
+                self._cache.move_to_end(game_id)
+                return profiles
+        try:
+            with open(self._path(game_id), 'r') as f:
+                profiles = json.load(f)
+        except (IOError, json.JSONDecodeError):
+            return None
+        with self._lock:
+            self._remember(game_id, profiles)
+        return profiles
+
+    def _remember(self, game_id, profiles):
+        self._cache[game_id] = profiles
+        self._cache.move_to_end(game_id)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+
+PROFILE_STORE = ProfileStore(os.path.join('.flask_session', 'profiles'))
+
+
+def split_character(char):
+    """Splits a full character dict into (profile_dict, state_dict)."""
+    profile = {k: v for k, v in char.items() if k not in state_only_fields()}
+    state = _models().CharacterState(**{k: char[k] for k in state_fields() if k in char}).model_dump(exclude_none=True)
+    return profile, state
+
+
+def create_characters(game_data, game_id, characters):
+    """Registers a new game's characters: profiles go to the store, state to game_data."""
+    profiles, states = zip(*(split_character(c) for c in characters)) if characters else ((), ())
+    PROFILE_STORE.put(game_id, list(profiles))
+    game_data['game_id'] = game_id
+    game_data['characters'] = list(states)
+
+
+@timed('characters_save')
+def store_characters(game_data, characters):
+    """Writes back only the mutable state of each character."""
+    game_data['characters'] = [
+        _models().CharacterState(**{k: c[k] for k in state_fields() if k in c}).model_dump(exclude_none=True)
+        for c in characters
+    ]
+
+
+@timed('characters_load')
+def load_characters(game_data):
+    """Rebuilds full character dicts (profile + state), in stored order."""
+    states = game_data.get('characters')
+    if not states:
+        return []
+    profiles = PROFILE_STORE.get(game_data.get('game_id'))
+    if profiles is None:
+        return []
+    by_id = {p['id']: p for p in profiles}
+    return [{**by_id.get(s['id'], {}), **s} for s in states]
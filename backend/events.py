@@ -0,0 +1,156 @@
+import random
+
+# --- Micro-Event Deck ---
+# Selection side of the micro-event system. Effects are still applied in
+# server.trigger_and_apply_event; this module only decides *which* event fires.
+#
+# Scenario events may carry these optional keys (all default to the old
+# uniform, always-eligible behaviour):
+#   "weight": 2.0                      relative draw weight
+#   "cooldown": 2                      rounds before the same event may fire again
+#   "once": true                       never fire twice in one game
+#   "preconditions": {
+#       "round": [min, max],           inclusive round range
+#       "climate": [min, max],         inclusive negotiation climate band
+#       "issues": {"affordable_housing.share_percentage": [min, max]}
+#   }
+#   "chain": {"event_id": "...", "delay": 1, "probability": 1.0}
+
+MAX_DRAW_ATTEMPTS = 8  # Rejection-sampling tries before falling back to a filtered draw
+
+
+def build_alias_table(weights):
+    """Builds Vose alias tables so a weighted draw costs O(1)."""
+    n = len(weights)
+    if n == 0:
+        return [], []
+    total = float(sum(weights))
+    if total <= 0:
+        weights = [1.0] * n
+        total = float(n)
+
+    scaled = [w * n / total for w in weights]
+    prob = [0.0] * n
+    alias = [0] * n
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = scaled[l] + scaled[s] - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+
+    # Leftovers are 1.0 up to floating point error
+    for i in large + small:
+        prob[i] = 1.0
+        alias[i] = i
+    return prob, alias
+
+
+def build_role_index(characters):
+    """Maps role_id -> list of positions in the characters list."""
+    index = {}
+    for pos, char in enumerate(characters):
+        index.setdefault(char['role_id'], []).append(pos)
+    return index
+
+
+def new_event_log():
+    """Per-game record of fired and scheduled (chained) events."""
+    return {
+        'fired': {},    # event_id -> round it last fired
+        'entries': [],  # [{'round': n, 'id': event_id}] in firing order
+        'pending': []   # [{'round': n, 'id': event_id}] chained follow-ups
+    }
+
+
+def _in_range(value, bounds):
+    low, high = bounds
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def _lookup_issue(issues, dotted_key):
+    value = issues
+    for part in dotted_key.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+class EventDeck:
+    """Weighted event deck with cooldowns, preconditions and chains."""
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.by_id = {event['id']: event for event in self.events}
+        self._prob, self._alias = build_alias_table([event.get('weight', 1.0) for event in self.events])
+
+    def is_eligible(self, event, current_round, climate_score, issues, event_log):
+        fired_round = event_log['fired'].get(event['id'])
+        if fired_round is not None:
+            if event.get('once'):
+                return False
+            if current_round - fired_round <= event.get('cooldown', 0):
+                return False
+
+        conditions = event.get('preconditions', {})
+        if 'round' in conditions and not _in_range(current_round, conditions['round']):
+            return False
+        if 'climate' in conditions and not _in_range(climate_score, conditions['climate']):
+            return False
+        for key, bounds in conditions.get('issues', {}).items():
+            value = _lookup_issue(issues or {}, key)
+            if not isinstance(value, (int, float)) or not _in_range(value, bounds):
+                return False
+        return True
+
+    def draw(self, current_round, climate_score, issues, event_log, rng=random):
+        """Draws one eligible event, or None if nothing is eligible."""
+        if not self.events:
+            return None
+        n = len(self.events)
+        for _ in range(MAX_DRAW_ATTEMPTS):
+            i = int(rng.random() * n)
+            if rng.random() >= self._prob[i]:
+                i = self._alias[i]
+            event = self.events[i]
+            if self.is_eligible(event, current_round, climate_score, issues, event_log):
+                return event
+
+        # Most of the deck is blocked; draw from what is left
+        eligible = [e for e in self.events if self.is_eligible(e, current_round, climate_score, issues, event_log)]
+        if not eligible:
+            return None
+        return rng.choices(eligible, weights=[e.get('weight', 1.0) for e in eligible], k=1)[0]
+
+    def pop_due_chain(self, current_round, climate_score, issues, event_log):
+        """Returns a chained follow-up scheduled for this round, if any still applies."""
+        pending = event_log['pending']
+        for entry in list(pending):
+            if entry['round'] > current_round:
+                continue
+            pending.remove(entry)
+            event = self.by_id.get(entry['id'])
+            if event and self.is_eligible(event, current_round, climate_score, issues, event_log):
+                return event
+        return None
+
+    def record(self, event, current_round, event_log, rng=random):
+        """Logs a fired event and schedules its chained follow-up."""
+        event_log['fired'][event['id']] = current_round
+        event_log['entries'].append({'round': current_round, 'id': event['id']})
+
+        chain = event.get('chain')
+        if chain and chain.get('event_id') in self.by_id:
+            if rng.random() < chain.get('probability', 1.0):
+                event_log['pending'].append({
+                    'round': current_round + chain.get('delay', 1),
+                    'id': chain['event_id']
+                })
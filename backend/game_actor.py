@@ -0,0 +1,226 @@
+import contextvars
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from game_log import make_patch, append_record, log_size, read_records, write_snapshot, load_state
+from telemetry import span
+
+# --- Per-Game Actors ---
+# Game state used to live in the Flask session, which every request loads at
+# its start and writes back whole at its end. Two overlapping requests for
+# the same game (a /negotiation round still waiting on the LLM and an
+# /influence click, or a page reload regenerating tokens) each saved their own
+# stale copy, and the last one to finish silently erased the other's changes.
+#
+# Now the session only carries the game_id. Each game has one GameActor that
+# owns the authoritative state in memory:
+#   * mutations run as commands, one at a time per game:
+#         with GAMES.command(game_id, 'influence') as game: ...
+#     The block works on a private copy, which becomes the new state when the
+#     block exits normally and is discarded if it raises. record_event()
+#     inside the block attaches domain events to the command;
+#   * reads use GAMES.snapshot(game_id), the last committed state, without
+#     waiting on a running command (treat it as read-only);
+#   * each commit is appended to the game's event log (game_log.py) on a
+#     background thread, with a compact snapshot every GAME_SNAPSHOT_EVERY
+#     commits, so a restarted server (or a player who lost the cookie, via
+#     /resume/<game_id>) picks the game up from snapshot + log tail.
+# Different games never share a lock, so they proceed fully in parallel.
+
+log = logging.getLogger('ripple.games')
+
+GAME_KEYS = ('game_id', 'characters', 'role_index', 'negotiation_state', 'player_profile',
+             'player_action_history', 'regen_penalty', 'previous_stance')
+SNAPSHOT_EVERY = int(os.environ.get('GAME_SNAPSHOT_EVERY', 20))
+
+_command_events = contextvars.ContextVar('game_command_events', default=None)
+
+
+def record_event(kind, **data):
+    """Attaches a domain event to the command running on this thread (no-op outside a command)."""
+    events = _command_events.get()
+    if events is not None:
+        events.append({'type': kind, **data})
+
+
+class GameActor:
+    def __init__(self, game_id, state, version=0):
+        self.game_id = game_id
+        self.head = (version, state)  # Last commit, swapped as one tuple; the state is replaced, never mutated
+        self.persisted_version = version
+        self.lock = threading.Lock()  # Held for the duration of one command
+
+    @property
+    def version(self):
+        return self.head[0]
+
+    @property
+    def state(self):
+        return self.head[1]
+
+
+class GameRegistry:
+    """Actors keyed by game id: in-memory LRU of live games backed by a snapshot and an event log per game."""
+
+    def __init__(self, directory, capacity=256):
+        self.directory = directory
+        self.capacity = capacity
+        self._actors = OrderedDict()
+        self._lock = threading.Lock()  # Guards the registry only, never held during a command
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='game-persist')  # FIFO keeps each log in order
+        self.stats = {'commands': 0, 'commits': 0, 'aborted': 0, 'contended': 0,
+                      'appended': 0, 'snapshots': 0, 'loaded': 0, 'tail_records_loaded': 0}
+
+    def snapshot_path(self, game_id):
+        return os.path.join(self.directory, f"{game_id}.json")
+
+    def log_path(self, game_id):
+        return os.path.join(self.directory, f"{game_id}.log.jsonl")
+
+    def create(self, game_id, state, events=()):
+        """Registers a new game; its first log record holds the whole initial state."""
+        state = {**state, 'game_id': game_id}
+        actor = GameActor(game_id, state, version=1)
+        actor.persisted_version = 0
+        with self._lock:
+            self._commit_record(actor, 'create', list(events), [['set', [], state]], 0.0)
+            self._remember(actor)
+        return state
+
+    def actor(self, game_id, legacy_session=None):
+        """Live actor for game_id, loaded from disk (or a pre-actor session) on first use; None if unknown."""
+        if not game_id:
+            return None
+        with self._lock:
+            actor = self._actors.get(game_id)
+            if actor is not None:
+                self._actors.move_to_end(game_id)
+                return actor
+        state, version, tail = load_state(self.snapshot_path(game_id), self.log_path(game_id))
+        adopted = False
+        if state is None and legacy_session is not None and 'negotiation_state' in legacy_session:
+            # Games started before actors existed kept their state in the session
+            state = {key: copy.deepcopy(legacy_session[key]) for key in GAME_KEYS if key in legacy_session}
+            version, adopted = 1, True
+        if state is None:
+            return None
+        with self._lock:
+            actor = self._actors.get(game_id)  # Another request may have loaded it meanwhile
+            if actor is None:
+                actor = GameActor(game_id, state, version)
+                if adopted:
+                    # Logged before the actor is visible, so no command can be recorded ahead of it
+                    actor.persisted_version = 0
+                    self._commit_record(actor, 'adopt', [{'type': 'game_adopted'}], [['set', [], state]], 0.0)
+                self._remember(actor)
+                self.stats['loaded'] += 1
+                self.stats['tail_records_loaded'] += tail
+            return actor
+
+    def snapshot(self, game_id, legacy_session=None):
+        """The last committed state of a game (read-only), or None."""
+        actor = self.actor(game_id, legacy_session)
+        return actor.state if actor else None
+
+    def head(self, game_id, legacy_session=None):
+        """(version, state) of the last commit, read together; (0, None) if the game is unknown."""
+        actor = self.actor(game_id, legacy_session)
+        return actor.head if actor else (0, None)
+
+    def version(self, game_id):
+        return self.head(game_id)[0]
+
+    @contextmanager
+    def command(self, game_id, name, legacy_session=None):
+        """
+        Runs the block as the game's next command and yields a private working copy
+        of its state (None if the game is unknown). Commands on the same game queue
+        up behind each other; the copy replaces the state only if the block completes,
+        and is logged as one record named `name` with the events recorded meanwhile.
+        """
+        actor = self.actor(game_id, legacy_session)
+        if actor is None:
+            yield None
+            return
+        if not actor.lock.acquire(blocking=False):
+            with self._lock:
+                self.stats['contended'] += 1
+            with span('game_queue'):
+                actor.lock.acquire()
+        events = []
+        token = _command_events.set(events)
+        started = time.perf_counter()
+        try:
+            working = copy.deepcopy(actor.state)
+            try:
+                yield working
+            except BaseException:
+                with self._lock:
+                    self.stats['commands'] += 1
+                    self.stats['aborted'] += 1
+                raise
+            patch = make_patch(actor.state, working)
+            if patch:
+                actor.head = (actor.version + 1, working)
+                # Queued while still holding the game's lock, so log records are written in commit order
+                self._commit_record(actor, name, events, patch, (time.perf_counter() - started) * 1000)
+            with self._lock:
+                self.stats['commands'] += 1
+                self.stats['commits'] += bool(patch)
+        finally:
+            _command_events.reset(token)
+            actor.lock.release()
+
+    def records(self, game_id, since=0):
+        """Log records with seq > since, including any still queued for writing."""
+        self.flush()
+        return [record for record in read_records(self.log_path(game_id)) if record['seq'] > since]
+
+    # --- Persistence ---
+    def _commit_record(self, actor, name, events, patch, ms):
+        record = {'seq': actor.version, 'ts': time.time(), 'command': name, 'ms': round(ms, 1),
+                  'events': events, 'patch': patch}
+        snapshot = actor.state if actor.version % SNAPSHOT_EVERY == 0 else None
+        self._writer.submit(self._persist, actor, record, snapshot)
+
+    def _persist(self, actor, record, snapshot):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            append_record(self.log_path(actor.game_id), record)
+            if snapshot is not None:
+                write_snapshot(self.snapshot_path(actor.game_id), record['seq'], snapshot,
+                               log_size(self.log_path(actor.game_id)), record['ts'])
+        except (IOError, TypeError, ValueError) as e:
+            log.error("Could not persist game %s seq %s: %s", actor.game_id, record['seq'], e)
+            return
+        actor.persisted_version = record['seq']
+        with self._lock:
+            self.stats['appended'] += 1
+            self.stats['snapshots'] += snapshot is not None
+
+    def flush(self, timeout=None):
+        """Waits until every commit scheduled so far has been written."""
+        self._writer.submit(lambda: None).result(timeout)
+
+    def _remember(self, actor):
+        self._actors[actor.game_id] = actor
+        self._actors.move_to_end(actor.game_id)
+        while len(self._actors) > self.capacity:
+            # Only idle, fully persisted games are dropped, so a reload from disk is never stale
+            idle = next((game_id for game_id, a in self._actors.items()
+                         if not a.lock.locked() and a.version <= a.persisted_version), None)
+            if idle is None:
+                break  # Everything is busy or unsaved; shrink on a later insert
+            del self._actors[idle]
+
+    def report(self):
+        with self._lock:
+            return {**self.stats, 'live_games': len(self._actors)}
+
+
+GAMES = GameRegistry(os.path.join('.flask_session', 'games'))
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+
+# --- Incremental Game Feed ---
+# Polling clients and round replies used to get every message of every round
+# and the full stakeholder list on each call, so payloads grew with the game.
+# The feed is a read model over committed game states (game_actor.py):
+#   * the version of a commit is the client's cursor;
+#   * formatted chat messages are appended as rounds are added, never rebuilt;
+#   * the stakeholder view of the last keep_versions cursors handed out is
+#     retained, so a client at a recent cursor gets only the new messages and the
+#     stakeholder fields that changed since. Unknown or older cursors get the
+#     full state (marked 'full': true) and continue from there.
+
+
+class GameFeed:
+    def __init__(self, format_rounds, load_stakeholders, capacity=256, keep_versions=16):
+        self.format_rounds = format_rounds  # (history, start_round) -> messages for history[start_round:]
+        self.load_stakeholders = load_stakeholders  # game state -> full character dicts
+        self.capacity = capacity
+        self.keep_versions = keep_versions
+        self._games = OrderedDict()  # game_id -> {'messages', 'round_ends', 'views', 'lock'}
+        self._lock = threading.Lock()
+        self.stats = {'full': 0, 'delta': 0, 'not_modified': 0, 'rounds_formatted': 0}
+
+    def _game(self, game_id):
+        with self._lock:
+            feed = self._games.get(game_id)
+            if feed is None:
+                feed = self._games[game_id] = {'messages': [], 'round_ends': [], 'views': OrderedDict(),
+                                               'lock': threading.Lock()}
+                while len(self._games) > self.capacity:
+                    self._games.popitem(last=False)
+            self._games.move_to_end(game_id)
+            return feed
+
+    def _view(self, feed, version, state):
+        """Message count and stakeholders at a committed version (built once per version)."""
+        view = feed['views'].get(version)
+        if view is not None:
+            return view
+        # History only grows, so every version's messages are a prefix of the formatted list
+        history = state.get('negotiation_state', {}).get('history', [])
+        round_ends = feed['round_ends']  # Message count after each formatted round
+        if len(history) > len(round_ends):
+            formatted = len(round_ends)
+            feed['messages'].extend(self.format_rounds(history, formatted))
+            for round_dialogue in history[formatted:]:
+                round_ends.append((round_ends[-1] if round_ends else 0) + len(round_dialogue))
+            with self._lock:
+                self.stats['rounds_formatted'] += len(history) - formatted
+        view = {'messages': round_ends[len(history) - 1] if history else 0,
+                'stakeholders': {c['id']: c for c in self.load_stakeholders(state)}}
+        feed['views'][version] = view
+        while len(feed['views']) > self.keep_versions:
+            feed['views'].popitem(last=False)
+        return view
+
+    def payload(self, game_id, version, state, since=None):
+        """
+        State of a game at `version` for a client whose cursor is `since`.
+        Everything when since is None or no longer retained; otherwise only what changed.
+        """
+        feed = self._game(game_id)
+        with feed['lock']:
+            view = self._view(feed, version, state)
+            base = feed['views'].get(since) if since is not None and since <= version else None
+            messages = feed['messages'][base['messages'] if base else 0:view['messages']]
+        negotiation_state = state.get('negotiation_state', {})
+        payload = {
+            'gameId': game_id,  # /resume/<gameId> brings the game back if the cookie is lost
+            'version': version,
+            'full': base is None,
+            'currentRound': negotiation_state.get('round', 1),
+            'playerProfile': state.get('player_profile', {}),
+            'climateScore': negotiation_state.get('negotiation_climate', 50),
+            'issues': negotiation_state.get('issues', {}),
+            'outcome': negotiation_state.get('outcome'),
+            'messages': messages
+        }
+        if base is None:
+            payload['stakeholders'] = list(view['stakeholders'].values())
+        else:
+            payload['since'] = since
+            payload['stakeholders'] = changed_fields(base['stakeholders'], view['stakeholders'])
+        with self._lock:
+            self.stats['full' if base is None else 'delta'] += 1
+        return payload
+
+    def not_modified(self):
+        with self._lock:
+            self.stats['not_modified'] += 1
+
+    def report(self):
+        with self._lock:
+            return {**self.stats, 'games': len(self._games)}
+
+
+def changed_fields(before, after):
+    """[{'id': ..., <changed fields>}] for stakeholders that differ; removed fields are sent as None."""
+    changes = []
+    for char_id, current in after.items():
+        previous = before.get(char_id)
+        if previous is None:
+            changes.append(current)
+            continue
+        delta = {key: value for key, value in current.items() if previous.get(key) != value}
+        delta.update({key: None for key in previous if key not in current})
+        if delta:
+            changes.append({'id': char_id, **delta})
+    return changes
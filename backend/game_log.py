@@ -0,0 +1,111 @@
+import json
+import os
+
+# --- Game Event Log ---
+# Every committed game command is appended to <game_id>.log.jsonl as one
+# record:
+#   {"seq": 7, "ts": 1700000000.0, "command": "negotiation", "ms": 812.4,
+#    "events": [{"type": "statement", ...}, {"type": "npc_reply", ...}, ...],
+#    "patch": [["set", ["negotiation_state", "round"], 4],
+#              ["append", ["negotiation_state", "history"], [{...}]], ...]}
+# "events" are the domain facts (for audit and replay); "patch" is the
+# structural change the command made, so state can be rebuilt by folding
+# patches. The first record sets the whole state. <game_id>.json is a
+# periodic snapshot that remembers the log offset it covers, so loading a
+# game reads the snapshot plus only the records written after it.
+
+
+def make_patch(old, new, path=()):
+    """Operations that turn old into new. Lists that only grew become one append."""
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key, value in new.items():
+            if key in old:
+                ops.extend(make_patch(old[key], value, (*path, key)))
+            else:
+                ops.append(['set', [*path, key], value])
+        ops.extend(['del', [*path, key]] for key in old if key not in new)
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        if len(new) > len(old) and new[:len(old)] == old:
+            return [['append', list(path), new[len(old):]]]
+        if len(new) == len(old):
+            ops = []
+            for i, (before, after) in enumerate(zip(old, new)):
+                ops.extend(make_patch(before, after, (*path, i)))
+            if len(ops) <= len(new):  # Otherwise (e.g. a shifted window) replacing the list is smaller
+                return ops
+    return [['set', list(path), new]]
+
+
+def apply_patch(state, patch):
+    """Applies make_patch() operations in place (a root 'set' replaces the state); returns the state."""
+    for op, path, *value in patch:
+        if not path:
+            state = value[0]
+            continue
+        target = state
+        for key in path[:-1]:
+            target = target[key]
+        if op == 'set':
+            target[path[-1]] = value[0]
+        elif op == 'append':
+            target[path[-1]].extend(value[0])
+        elif op == 'del':
+            del target[path[-1]]
+    return state
+
+
+def append_record(log_path, record):
+    with open(log_path, 'a') as f:
+        f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+
+def log_size(log_path):
+    try:
+        return os.path.getsize(log_path)
+    except OSError:
+        return 0
+
+
+def read_records(log_path, offset=0):
+    """Yields log records from byte offset on; a torn final line (crash mid-write) is ignored."""
+    try:
+        f = open(log_path, 'r')
+    except IOError:
+        return
+    with f:
+        f.seek(offset)
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                return
+
+
+def write_snapshot(snapshot_path, version, state, log_offset, saved_at):
+    temp_path = f"{snapshot_path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({'version': version, 'saved_at': saved_at, 'log_offset': log_offset, 'state': state}, f)
+    os.replace(temp_path, snapshot_path)  # Readers never see a half-written file
+
+
+def load_state(snapshot_path, log_path):
+    """Rebuilds (state, version, tail_length) from the latest snapshot plus the log records after it."""
+    state, version, offset = None, 0, 0
+    try:
+        with open(snapshot_path, 'r') as f:
+            snapshot = json.load(f)
+        state, version, offset = snapshot['state'], snapshot.get('version', 0), snapshot.get('log_offset', 0)
+    except (IOError, json.JSONDecodeError, KeyError):
+        pass
+    tail = 0
+    for record in read_records(log_path, offset):
+        if record['seq'] <= version:
+            continue
+        state = apply_patch(state, record['patch'])
+        version = record['seq']
+        tail += 1
+    return state, version, tail
@@ -0,0 +1,142 @@
+import copy
+import json
+import time
+import uuid
+from characters import PROFILE_STORE
+from game_actor import GAMES
+from game_log import apply_patch, make_patch
+from llm.provider import LLMProvider, set_llm_provider
+from llm.ratelimit import PRIORITY_INTERACTIVE
+
+# --- Game Replay ---
+# Re-runs a logged game through the real request handlers: the initial
+# state comes from the log's first record, every later command is re-sent
+# (statements, give-up, influence actions and batches, token regeneration), NPCs answer
+# with the replies recorded for that command, and all other randomness is
+# derived from the game seed (server.game_rng). After each command the
+# replayed state is compared with the logged one, so a code change that
+# alters game outcomes shows up as a divergence, and replayed_ms vs
+# recorded_ms shows server-side cost without LLM latency.
+#
+# replay_game() swaps the process-wide LLM provider; run it in its own
+# process (scripts/benchmarks/replay_game.py), never inside a live server.
+
+MAX_DIFF_OPS = 20
+
+
+class ReplayError(Exception):
+    """Stands in for the provider failure a recorded reply came from."""
+
+
+class ReplayProvider(LLMProvider):
+    """Answers NPC completions with the replies recorded for the command being replayed."""
+    name = 'replay'
+
+    def __init__(self):
+        self.replies = {}  # npc_id -> npc_reply event
+
+    def load(self, npc_replies):
+        self.replies = npc_replies
+
+    def available(self):
+        # Rounds played without an LLM were answered by the offline fallback; replay them the same way
+        return not self.replies or any(reply.get('source') != 'mock' for reply in self.replies.values())
+
+    def complete(self, model, messages, priority=PRIORITY_INTERACTIVE, coalesce_key=None, **params):
+        # NPC calls are keyed "<game_id>:<npc_id>" (batches: "<game_id>:<id>+<id>+...")
+        npc_ids = (coalesce_key or '').partition(':')[2].split('+')
+        if len(npc_ids) == 1:
+            return json.dumps(self._reply(npc_ids[0]))
+        replies = {}
+        for npc_id in npc_ids:
+            try:
+                replies[npc_id] = self._reply(npc_id)
+            except ReplayError:
+                pass  # Left out, so the handler retries it individually as it did originally
+        return json.dumps({'npcs': replies})
+
+    def _reply(self, npc_id):
+        recorded = self.replies.get(npc_id)
+        if recorded is None:
+            raise ReplayError(f"No recorded reply for {npc_id}")
+        if recorded.get('source') != 'llm':
+            raise ReplayError((recorded.get('response') or '').removeprefix('[System Error]: '))
+        return {'dialogue': recorded['response'], 'thought_process': recorded.get('thought_process') or '',
+                'score_delta': recorded.get('score_delta', 0)}
+
+
+def _comparable(state):
+    state = json.loads(json.dumps(state))  # Tuples vs lists, int vs str keys: compare what the log stores
+    state.pop('game_id', None)
+    return state
+
+
+def _send(client, record):
+    """Re-issues the request that produced a logged command; None if it has no request equivalent."""
+    events = {event['type']: event for event in record['events']}
+    command = record['command']
+    if command == 'negotiation' and 'give_up' in events:
+        return client.post('/negotiation', data={'action': 'give_up'}, headers={'X-Requested-With': 'XMLHttpRequest'})
+    if command == 'negotiation' and 'statement' in events:
+        return client.post('/negotiation', headers={'X-Requested-With': 'XMLHttpRequest'},
+                           data={'action': 'submit_statement', 'player_statement': events['statement']['text']})
+    if command == 'influence':
+        return client.post('/influence', data={'action': events['influence']['action'],
+                                               'target_id': events['influence']['target_id']})
+    if command == 'influence_batch':
+        return client.post('/influence/batch', json={'actions': [
+            {'action': event['action'], 'target_id': event['target_id']}
+            for event in record['events'] if event['type'] == 'influence']})
+    if command == 'regenerate_tokens':
+        return client.get('/negotiation')
+    return None
+
+
+def replay_game(app, records):
+    """
+    Replays logged records (game_log.read_records) against app.
+    Returns {'commands', 'diverged_at', 'recorded_ms', 'replayed_ms', 'steps': [...]}.
+    """
+    records = list(records)
+    if not records or records[0]['command'] != 'create':
+        raise ValueError("Log does not start with a 'create' record; games adopted from old sessions cannot be replayed")
+    created = next(event for event in records[0]['events'] if event['type'] == 'game_created')
+
+    replay_id = f"replay-{uuid.uuid4().hex}"
+    PROFILE_STORE.put(replay_id, created['profiles'])
+    expected = apply_patch(None, copy.deepcopy(records[0]['patch']))
+    GAMES.create(replay_id, copy.deepcopy(expected))
+
+    provider = ReplayProvider()
+    set_llm_provider(provider)
+    client = app.test_client()
+    with client.session_transaction() as session_data:
+        session_data['game_id'] = replay_id
+        session_data['player_role_id'] = created.get('role_id')
+
+    steps, diverged_at = [], None
+    for record in records[1:]:
+        expected = apply_patch(expected, copy.deepcopy(record['patch']))
+        provider.load({event['npc_id']: event for event in record['events'] if event['type'] == 'npc_reply'})
+        started = time.perf_counter()
+        response = _send(client, record)
+        replayed_ms = (time.perf_counter() - started) * 1000
+        diff = make_patch(_comparable(expected), _comparable(GAMES.snapshot(replay_id)))
+        if diff and diverged_at is None:
+            diverged_at = record['seq']
+        steps.append({
+            'seq': record['seq'],
+            'command': record['command'],
+            'status': response.status_code if response is not None else None,
+            'recorded_ms': record.get('ms', 0),
+            'replayed_ms': round(replayed_ms, 1),
+            'diff': diff[:MAX_DIFF_OPS]
+        })
+
+    return {
+        'commands': len(steps),
+        'diverged_at': diverged_at,
+        'recorded_ms': round(sum(step['recorded_ms'] for step in steps), 1),
+        'replayed_ms': round(sum(step['replayed_ms'] for step in steps), 1),
+        'steps': steps
+    }
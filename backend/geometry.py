@@ -0,0 +1,94 @@
+import math
+from functools import lru_cache
+from itertools import chain
+
+# --- Entity Geometry ---
+# A ripple entity's outline (raw_geometry) and its params describe the same
+# shape: params.center is its centroid, width/length its extent along the
+# entity's own axes and rotation (degrees) the angle of those axes. Editing
+# params used to leave raw_geometry stale. regenerate_geometry() maps each
+# outline from its old params to its new ones with one affine transform per
+# entity,
+#     new = R(new_rotation) . S(new_size / old_size) . R(-old_rotation) . (old - old_center) + new_center
+# applied to the vertices of all edited entities at once as NumPy arrays, so
+# a layer-wide edit over thousands of polygons is a few array operations.
+# scaled_params() and rotated_params() build the new params for bulk edits.
+
+
+@lru_cache(maxsize=1)
+def _np():
+    """NumPy (~100 ms to import) is loaded on the first geometry edit rather than at server start."""
+    import numpy
+    return numpy
+
+
+def _scale(np, old_params, new_params, key):
+    """new / old extent per entity; 1 where the old extent is degenerate (no division by zero)."""
+    old = np.array([p.get(key) or 0 for p in old_params], dtype=float)
+    new = np.array([p.get(key) or 0 for p in new_params], dtype=float)
+    return np.divide(new, old, out=np.ones_like(old), where=(old > 0) & (new > 0))
+
+
+def regenerate_geometry(changes):
+    """
+    changes: [(old_params, new_params, raw_geometry)]. Returns the new raw_geometry
+    (a list of [x, y]) for each change, in order; only these outlines are touched.
+    """
+    if not changes:
+        return []
+    np = _np()
+    old_params, new_params, outlines = zip(*changes)
+    counts = np.fromiter((len(outline) for outline in outlines), dtype=np.intp, count=len(outlines))
+    points = np.array(list(chain.from_iterable(outlines)), dtype=float).reshape(-1, 2)
+
+    old_center = np.array([p['center'] for p in old_params], dtype=float)
+    new_center = np.array([p['center'] for p in new_params], dtype=float)
+    old_angle = np.radians([p.get('rotation', 0) or 0 for p in old_params])
+    new_angle = np.radians([p.get('rotation', 0) or 0 for p in new_params])
+    scale_x, scale_y = _scale(np, old_params, new_params, 'width'), _scale(np, old_params, new_params, 'length')
+
+    # Per-entity 2x2 matrix R(new) . S . R(-old), shape (entities, 2, 2)
+    cos_old, sin_old = np.cos(old_angle), np.sin(old_angle)
+    cos_new, sin_new = np.cos(new_angle), np.sin(new_angle)
+    unrotate = np.stack([np.stack([cos_old, sin_old], -1), np.stack([-sin_old, cos_old], -1)], -2)
+    rotate = np.stack([np.stack([cos_new, -sin_new], -1), np.stack([sin_new, cos_new], -1)], -2)
+    scale = np.zeros_like(rotate)
+    scale[:, 0, 0], scale[:, 1, 1] = scale_x, scale_y
+    matrices = rotate @ scale @ unrotate
+
+    owner = np.repeat(np.arange(len(outlines)), counts)
+    moved = (np.einsum('nij,nj->ni', matrices[owner], points - old_center[owner]) + new_center[owner]).tolist()
+    ends = np.cumsum(counts).tolist()
+    return [moved[start:end] for start, end in zip([0, *ends[:-1]], ends)]
+
+
+def scaled_params(params_list, factor):
+    """Each entity grown (factor > 1) or shrunk in place about its own center."""
+    return [{**params, 'width': round(params.get('width', 0) * factor, 2),
+             'length': round(params.get('length', 0) * factor, 2)} for params in params_list]
+
+
+def rotated_params(params_list, degrees, pivot=None):
+    """The entities turned as one block by `degrees` about pivot (default: the mean of their centers)."""
+    if not params_list:
+        return []
+    if pivot is None:
+        pivot = (sum(p['center'][0] for p in params_list) / len(params_list),
+                 sum(p['center'][1] for p in params_list) / len(params_list))
+    cos_a, sin_a = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    rotated = []
+    for params in params_list:
+        dx, dy = params['center'][0] - pivot[0], params['center'][1] - pivot[1]
+        rotated.append({**params,
+                        'center': [round(pivot[0] + dx * cos_a - dy * sin_a, 2), round(pivot[1] + dx * sin_a + dy * cos_a, 2)],
+                        'rotation': round(((params.get('rotation', 0) or 0) + degrees) % 360, 2)})
+    return rotated
+
+
+def apply_params(entities, new_params_list):
+    """Sets new params on (writable) entities and regenerates their outlines in one batch."""
+    outlines = regenerate_geometry([(entity['params'], params, entity['raw_geometry'])
+                                    for entity, params in zip(entities, new_params_list)])
+    for entity, params, outline in zip(entities, new_params_list, outlines):
+        entity['params'] = params
+        entity['raw_geometry'] = outline
@@ -0,0 +1,252 @@
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from scene_store import PRISTINE
+
+# --- KPI Engine ---
+# SceneState.kpis and SceneUpdate.kpis/deltas (models.py) were never filled.
+# KPIs come from two sources:
+#   * the 3D layers (frontend/static/3d_data): site area, built footprint and
+#     coverage, green and open-space ratios, gross floor area (footprint x
+#     storeys from building heights). They never change, so they are computed
+#     once per process with vectorized shapely 2 area calls;
+#   * the ripple plan (scene_store.py): footprint per use, residential floor
+#     area (using the site's average storeys), dwelling units and, from the
+#     negotiation's affordable_housing issue, affordable units.
+# The plan figures are kept as running per-use totals: the pristine scene's
+# areas are computed once, and a committed edit only measures the entities
+# its journal entry names (scene_journal.py), before and after. An issue
+# change only recomputes the affordable-unit figures. Each update returns
+# the new KPIs plus SceneUpdate-style deltas (only the values that moved).
+
+log = logging.getLogger('ripple.kpis')
+
+THREE_D_LAYERS = ('buildings_3d', 'greens', 'open_spaces', 'water', 'roads', 'paths')
+STOREY_HEIGHT_M = 3.0
+UNIT_AREA_M2 = float(os.environ.get('KPI_UNIT_AREA_M2', 70))  # Gross floor area per dwelling
+RESIDENTIAL_USES = ('residential', 'btr')
+DEFAULT_AFFORDABLE_SHARE = 35  # As update_issues_based_on_stances assumes when the issue is missing
+
+
+@lru_cache(maxsize=1)
+def _shapely():
+    """shapely/NumPy are imported on the first KPI computation rather than at server start."""
+    import numpy
+    import shapely
+    return shapely, numpy
+
+
+def polygon_areas(outlines):
+    """Areas of many [[x, y], ...] outlines in one vectorized call (degenerate outlines count 0)."""
+    shapely, np = _shapely()
+    outlines = list(outlines)
+    if not outlines:
+        return np.zeros(0)
+    counts = np.array([len(outline) for outline in outlines])
+    valid = counts >= 3
+    areas = np.zeros(len(outlines))
+    if valid.any():
+        rings = [outline for outline, ok in zip(outlines, valid) if ok]
+        coords = np.array([point[:2] for ring in rings for point in ring], dtype=float)
+        ring_index = np.repeat(np.arange(len(rings)), counts[valid])
+        # One ragged build of all rings, then one area call; closing the ring is left to shapely
+        polygons = shapely.polygons(shapely.linearrings(coords, indices=ring_index))
+        areas[valid] = shapely.area(polygons)
+    return areas
+
+
+def _resolve_all(scene, entity_ids):
+    """resolve_entity for many ids; the overlay's removed list is turned into a set once."""
+    modified, removed = scene['modified'], set(scene['removed'])
+    return [modified[entity_id] if entity_id in modified else None if entity_id in removed else PRISTINE.get(entity_id)
+            for entity_id in entity_ids]
+
+
+def kpi_deltas(before, after):
+    """{key: after - before} for numeric KPIs that changed (nested dicts compared per key)."""
+    deltas = {}
+    for key, value in after.items():
+        previous = before.get(key) if before else None
+        if isinstance(value, dict):
+            nested = kpi_deltas(previous or {}, value)
+            nested.update({k: -v for k, v in (previous or {}).items() if k not in value})
+            if nested:
+                deltas[key] = nested
+        elif isinstance(value, (int, float)) and value != (previous or 0):
+            deltas[key] = round(value - (previous or 0), 4)
+    return deltas
+
+
+class KPIEngine:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self._site = None
+        self._pristine = None  # {'areas': {entity_id: m2}, 'by_use': {use: m2}}
+        self._lock = threading.Lock()
+        self.stats = {'scene_updates': 0, 'issue_updates': 0, 'entities_measured': 0}
+
+    # --- Static site figures (3D layers) ---
+    def site(self):
+        if self._site is None:
+            with self._lock:
+                if self._site is None:
+                    self._site = self._load_site()
+        return self._site
+
+    def _load_site(self):
+        shapely, np = _shapely()
+        layers, heights = {}, np.zeros(0)
+        for name in THREE_D_LAYERS:
+            try:
+                with open(os.path.join(self.data_dir, f"{name}.geojson"), 'r') as f:
+                    text = f.read()
+                # The whole FeatureCollection is parsed natively into one collection, one member per feature
+                collection = shapely.from_geojson(text)
+            except (IOError, shapely.errors.GEOSException) as e:
+                log.warning("KPI layer %s unavailable: %s", name, e)
+                layers[name] = np.array([], dtype=object)
+                continue
+            layers[name] = shapely.get_geometry(collection, np.arange(shapely.get_num_geometries(collection)))
+            if name == 'buildings_3d':
+                heights = np.array([(feature.get('properties') or {}).get('height') or 0
+                                    for feature in json.loads(text).get('features', [])], dtype=float)
+
+        everything = np.concatenate(list(layers.values()))
+        # Site: the bounding box of every 3D layer
+        min_x, min_y, max_x, max_y = shapely.total_bounds(everything) if len(everything) else (0, 0, 0, 0)
+        site_area = float((max_x - min_x) * (max_y - min_y))
+        footprints = shapely.area(layers['buildings_3d'])
+        storeys = np.maximum(1, np.round(heights / STOREY_HEIGHT_M))
+        footprint = float(footprints.sum())
+        green = float(shapely.area(layers['greens']).sum())
+        open_space = float(shapely.area(layers['open_spaces']).sum())
+        return {
+            'site_area_m2': round(site_area, 1),
+            'built_footprint_m2': round(footprint, 1),
+            'site_coverage': round(footprint / site_area, 4) if site_area else 0.0,
+            'floor_area_m2': round(float((footprints * storeys).sum()), 1),
+            'green_ratio': round(green / site_area, 4) if site_area else 0.0,
+            'open_space_ratio': round((green + open_space) / site_area, 4) if site_area else 0.0,
+            'average_storeys': round(float((footprints * storeys).sum() / footprint), 2) if footprint else 1.0,
+        }
+
+    # --- Plan figures (ripple scene) ---
+    def _pristine_totals(self):
+        if self._pristine is None:
+            with self._lock:
+                if self._pristine is None:
+                    entities = PRISTINE.entities
+                    areas = polygon_areas([entity.get('raw_geometry') or [] for entity in entities])
+                    by_use = {}
+                    for entity, area in zip(entities, areas.tolist()):
+                        by_use[entity['layer']] = by_use.get(entity['layer'], 0.0) + area
+                    self._pristine = {'areas': {e['id']: a for e, a in zip(entities, areas.tolist())}, 'by_use': by_use}
+        return self._pristine
+
+    def _measure(self, entities):
+        """Areas of entities (None -> 0); pristine entities are looked up, edited ones measured in one batch."""
+        pristine = self._pristine_totals()['areas']
+        areas = [0.0] * len(entities)
+        pending = []
+        for i, entity in enumerate(entities):
+            if entity is None:
+                continue
+            if entity is PRISTINE.get(entity['id']):
+                areas[i] = pristine[entity['id']]
+            else:
+                pending.append(i)
+        if pending:
+            for i, area in zip(pending, polygon_areas([entities[i].get('raw_geometry') or [] for i in pending]).tolist()):
+                areas[i] = area
+            with self._lock:
+                self.stats['entities_measured'] += len(pending)
+        return areas
+
+    def derive(self, by_use, affordable_share=DEFAULT_AFFORDABLE_SHARE):
+        """Full KPI dict from the running per-use footprint totals and the affordable share."""
+        site = self.site()
+        residential_floor_area = sum(by_use.get(use, 0.0) for use in RESIDENTIAL_USES) * site['average_storeys']
+        dwellings = residential_floor_area / UNIT_AREA_M2
+        return {
+            **site,
+            'plan_footprint_m2': round(sum(by_use.values()), 1),
+            'plan_footprint_by_use': {use: round(area, 1) for use, area in sorted(by_use.items()) if area > 1e-6},
+            'residential_floor_area_m2': round(residential_floor_area, 1),
+            'dwelling_units': int(dwellings),
+            'affordable_share': affordable_share,
+            'affordable_units': int(dwellings * affordable_share / 100),
+        }
+
+    def scene_totals(self, scene):
+        """Per-use footprint totals for a scene overlay, from the pristine totals plus what the overlay touched."""
+        touched = [*scene['modified'], *scene['removed']]
+        return self.apply_scene_change(dict(self._pristine_totals()['by_use']),
+                                       {'version': 0, 'modified': {}, 'removed': []}, scene, touched)
+
+    def apply_scene_change(self, by_use, old_scene, new_scene, entity_ids):
+        """New per-use totals after an edit that touched entity_ids (a journal entry's ids)."""
+        entity_ids = list(entity_ids)
+        before, after = _resolve_all(old_scene, entity_ids), _resolve_all(new_scene, entity_ids)
+        by_use = dict(by_use)
+        for entities, sign in ((before, -1), (after, 1)):
+            for entity, area in zip(entities, self._measure(entities)):
+                if entity is not None:
+                    by_use[entity['layer']] = by_use.get(entity['layer'], 0.0) + sign * area
+        with self._lock:
+            self.stats['scene_updates'] += 1
+        return by_use
+
+    def issue_update(self, kpis, issues):
+        """KPIs after a negotiation issue change: only the affordable figures move."""
+        share = (issues or {}).get('affordable_housing', {}).get('share_percentage', DEFAULT_AFFORDABLE_SHARE)
+        updated = {**kpis, 'affordable_share': share,
+                   'affordable_units': int(kpis.get('dwelling_units', 0) * share / 100)}
+        with self._lock:
+            self.stats['issue_updates'] += 1
+        return updated, kpi_deltas(kpis, updated)
+
+    # --- models.SceneState ---
+    def scene_state_update(self, state, previous=None, previous_kpis=None):
+        """
+        models.SceneUpdate for a SceneState (blocks with footprint, height and use). With the previous
+        state and its KPIs, only blocks that differ are measured; otherwise every block is.
+        """
+        from models import SceneUpdate
+        old_blocks = {block.id: block for block in previous.blocks} if previous is not None else {}
+        totals = {use: list(sums) for use, sums in (previous_kpis or {}).get('_block_totals', {}).items()} \
+            if previous is not None else {}
+        changed = [block for block in state.blocks if old_blocks.get(block.id) != block]
+        current_ids = {block.id for block in state.blocks}
+        gone = [block for block_id, block in old_blocks.items() if block_id not in current_ids]
+        replaced = [old_blocks[block.id] for block in changed if block.id in old_blocks]
+
+        def add(blocks, sign):
+            areas = polygon_areas([block.footprint for block in blocks])
+            for block, area in zip(blocks, areas.tolist()):
+                storeys = max(1, round(block.height / STOREY_HEIGHT_M))
+                use = totals.setdefault(block.use, [0.0, 0.0])
+                use[0] += sign * area
+                use[1] += sign * area * storeys
+        add(gone + replaced, -1)
+        add(changed, 1)
+
+        footprint = sum(area for area, _ in totals.values())
+        kpis = {
+            'footprint_m2': round(footprint, 1),
+            'floor_area_m2': round(sum(floor for _, floor in totals.values()), 1),
+            'footprint_by_use': {use: round(area, 1) for use, (area, _) in sorted(totals.items()) if area > 1e-6},
+            '_block_totals': totals,  # Running totals for the next incremental update
+        }
+        public = {k: v for k, v in kpis.items() if not k.startswith('_')}
+        before = {k: v for k, v in (previous_kpis or {}).items() if not k.startswith('_')}
+        state.kpis = kpis
+        return SceneUpdate(state=state, deltas=kpi_deltas(before, public), kpis=public)
+
+    def report(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+KPI_ENGINE = KPIEngine(os.path.join('frontend', 'static', '3d_data'))
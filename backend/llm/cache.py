@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- LLM Response Cache ---
+# Two tiers: an in-process LRU and an on-disk SQLite table shared by workers.
+# Keys hash the model, messages and every request parameter, so any change in
+# prompt state (history, issues, persona) is a miss.
+#
+# LLM_CACHE_MODE:
+#   off            never cache
+#   deterministic  only cache requests with temperature 0 (default)
+#   all            cache everything, including sampled replies (demos, tests, replays)
+
+CACHE_MODES = ('off', 'deterministic', 'all')
+
+
+def make_cache_key(model, messages, params):
+    payload = json.dumps({'model': model, 'messages': messages, 'params': params},
+                         sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, db_path=None, capacity=512, ttl=24 * 3600, mode='deterministic'):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}'. Expected one of {CACHE_MODES}.")
+        self.mode = mode
+        self.capacity = capacity
+        self.ttl = ttl
+        self.db_path = db_path
+        self._memory = OrderedDict()  # key -> (expires_at, content)
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_opened = False
+        self.stats = {'hits_memory': 0, 'hits_disk': 0, 'misses': 0, 'stores': 0, 'bypassed': 0}
+
+    def _disk(self):
+        """Opens the SQLite tier on first use (keeps sqlite3 out of server start-up). Call with _lock held."""
+        if not self._db_opened:
+            self._db_opened = True
+            if self.db_path:
+                import sqlite3
+                os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+                self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, content TEXT NOT NULL, expires_at REAL NOT NULL)")
+                self._purge()  # Rows left by earlier runs would otherwise accumulate forever
+        return self._db
+
+    def _purge(self):
+        """Deletes expired rows. Call with _lock held and the disk tier open."""
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        self._db.commit()
+
+    def accepts(self, params):
+        """Whether a request with these parameters may be served from / stored in the cache."""
+        if self.mode == 'off':
+            return False
+        if self.mode == 'deterministic':
+            return params.get('temperature', 1.0) == 0
+        return True
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.stats['hits_memory'] += 1
+                return entry[1]
+            if entry:
+                del self._memory[key]
+
+            if self._disk() is not None:
+                row = self._db.execute(
+                    "SELECT content, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > now:
+                    self._remember(key, row[1], row[0])
+                    self.stats['hits_disk'] += 1
+                    return row[0]
+                if row:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key, content):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, content)
+            if self._disk() is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, content, expires_at) VALUES (?, ?, ?)",
+                    (key, content, expires_at))
+                self._db.commit()
+            self.stats['stores'] += 1
+
+    def _remember(self, key, expires_at, content):
+        self._memory[key] = (expires_at, content)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def record_bypass(self):
+        with self._lock:
+            self.stats['bypassed'] += 1
+
+    def purge_expired(self):
+        with self._lock:
+            if self._disk() is not None:
+                self._purge()
+
+    def report(self):
+        with self._lock:
+            lookups = self.stats['hits_memory'] + self.stats['hits_disk'] + self.stats['misses']
+            hits = self.stats['hits_memory'] + self.stats['hits_disk']
+            return {
+                **self.stats,
+                'mode': self.mode,
+                'memory_entries': len(self._memory),
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0
+            }
+
+
+RESPONSE_CACHE = ResponseCache(
+    db_path=os.environ.get('LLM_CACHE_PATH', os.path.join('.llm_cache', 'responses.sqlite3')),
+    capacity=int(os.environ.get('LLM_CACHE_CAPACITY', 512)),
+    ttl=float(os.environ.get('LLM_CACHE_TTL', 24 * 3600)),
+    mode=os.environ.get('LLM_CACHE_MODE', 'deterministic')
+)
+
+
+def cached_chat_completion(create, model, messages, **params):
+    """
+    Runs create(model=..., messages=..., **params) (a chat.completions.create
+    callable) through RESPONSE_CACHE and returns the reply text.
+    """
+    if not RESPONSE_CACHE.accepts(params):
+        RESPONSE_CACHE.record_bypass()
+        completion = create(model=model, messages=messages, **params)
+        return completion.choices[0].message.content
+
+    key = make_cache_key(model, messages, params)
+    content = RESPONSE_CACHE.get(key)
+    if content is not None:
+        return content
+
+    completion = create(model=model, messages=messages, **params)
+    content = completion.choices[0].message.content
+    if content is not None:
+        RESPONSE_CACHE.put(key, content)
+    return content
@@ -0,0 +1,184 @@
+import importlib.util
+import logging
+import os
+import random
+import threading
+import time
+from .ratelimit import AdaptiveRateLimiter, PRIORITY_INTERACTIVE, estimate_tokens
+from telemetry import record_llm_call
+
+
+log = logging.getLogger('ripple.llm')
+
+# --- Pooled LLM Client ---
+# One OpenAI client per provider, on a tuned keep-alive httpx pool, so NPC
+# calls at round start reuse warm connections instead of each paying for
+# TCP/TLS setup. Retries live here (the SDK's own retries are disabled) so
+# backoff is exponential with full jitter and shows up in the metrics.
+# Every attempt first takes a slot from the process-wide RATE_LIMITER.
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+RATE_LIMITER = AdaptiveRateLimiter(rpm=_env_int('LLM_RPM', 500), tpm=_env_int('LLM_TPM', 200000))
+
+
+class LLMClientManager:
+    def __init__(self, base_url=None, api_key=None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_connections = _env_int('LLM_MAX_CONNECTIONS', 32)
+        self.max_keepalive = _env_int('LLM_MAX_KEEPALIVE', 16)
+        self.keepalive_expiry = _env_float('LLM_KEEPALIVE_EXPIRY', 60.0)
+        self.timeout = _env_float('LLM_TIMEOUT', 30.0)
+        self.max_retries = _env_int('LLM_MAX_RETRIES', 3)
+        self.backoff_base = _env_float('LLM_BACKOFF_BASE', 0.5)
+        self.backoff_cap = _env_float('LLM_BACKOFF_CAP', 8.0)
+        self.http2 = os.environ.get('LLM_HTTP2', '1') != '0' and importlib.util.find_spec('h2') is not None
+
+        self._client = None
+        self._last_used = None
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Per-thread first-byte timestamp of the call in flight
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'http_requests': 0,
+            'requests_sent': 0,
+            'connections_opened': 0,
+            'calls': 0,
+            'retries': 0,
+            'failures': 0,
+            'warmups': 0
+        }
+
+    # --- Client construction ---
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._build_client()
+        return self._client
+
+    def _build_client(self):
+        import httpx
+        from openai import OpenAI, DefaultHttpxClient
+
+        http_client = DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=5.0),
+            http2=self.http2,
+            event_hooks={'request': [self._on_request], 'response': [self._on_response]}
+        )
+        return OpenAI(base_url=self.base_url, api_key=self.api_key, http_client=http_client, max_retries=0)
+
+    def _on_request(self, request):
+        self._count('http_requests')
+        request.extensions['trace'] = self._on_trace
+
+    def _on_response(self, response):
+        # Response hooks fire once headers arrive, before the body is read
+        if getattr(self._local, 'first_byte', None) is None:
+            self._local.first_byte = time.perf_counter()
+
+    def _on_trace(self, event_name, info):
+        # httpcore only emits connect_tcp when it has to open a new connection
+        if event_name == 'connection.connect_tcp.complete':
+            self._count('connections_opened')
+        elif event_name in ('http11.send_request_headers.started', 'http2.send_request_headers.started'):
+            self._count('requests_sent')
+
+    def _count(self, key, amount=1):
+        with self._metrics_lock:
+            self.metrics[key] += amount
+
+    # --- Calls ---
+
+    def create_completion(self, priority=PRIORITY_INTERACTIVE, **request):
+        """chat.completions.create behind the rate limiter, with exponential backoff + full jitter on transient errors."""
+        self._count('calls')
+        cost = estimate_tokens(request.get('messages', []), request.get('max_tokens'))
+        attempt = 0
+        started = time.perf_counter()
+        queued = 0.0
+        while True:
+            queued += RATE_LIMITER.acquire(cost, priority)
+            try:
+                self._last_used = time.monotonic()
+                self._local.first_byte = None
+                sent = time.perf_counter()
+                completion = self.client.chat.completions.create(**request)
+                RATE_LIMITER.on_success()
+                self._record_call(request.get('model', 'unknown'), queued, sent, started, completion)
+                return completion
+            except Exception as e:
+                if getattr(e, 'status_code', None) == 429:
+                    RATE_LIMITER.on_throttled()
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    self._count('failures')
+                    raise
+                delay = self._retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+                attempt += 1
+                self._count('retries')
+                time.sleep(delay)
+
+    def _record_call(self, model, queued, sent, started, completion):
+        first_byte = self._local.first_byte
+        usage = getattr(completion, 'usage', None)
+        record_llm_call(model, queued, first_byte - sent if first_byte is not None else None,
+                        time.perf_counter() - started,
+                        getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None))
+
+    def warm(self):
+        """Opens a pooled connection ahead of a round if the pool may have gone idle."""
+        if self._last_used is not None and time.monotonic() - self._last_used < self.keepalive_expiry * 0.8:
+            return False
+        self._last_used = time.monotonic()
+        try:
+            self.client.models.list()
+        except Exception as e:
+            log.debug("LLM warmup failed: %s", e)
+            return False
+        self._count('warmups')
+        return True
+
+    @staticmethod
+    def _is_retryable(error):
+        import openai
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        status = getattr(error, 'status_code', None)
+        return status in RETRYABLE_STATUS
+
+    def _retry_after(self, error):
+        response = getattr(error, 'response', None)
+        if response is None:
+            return None
+        value = response.headers.get('retry-after')
+        try:
+            return min(self.backoff_cap, float(value)) if value is not None else None
+        except ValueError:
+            return None
+
+    def report(self):
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        metrics['connections_reused'] = max(0, metrics['requests_sent'] - metrics['connections_opened'])
+        metrics['reuse_ratio'] = round(metrics['connections_reused'] / metrics['requests_sent'], 3) if metrics['requests_sent'] else 0.0
+        metrics['http2'] = self.http2
+        return metrics
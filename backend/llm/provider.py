@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+from functools import partial
+from .cache import cached_chat_completion, make_cache_key
+from .client import LLMClientManager, RATE_LIMITER
+from .ratelimit import SingleFlight, PRIORITY_INTERACTIVE
+
+
+log = logging.getLogger('ripple.llm')
+
+# --- LLM Provider ---
+# One process-wide provider replaces the per-call `OpenAI()` construction in
+# server.py. Any OpenAI-compatible endpoint works, including the local
+# stand-in (llm/standin_server.py), via configuration:
+#
+#   LLM_PROVIDER   openai (default) | mock
+#   LLM_BASE_URL   e.g. http://127.0.0.1:5055/v1 for the stand-in server
+#   LLM_API_KEY    falls back to OPENAI_API_KEY
+
+
+class ProviderUnavailable(Exception):
+    """Raised when the provider cannot serve requests (e.g. no API key configured)."""
+
+
+class LLMProvider:
+    name = 'base'
+
+    def available(self):
+        return True
+
+    def complete(self, model, messages, priority=PRIORITY_INTERACTIVE, coalesce_key=None, **params):
+        """
+        Returns the reply text of a chat completion.
+        priority orders queued requests (lower first); concurrent calls with the
+        same coalesce_key (e.g. "<game_id>:<npc_id>") and identical request share one result.
+        """
+        raise NotImplementedError
+
+    def warm(self):
+        """Prepares connections before a round (no-op by default)."""
+        return False
+
+    def report(self):
+        """Provider-specific metrics for /api/llm/stats."""
+        return {}
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI (or any compatible server) behind a single shared, pooled client."""
+    name = 'openai'
+
+    def __init__(self, base_url=None, api_key=None):
+        self.manager = LLMClientManager(base_url=base_url, api_key=api_key)
+        self._flights = SingleFlight()
+        self._ready = False
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def _ensure_client(self):
+        """Builds the client on first use. A failure is not remembered: the next call tries again (e.g. once the key is set)."""
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            try:
+                self.manager.client
+                self._ready = True
+                return
+            except Exception as e:
+                self._failures += 1
+                # Warn once; callers keep retrying every round while the key is missing
+                log.log(logging.WARNING if self._failures == 1 else logging.DEBUG, "OpenAI client failed: %s", e)
+                raise ProviderUnavailable(str(e)) from e
+
+    def available(self):
+        try:
+            self._ensure_client()
+            return True
+        except ProviderUnavailable:
+            return False
+
+    def complete(self, model, messages, priority=PRIORITY_INTERACTIVE, coalesce_key=None, **params):
+        self._ensure_client()
+        create = partial(self.manager.create_completion, priority=priority)
+        if coalesce_key is None:
+            return cached_chat_completion(create, model, messages, **params)
+        flight_key = (coalesce_key, make_cache_key(model, messages, params))
+        return self._flights.do(flight_key, lambda: cached_chat_completion(create, model, messages, **params))
+
+    def warm(self):
+        return self.available() and self.manager.warm()
+
+    def report(self):
+        return {**self.manager.report(), 'coalesced': self._flights.coalesced, 'rate_limiter': RATE_LIMITER.report()}
+
+
+class MockProvider(LLMProvider):
+    """Reports itself unavailable so callers use their offline fallback text."""
+    name = 'mock'
+
+    def available(self):
+        return False
+
+    def complete(self, model, messages, priority=PRIORITY_INTERACTIVE, coalesce_key=None, **params):
+        raise ProviderUnavailable("Mock provider does not generate completions.")
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_llm_provider():
+    """Returns the process-wide provider, building it from the environment on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = build_provider_from_env()
+    return _provider
+
+
+def set_llm_provider(provider):
+    """Swaps the process-wide provider (tests, load runs)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
+def build_provider_from_env():
+    kind = os.environ.get('LLM_PROVIDER', 'openai')
+    if kind == 'mock':
+        return MockProvider()
+    if kind == 'openai':
+        return OpenAIProvider(
+            base_url=os.environ.get('LLM_BASE_URL') or None,
+            api_key=os.environ.get('LLM_API_KEY') or None  # None lets the SDK read OPENAI_API_KEY
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER '{kind}'. Expected 'openai' or 'mock'.")
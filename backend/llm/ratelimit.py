@@ -0,0 +1,133 @@
+import heapq
+import itertools
+import threading
+import time
+
+# --- LLM Rate Limiting ---
+# A process-wide token bucket for requests/min and tokens/min, shared by all
+# games. Waiters are served strictly by (priority, arrival), so an active
+# player's round jumps ahead of background work. On provider 429s the
+# effective rate backs off multiplicatively and recovers additively (AIMD),
+# which keeps throughput at the provider limit without bursts of errors.
+
+PRIORITY_INTERACTIVE = 0   # A player is waiting on this round
+PRIORITY_BACKGROUND = 10   # Speculative / batch work
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """Cheap token estimate (~4 characters per token) plus the completion budget."""
+    prompt = sum(len(str(m.get('content', ''))) for m in messages) // 4
+    return prompt + (max_tokens or 256)
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rpm, tpm, min_scale=0.25, decrease=0.7, increase=0.05):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.min_scale = min_scale
+        self.decrease = decrease
+        self.increase = increase
+        self.scale = 1.0
+
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._last_refill = time.monotonic()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {'granted': 0, 'throttled': 0, 'wait_seconds': 0.0, 'max_queue': 0}
+
+    @property
+    def enabled(self):
+        return self.rpm > 0 and self.tpm > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._requests = min(self.rpm * self.scale, self._requests + elapsed * self.rpm * self.scale / 60.0)
+        self._tokens = min(self.tpm * self.scale, self._tokens + elapsed * self.tpm * self.scale / 60.0)
+
+    def _seconds_until(self, cost):
+        need_requests = max(0.0, 1 - self._requests) * 60.0 / (self.rpm * self.scale)
+        need_tokens = max(0.0, cost - self._tokens) * 60.0 / (self.tpm * self.scale)
+        return max(need_requests, need_tokens)
+
+    def acquire(self, cost, priority=PRIORITY_INTERACTIVE):
+        """Blocks until one request and `cost` tokens are available; returns seconds waited."""
+        if not self.enabled:
+            return 0.0
+        start = time.monotonic()
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            cost = min(cost, self.tpm * self.scale)
+            heapq.heappush(self._waiters, ticket)
+            self.stats['max_queue'] = max(self.stats['max_queue'], len(self._waiters))
+            while True:
+                self._refill()
+                if self._waiters[0] == ticket:
+                    if self._requests >= 1 and self._tokens >= cost:
+                        self._requests -= 1
+                        self._tokens -= cost
+                        heapq.heappop(self._waiters)
+                        self.stats['granted'] += 1
+                        waited = time.monotonic() - start
+                        self.stats['wait_seconds'] += waited
+                        self._cond.notify_all()
+                        return waited
+                    self._cond.wait(self._seconds_until(cost))
+                else:
+                    self._cond.wait()
+
+    def on_throttled(self):
+        """Provider returned 429: cut the effective rate."""
+        with self._cond:
+            self.scale = max(self.min_scale, self.scale * self.decrease)
+            self._requests = min(self._requests, self.rpm * self.scale)
+            self._tokens = min(self._tokens, self.tpm * self.scale)
+            self.stats['throttled'] += 1
+
+    def on_success(self):
+        if self.scale < 1.0:
+            with self._cond:
+                self.scale = min(1.0, self.scale + self.increase)
+
+    def report(self):
+        with self._cond:
+            return {**self.stats, 'scale': round(self.scale, 3), 'queued': len(self._waiters),
+                    'rpm': self.rpm, 'tpm': self.tpm}
+
+
+class SingleFlight:
+    """Collapses concurrent identical calls (same key) into one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'event': threading.Event(), 'result': None, 'error': None}
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
@@ -0,0 +1,176 @@
+"""
+Local OpenAI-compatible stand-in for performance tests, load tests and offline CI.
+
+    python backend/llm/standin_server.py --port 5055 --latency-ms 400 --jitter-ms 150 --error-rate 0.02
+
+Then run the game with LLM_BASE_URL=http://127.0.0.1:5055/v1 and any LLM_API_KEY.
+Replies are deterministic for a given request (and --seed), or taken in order
+from a --script file: a JSON list whose items are either reply objects/strings
+or {"match": "<substring of the last user message>", "reply": ...}.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONFIG = {
+    'latency_ms': 0,
+    'jitter_ms': 0,
+    'error_rate': 0.0,
+    'error_status': 429,
+    'script': []
+}
+STATE = {'cursor': 0, 'requests': 0, 'errors': 0}
+_lock = threading.Lock()
+_rng = random.Random(0)
+
+
+def _digest(messages):
+    return int(hashlib.sha256(json.dumps(messages, sort_keys=True).encode('utf-8')).hexdigest(), 16)
+
+
+def _default_reply(messages):
+    """A deterministic reply in the shape the game's prompts ask for."""
+    system_text = next((m['content'] for m in messages if m.get('role') == 'system'), '')
+    digest = _digest(messages)
+
+    if '"action"' in system_text:  # update_plan command interpreter
+        return {"action": "clarify", "message": "The stand-in server does not interpret commands. Please be more specific."}
+
+    if '"npcs"' in system_text:  # Batched multi-NPC prompt: one entry per listed id
+        ids = [line.split(':', 1)[1].split(';')[0].strip()
+               for line in system_text.splitlines() if line.startswith('- id:')]
+        return {"npcs": {npc_id: {
+            "thought_process": "Stand-in reasoning.",
+            "dialogue": f"[Stand-in] {npc_id} has heard your proposal and will consider it.",
+            "score_delta": (digest >> (i * 5)) % 21 - 10
+        } for i, npc_id in enumerate(ids)}}
+
+    return {
+        "thought_process": "Stand-in reasoning.",
+        "dialogue": "[Stand-in] I have heard your proposal and will consider it against my objectives.",
+        "score_delta": digest % 21 - 10
+    }
+
+
+def _scripted_reply(messages):
+    script = CONFIG['script']
+    if not script:
+        return None
+    last_user = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), '')
+    for item in script:
+        if isinstance(item, dict) and 'match' in item and item['match'] in last_user:
+            return item['reply']
+    unmatched = [item for item in script if not (isinstance(item, dict) and 'match' in item)]
+    if not unmatched:
+        return None
+    with _lock:
+        reply = unmatched[STATE['cursor'] % len(unmatched)]
+        STATE['cursor'] += 1
+    return reply
+
+
+def chat_completions(body):
+    messages = body.get('messages', [])
+
+    with _lock:
+        STATE['requests'] += 1
+        delay = CONFIG['latency_ms'] + _rng.uniform(-CONFIG['jitter_ms'], CONFIG['jitter_ms'])
+        fail = _rng.random() < CONFIG['error_rate']
+        if fail:
+            STATE['errors'] += 1
+    time.sleep(max(0.0, delay) / 1000.0)
+
+    if fail:
+        return CONFIG['error_status'], {'error': {'message': 'Stand-in injected error.', 'type': 'rate_limit_error'}}
+
+    reply = _scripted_reply(messages)
+    if reply is None:
+        reply = _default_reply(messages)
+    content = reply if isinstance(reply, str) else json.dumps(reply)
+
+    prompt_tokens = sum(len(str(m.get('content', ''))) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return 200, {
+        'id': f"chatcmpl-standin-{STATE['requests']}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'standin'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop'
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        }
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so clients can reuse connections
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            return self._send_json(400, {'error': {'message': 'Invalid JSON body.'}})
+        if self.path.rstrip('/') == '/v1/chat/completions':
+            return self._send_json(*chat_completions(body))
+        self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/v1/models':
+            return self._send_json(200, {'object': 'list', 'data': [{'id': 'standin', 'object': 'model'}]})
+        if self.path.rstrip('/') == '/stats':
+            return self._send_json(200, {**STATE, 'config': {k: v for k, v in CONFIG.items() if k != 'script'}})
+        self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+    def log_message(self, format, *args):
+        pass  # Per-request access logs would dominate load-test output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in LLM server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=429)
+    parser.add_argument('--script', help="JSON file with scripted replies.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    CONFIG.update({
+        'latency_ms': args.latency_ms,
+        'jitter_ms': args.jitter_ms,
+        'error_rate': args.error_rate,
+        'error_status': args.error_status
+    })
+    if args.script:
+        with open(args.script, 'r') as f:
+            CONFIG['script'] = json.load(f)
+    _rng.seed(args.seed)
+
+    server = ThreadingHTTPServer((args.host, args.port), StandInHandler)
+    print(f"Stand-in LLM server listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import time
+
+# --- Logging ---
+# Standard-library logging with a queue in front of the real handler: request
+# threads only enqueue records, and a QueueListener thread formats and writes
+# them, so stdout I/O stays off the request path. Use lazy %-style arguments
+# (log.debug("... %s", x)) so disabled levels cost nothing to format.
+#
+#   LOG_LEVEL    DEBUG | INFO (default) | WARNING | ERROR
+#   LOG_FORMAT   text (default) | json
+#
+# Every record carries the game_id of the request (or background task) that
+# produced it, and known secrets are redacted before anything is written.
+
+SECRET_ENV_VARS = ('OPENAI_API_KEY', 'LLM_API_KEY')
+SECRET_PATTERNS = (
+    re.compile(r'sk-[A-Za-z0-9_\-]{8,}'),
+    re.compile(r'(?i)(bearer\s+)[A-Za-z0-9_\-\.]{8,}'),
+)
+REDACTED = '[REDACTED]'
+
+_game_id = contextvars.ContextVar('game_id', default=None)
+_listener = None
+
+
+def bind_game_id(game_id):
+    """Sets the correlation id for log records from the current request/task."""
+    _game_id.set(game_id)
+
+
+def run_with_game_id(game_id, fn, *args, **kwargs):
+    """Runs fn with game_id bound (for work submitted to thread pools)."""
+    bind_game_id(game_id)
+    return fn(*args, **kwargs)
+
+
+def redact(text):
+    for name in SECRET_ENV_VARS:
+        value = os.environ.get(name)
+        if value and len(value) >= 8:
+            text = text.replace(value, REDACTED)
+    for pattern in SECRET_PATTERNS:
+        text = pattern.sub(lambda m: (m.group(1) if m.groups() else '') + REDACTED, text)
+    return text
+
+
+class GameIdFilter(logging.Filter):
+    """Stamps records with the caller's game_id; runs on the calling thread, where the context lives."""
+
+    def filter(self, record):
+        record.game_id = _game_id.get()
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s [%(game_id)s] %(message)s')
+
+    def format(self, record):
+        return redact(super().format(record))
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'game_id': getattr(record, 'game_id', None),
+            'msg': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return redact(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+def configure_logging(level=None, fmt=None, stream=None):
+    """Installs the queue handler on the 'ripple' logger (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or os.environ.get('LOG_FORMAT', 'text')
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(GameIdFilter())
+
+    logger = logging.getLogger('ripple')
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)  # Flushes queued records on shutdown
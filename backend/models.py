@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Any, Optional
 
 class Block(BaseModel):
@@ -28,3 +28,30 @@ class SceneCard(BaseModel):
     snapshot: bytes
     deltas: Dict[str, Any]
     kpis: Dict[str, Any]
+
+# --- Negotiation Characters ---
+# A character is split into an immutable profile (stored once per game, see
+# characters.py) and the small mutable state that changes between requests.
+
+class CharacterProfile(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='allow')  # Player profiles carry extra form fields
+
+    id: str
+    role_id: str
+    role_name: str
+    name: str
+    is_player: bool = False
+    influence: int = 1
+    initial_stance: Optional[str] = None
+    max_tokens: int = 8
+    persona_dna: Optional[List[Any]] = None
+
+class CharacterState(BaseModel):
+    id: str
+    stance_score: float = 50
+    stance: Optional[str] = None
+    influence_tokens: int = 0
+    trust_value: float = 50
+    polarization_score: float = 0
+    previous_stance_category: Optional[str] = None
+    skipped_round: bool = False
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import threading
+from flask import current_app, make_response, render_template, request
+from jinja2 import FileSystemBytecodeCache
+
+# --- Page Render Cache ---
+# Landing, chapter, onboarding and the /game shell depend only on static data
+# (at most on the player's role), yet were re-rendered on every request.
+# RENDER_CACHE renders each (template, key) once, keeps the encoded body and
+# its ETag in memory, and answers If-None-Match with 304. It is bypassed while
+# templates auto-reload (debug), so template edits show up immediately.
+#
+# Templates themselves are compiled once and kept as Jinja bytecode on disk
+# (TEMPLATE_CACHE_DIR), so new workers skip the parse/compile step too.
+
+
+class RenderCache:
+    def __init__(self):
+        self._pages = {}  # (template, key) -> (body_bytes, etag)
+        self._lock = threading.Lock()
+        self.stats = {'renders': 0, 'hits': 0, 'not_modified': 0}
+
+    def page(self, template, key=None, max_age=0, private=False, **context):
+        """
+        Response for a page whose content depends only on (template, key).
+        private pages vary by session (e.g. /onboarding by role) and are never stored by shared caches.
+        """
+        enabled = not current_app.jinja_env.auto_reload
+        cache_key = (template, key)
+        entry = self._pages.get(cache_key) if enabled else None
+        if entry is None:
+            body = render_template(template, **context).encode('utf-8')
+            entry = (body, hashlib.sha256(body).hexdigest()[:32])
+            with self._lock:
+                self.stats['renders'] += 1
+                if enabled:
+                    self._pages[cache_key] = entry
+        else:
+            with self._lock:
+                self.stats['hits'] += 1
+
+        response = make_response(entry[0])
+        response.mimetype = 'text/html'
+        response.set_etag(entry[1])
+        if private:
+            response.cache_control.private = True
+            response.vary.add('Cookie')
+        else:
+            response.cache_control.public = True
+        if max_age:
+            response.cache_control.max_age = max_age
+        else:
+            response.cache_control.no_cache = True  # Revalidate every time; 304 when unchanged
+        response.make_conditional(request)
+        if response.status_code == 304:
+            with self._lock:
+                self.stats['not_modified'] += 1
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def report(self):
+        with self._lock:
+            return {**self.stats, 'pages': len(self._pages)}
+
+
+RENDER_CACHE = RenderCache()
+
+
+def precompile_templates(app, cache_dir=None):
+    """Compiles every template now (and persists bytecode) instead of on each template's first request."""
+    cache_dir = cache_dir or os.environ.get('TEMPLATE_CACHE_DIR', '.jinja_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    for name in app.jinja_env.list_templates(extensions=('html',)):
+        app.jinja_env.get_template(name)
@@ -0,0 +1,212 @@
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# --- Scene Cards ---
+# models.SceneCard has a snapshot field, but nothing produced one. Cards are
+# now rasterized on the CPU with Pillow (no GPU, no browser), in a pool of
+# worker processes so rendering never runs on a request thread and several
+# states render in parallel. Images are cached by a hash of the scene's
+# content, not its version: an undo returns to a state whose card is already
+# in the cache. Requests only ever look the cache up (SCENE_CARDS.get) or
+# schedule a render (SCENE_CARDS.request); nobody waits for a worker.
+#
+# Ripple scenes are overlays over the shared pristine scene (scene_store.py),
+# so their content key is the hash of the overlay alone; SceneState inputs
+# (models.py) are keyed by their blocks.
+
+log = logging.getLogger('ripple.scene_cards')
+
+CARD_SIZE = (480, 320)
+CARD_FORMATS = {'png': ('PNG', 'image/png'), 'webp': ('WEBP', 'image/webp')}
+BACKGROUND = (250, 250, 250)
+EDGE = (90, 90, 90)
+LAYER_COLORS = {
+    'residential': (214, 196, 160),
+    'public services': (160, 190, 220),
+    'hospital': (230, 150, 150),
+    'edu&health': (200, 170, 220),
+    'school': (240, 200, 120),
+    'hotel': (150, 200, 190),
+    'btr': (190, 160, 130),
+    'tbd': (200, 200, 200),
+}
+PADDING = 8
+
+
+def _layer_color(layer):
+    color = LAYER_COLORS.get(layer)
+    if color is None:
+        digest = hashlib.md5(str(layer).encode('utf-8')).digest()  # Stable colour for layers without one
+        color = tuple(120 + b % 110 for b in digest[:3])
+    return color
+
+
+def render_card(polygons, size=CARD_SIZE, image_format='PNG'):
+    """Rasterizes [(layer, [[x, y], ...]), ...] to image bytes. Runs in a worker process."""
+    from PIL import Image, ImageDraw  # Only worker processes pay for the import
+
+    width, height = size
+    image = Image.new('RGB', size, BACKGROUND)
+    points = [point for _, outline in polygons for point in outline]
+    if points:
+        min_x, max_x = min(p[0] for p in points), max(p[0] for p in points)
+        min_y, max_y = min(p[1] for p in points), max(p[1] for p in points)
+        scale = min((width - 2 * PADDING) / ((max_x - min_x) or 1), (height - 2 * PADDING) / ((max_y - min_y) or 1))
+        offset_x = (width - (max_x - min_x) * scale) / 2
+        offset_y = (height - (max_y - min_y) * scale) / 2
+        draw = ImageDraw.Draw(image)
+        for layer, outline in polygons:
+            if len(outline) < 3:
+                continue
+            # World y grows upwards, image y downwards
+            draw.polygon([(offset_x + (x - min_x) * scale, height - offset_y - (y - min_y) * scale) for x, y in outline],
+                         fill=_layer_color(layer), outline=EDGE)
+    buffer = io.BytesIO()
+    if image_format == 'PNG':
+        image.save(buffer, format=image_format, optimize=True)
+    else:
+        image.save(buffer, format=image_format, quality=80, method=4)
+    return buffer.getvalue()
+
+
+def polygons_from_entities(entities):
+    return [(entity.get('layer'), entity.get('raw_geometry') or []) for entity in entities]
+
+
+def polygons_from_scene_state(state):
+    """Block footprints of a models.SceneState (or its dict form), coloured by use."""
+    blocks = state.get('blocks', []) if isinstance(state, dict) else [block.model_dump() for block in state.blocks]
+    return [(block.get('use'), block.get('footprint') or []) for block in blocks]
+
+
+def content_key(kind, content):
+    """Hash of what a card shows; equal scenes share one card whatever their version."""
+    canonical = json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f"{kind}:{canonical}".encode('utf-8')).hexdigest()[:32]
+
+
+def _worker_context():
+    """
+    Workers come from a forkserver with this module and Pillow preloaded, not from fork(): the
+    server's LLM pool and persistence threads must not be cloned. Spawn is the fallback where
+    forkserver is missing. As with any non-fork start method, workers import the main module
+    again, so it must keep its entry point under `if __name__ == '__main__':` (server.py does).
+    """
+    try:
+        context = multiprocessing.get_context('forkserver')
+    except ValueError:
+        return multiprocessing.get_context('spawn')
+    context.set_forkserver_preload([__name__, 'PIL.Image', 'PIL.ImageDraw'])
+    return context
+
+
+class SceneCardRenderer:
+    """Content-addressed card cache in front of a process pool; lookups and scheduling never block."""
+
+    def __init__(self, workers=2, capacity=256):
+        self.workers = workers
+        self.capacity = capacity
+        self._cards = OrderedDict()  # (key, format) -> image bytes
+        self._pending = {}  # (key, format) -> Future
+        self._pool = None
+        self._lock = threading.Lock()
+        self.stats = {'requested': 0, 'hits': 0, 'rendered': 0, 'errors': 0, 'render_ms': 0.0}
+
+    def _executor(self):
+        if self._pool is None:
+            if self.workers > 0:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_worker_context())
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scene-card')
+        return self._pool
+
+    def _discard_pool(self, pool):
+        """Drops a pool whose worker died (a broken pool refuses all work); the next request starts a new one."""
+        if pool is not None and self._pool is pool:
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            log.warning("Scene card pool broken; starting a new one on the next request")
+
+    def get(self, key, fmt='png'):
+        """Cached image bytes, or None if the card has not been rendered (yet)."""
+        with self._lock:
+            image = self._cards.get((key, fmt))
+            if image is not None:
+                self._cards.move_to_end((key, fmt))
+                self.stats['hits'] += 1
+            return image
+
+    def pending(self, key, fmt='png'):
+        with self._lock:
+            return (key, fmt) in self._pending
+
+    def request(self, key, polygons_factory, fmt='png'):
+        """
+        Schedules rendering of the card `key` unless it is cached or already being rendered.
+        polygons_factory() is only called when a render is actually needed.
+        """
+        slot = (key, fmt)
+        with self._lock:
+            self.stats['requested'] += 1
+            if slot in self._cards or slot in self._pending:
+                return key
+        polygons = polygons_factory()
+        with self._lock:
+            if slot in self._cards or slot in self._pending:
+                return key
+            started = time.perf_counter()
+            pool = self._executor()
+            try:
+                future = pool.submit(render_card, polygons, CARD_SIZE, CARD_FORMATS[fmt][0])
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                pool = self._executor()
+                future = pool.submit(render_card, polygons, CARD_SIZE, CARD_FORMATS[fmt][0])
+            self._pending[slot] = future
+        future.add_done_callback(lambda done: self._finished(slot, done, started, pool))
+        return key
+
+    def _finished(self, slot, future, started, pool):
+        try:
+            image = future.result()
+        except Exception as e:  # A broken pool or a bad outline must not take the server down
+            log.warning("Scene card %s failed: %s", slot[0], e)
+            with self._lock:
+                self._pending.pop(slot, None)
+                self.stats['errors'] += 1
+                if isinstance(e, BrokenProcessPool):
+                    self._discard_pool(pool)
+            return
+        with self._lock:
+            self._pending.pop(slot, None)
+            self._cards[slot] = image
+            self._cards.move_to_end(slot)
+            while len(self._cards) > self.capacity:
+                self._cards.popitem(last=False)
+            self.stats['rendered'] += 1
+            self.stats['render_ms'] += (time.perf_counter() - started) * 1000
+
+    def card(self, key, deltas, kpis, fmt='png'):
+        """models.SceneCard for a rendered card, or None while it is not ready."""
+        image = self.get(key, fmt)
+        if image is None:
+            return None
+        from models import SceneCard
+        return SceneCard(snapshot=image, deltas=deltas, kpis=kpis)
+
+    def report(self):
+        with self._lock:
+            return {**self.stats, 'render_ms': round(self.stats['render_ms'], 1), 'cached': len(self._cards),
+                    'pending': len(self._pending), 'workers': self.workers}
+
+
+SCENE_CARDS = SceneCardRenderer(workers=int(os.environ.get('SCENE_CARD_WORKERS', 2)))
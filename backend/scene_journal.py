@@ -0,0 +1,76 @@
+import os
+from scene_store import resolve_entity, scene_entities
+
+# --- Versioned Scenes ---
+# /get-scene used to return the whole ripple scene (~1.1 MB for scene.json)
+# after every edit, even when one entity changed. A scene now carries a
+# 'version' that every committed edit (update_plan, undo, redo, reset)
+# increments, and the session keeps a short change journal next to it:
+#   [{'version': 7, 'added': [ids], 'removed': [ids], 'modified': [ids]}, ...]
+# A client that knows version N asks for scene_delta(..., since=N) and gets
+# only the entities added, removed or modified after N. If the journal no
+# longer reaches back to N, it gets the full scene (marked 'full': true).
+# Scenes are overlays over the shared pristine scene (scene_store.py), so
+# diffing two versions only looks at the entities either of them touched.
+
+JOURNAL_LIMIT = int(os.environ.get('SCENE_JOURNAL_LIMIT', 50))  # Edits a delta can span before a full reload
+
+
+def diff_scenes(old_scene, new_scene):
+    """(added, removed, modified) entity ids between two scene overlays."""
+    touched = {*old_scene['modified'], *new_scene['modified'], *old_scene['removed'], *new_scene['removed']}
+    added, removed, modified = [], [], []
+    for entity_id in touched:
+        before, after = resolve_entity(old_scene, entity_id), resolve_entity(new_scene, entity_id)
+        if before is None and after is not None:
+            added.append(entity_id)
+        elif before is not None and after is None:
+            removed.append(entity_id)
+        elif before is not after and before != after:
+            modified.append(entity_id)
+    return added, removed, modified
+
+
+def commit_scene(old_scene, new_scene, journal):
+    """
+    Stamps new_scene with the next version and journals what changed since old_scene.
+    Returns the journal entry, or None (and leaves the version alone) if nothing changed.
+    """
+    added, removed, modified = diff_scenes(old_scene, new_scene)
+    version = old_scene.get('version', 0)
+    if not (added or removed or modified):
+        new_scene['version'] = version
+        return None
+    entry = {'version': version + 1, 'added': added, 'removed': removed, 'modified': modified}
+    new_scene['version'] = entry['version']
+    journal.append(entry)
+    del journal[:-JOURNAL_LIMIT]
+    return entry
+
+
+def scene_delta(scene, journal, since):
+    """
+    What a client at version `since` needs to reach the scene's current version:
+    {'version', 'since', 'full': False, 'added': [entities], 'modified': [entities], 'removed': [ids]},
+    or {'version', 'full': True, 'entities': [...]} when the journal does not cover `since`.
+    """
+    version = scene.get('version', 0)
+    entries = [entry for entry in journal if entry['version'] > since]
+    covered = since == version or (0 <= since < version and entries and entries[0]['version'] == since + 1)
+    if not covered:
+        return {'version': version, 'full': True, 'entities': list(scene_entities(scene))}
+
+    # Net effect per entity: its first change tells whether it existed at `since`, the current scene whether it exists now
+    existed_before = {}
+    for entry in entries:
+        for kind in ('added', 'removed', 'modified'):
+            for entity_id in entry[kind]:
+                existed_before.setdefault(entity_id, kind != 'added')
+    delta = {'version': version, 'since': since, 'full': False, 'added': [], 'modified': [], 'removed': []}
+    for entity_id, existed in existed_before.items():
+        entity = resolve_entity(scene, entity_id)
+        if entity is not None:
+            delta['modified' if existed else 'added'].append(entity)
+        elif existed:
+            delta['removed'].append(entity_id)
+    return delta
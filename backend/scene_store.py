@@ -0,0 +1,125 @@
+import copy
+import json
+import os
+import threading
+
+# --- Shared Pristine Scene ---
+# Every ripple session used to json.load scene.json (~1.1 MB) and keep two
+# copies of it in its session file (the pristine scene and the current one),
+# plus one more per undo/redo step. Now scene.json is parsed once per process
+# into PRISTINE, which all sessions share by reference and nobody mutates. A
+# session's scene is a copy-on-write overlay over it:
+#   {'version': 3, 'modified': {entity_id: entity}, 'removed': [entity_id, ...]}
+# holding only the entities that differ from the pristine scene, so a session
+# (and each undo/redo step) costs kilobytes. Edits go through SceneEdit, which
+# copies an entity the first time it is written and leaves the overlay it
+# started from untouched (the undo stack still points at it).
+
+
+class PristineScene:
+    """scene.json parsed once and shared read-only by every session."""
+
+    def __init__(self, path):
+        self.path = path
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        loaded = self._loaded
+        if loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    with open(self.path, 'rb') as f:
+                        raw = f.read()
+                    entities = tuple(json.loads(raw).get('entities', []))
+                    self._loaded = {'entities': entities, 'by_id': {e['id']: e for e in entities},
+                                    'json': raw}
+                loaded = self._loaded
+        return loaded
+
+    @property
+    def entities(self):
+        return self._load()['entities']
+
+    def get(self, entity_id):
+        return self._load()['by_id'].get(entity_id)
+
+    def json_bytes(self):
+        """The original file, served as is (no re-encoding of 1 MB per request)."""
+        return self._load()['json']
+
+
+PRISTINE = PristineScene(os.path.join('frontend', 'static', 'scene.json'))
+
+
+def new_scene():
+    return {'version': 0, 'modified': {}, 'removed': []}
+
+
+def resolve_entity(scene, entity_id):
+    """The entity as it is in this overlay, or None if removed or unknown."""
+    if entity_id in scene['modified']:
+        return scene['modified'][entity_id]
+    if entity_id in scene['removed']:
+        return None
+    return PRISTINE.get(entity_id)
+
+
+def scene_entities(scene):
+    """Yields the scene's entities in pristine order (read-only: edit through SceneEdit)."""
+    modified = scene['modified']
+    removed = set(scene['removed'])
+    for entity in PRISTINE.entities:
+        entity_id = entity['id']
+        if entity_id not in removed:
+            yield modified.get(entity_id, entity)
+
+
+def materialize(scene):
+    """The full scene document ({'entities': [...], 'version': n}) as /get-scene used to return it."""
+    return {'entities': list(scene_entities(scene)), 'version': scene.get('version', 0)}
+
+
+def scene_from_entities(entities, version=0):
+    """Overlay for a full entity list (sessions saved before overlays existed)."""
+    scene = {'version': version, 'modified': {}, 'removed': []}
+    present = set()
+    for entity in entities:
+        present.add(entity['id'])
+        if PRISTINE.get(entity['id']) != entity:
+            scene['modified'][entity['id']] = entity
+    scene['removed'] = [e['id'] for e in PRISTINE.entities if e['id'] not in present]
+    return scene
+
+
+class SceneEdit:
+    """A new overlay derived from `base`; entities are copied on first write, base is never changed."""
+
+    def __init__(self, base):
+        self.base = base
+        self.scene = {'version': base.get('version', 0), 'modified': dict(base['modified']),
+                      'removed': list(base['removed'])}
+        self._copied = set()
+        self.changed = False
+
+    def entities(self):
+        return scene_entities(self.base)
+
+    def edit(self, entity_id):
+        """A private, writable copy of the entity (None if it is not in the scene)."""
+        if entity_id not in self._copied:
+            entity = resolve_entity(self.scene, entity_id)
+            if entity is None:
+                return None
+            self.scene['modified'][entity_id] = copy.deepcopy(entity)
+            self._copied.add(entity_id)
+        self.changed = True
+        return self.scene['modified'][entity_id]
+
+    def remove(self, entity_id):
+        if resolve_entity(self.scene, entity_id) is None:
+            return
+        self.scene['modified'].pop(entity_id, None)
+        self.scene['removed'].append(entity_id)
+        self._copied.discard(entity_id)
+        self.changed = True
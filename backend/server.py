@@ -1,19 +1,40 @@
 from flask import Flask, render_template, Response, request, jsonify, session, send_from_directory, redirect, url_for, flash
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room
 from typing import List
 import random
 import os
 import json
-import requests
+import copy
+import uuid
+import logging
 import math
+import time
 from collections import Counter
+from functools import lru_cache
 from flask_session import Session  # Import Flask-Session
-from openai import OpenAI
 from dotenv import load_dotenv
 from pathlib import Path
-from models import SceneState, Block, Action, SceneUpdate
-from agents.persona_engine import generate_dna_persona
+from agents.persona_engine import roll_persona_dna, persona_for
 from agents.persona_data import STYLES # Import STYLES dictionary
+from agents.npc_routing import MODEL_TIERS, TEMPLATE_MODEL, FALLBACK_TIERS, route_npc, record_tier_call, routing_report, template_reply
+from agents.plan_commands import parse_plan_command, record_plan_command, plan_command_report
+from events import EventDeck, build_role_index, new_event_log
+from characters import PROFILE_STORE, create_characters, store_characters, load_characters
+from game_actor import GAMES, record_event
+from game_feed import GameFeed
+from scene_cards import SCENE_CARDS, CARD_FORMATS, content_key, polygons_from_entities
+from scene_journal import commit_scene, scene_delta
+from geometry import apply_params, scaled_params, rotated_params
+from kpis import KPI_ENGINE, DEFAULT_AFFORDABLE_SHARE, kpi_deltas
+from scene_store import PRISTINE, SceneEdit, new_scene, materialize, scene_from_entities, scene_entities
+from llm.cache import RESPONSE_CACHE
+from llm.provider import get_llm_provider
+from llm.ratelimit import PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from speculation import SPECULATIONS, SPECULATION_EXECUTOR, state_fingerprint
+from telemetry import instrument_app, span, timed, timing_summary, render_prometheus, RECENT_TRACES
+from logging_config import configure_logging, bind_game_id, run_with_game_id
+from page_cache import RENDER_CACHE, precompile_templates
+from assets import init_assets
 # import ezdxf
 from werkzeug.utils import secure_filename
 
@@ -21,9 +42,9 @@ from werkzeug.utils import secure_filename
 dotenv_path = Path('.') / '.env'  # Explicitly point to .env in current directory
 load_dotenv(dotenv_path=dotenv_path)
 
-# --- Debug: Check if API key is loaded --- #
-print(f"DEBUG: OPENAI_API_KEY loaded from environ: {os.environ.get('OPENAI_API_KEY')}")
-# --- End Debug --- #
+configure_logging()  # LOG_LEVEL / LOG_FORMAT; see logging_config.py
+log = logging.getLogger('ripple.server')
+log.info("OPENAI_API_KEY %s", "loaded" if os.environ.get('OPENAI_API_KEY') else "not set")
 
 # --- Setup ---
 # Calculate absolute paths to ensure Flask finds templates/static regardless of where the script is run from
@@ -34,12 +55,11 @@ STATIC_DIR = os.path.join(PROJECT_ROOT, 'frontend', 'static')
 THREE_JS_DIR = os.path.join(PROJECT_ROOT, 'frontend', 'static', '3d_client')
 THREE_DATA_DIR = os.path.join(PROJECT_ROOT, 'frontend', 'static', '3d_data')
 
-print(f"DEBUG: BASE_DIR: {BASE_DIR}")
-print(f"DEBUG: PROJECT_ROOT: {PROJECT_ROOT}")
-print(f"DEBUG: TEMPLATE_DIR: {TEMPLATE_DIR}")
-print(f"DEBUG: STATIC_DIR: {STATIC_DIR}")
-print(f"DEBUG: THREE_JS_DIR: {THREE_JS_DIR}")
-print(f"DEBUG: Does THREE_JS_DIR exist? {os.path.isdir(THREE_JS_DIR)}")
+log.debug("BASE_DIR: %s", BASE_DIR)
+log.debug("PROJECT_ROOT: %s", PROJECT_ROOT)
+log.debug("TEMPLATE_DIR: %s", TEMPLATE_DIR)
+log.debug("STATIC_DIR: %s", STATIC_DIR)
+log.debug("THREE_JS_DIR: %s (exists: %s)", THREE_JS_DIR, os.path.isdir(THREE_JS_DIR))
 
 app = Flask(__name__, template_folder=TEMPLATE_DIR, static_folder=STATIC_DIR)
 socketio = SocketIO(app, cors_allowed_origins="*")
@@ -51,6 +71,53 @@ app.config['SESSION_PERMANENT'] = False  # Session expires when browser closes
 app.config['SESSION_USE_SIGNER'] = True  # Encrypt session cookie identifier
 app.config['SESSION_FILE_DIR'] = './.flask_session'  # Optional: Specify directory
 Session(app)  # Initialize the session extension
+PROFILE_STORE.directory = os.path.join(app.config['SESSION_FILE_DIR'], 'profiles')  # Immutable character profiles, one file per game
+GAMES.directory = os.path.join(app.config['SESSION_FILE_DIR'], 'games')  # Authoritative game state; the session keeps only game_id
+PRISTINE.path = os.path.join(STATIC_DIR, 'scene.json')  # Parsed once per process; sessions keep copy-on-write overlays
+KPI_ENGINE.data_dir = THREE_DATA_DIR  # Site KPIs are measured once per process from the 3D layers
+instrument_app(app)  # Per-request timing traces (see telemetry.py)
+init_assets(app, STATIC_DIR)  # Hashed, immutable asset URLs once scripts/assets/build_assets.py has run
+if os.environ.get('PRECOMPILE_TEMPLATES', '1') != '0':
+    precompile_templates(app)
+
+# Served with their own validators (ETag / Last-Modified) and Cache-Control
+SESSIONLESS_ENDPOINTS = {'static', 'hashed_asset', 'view_3d', 'serve_3d_assets', 'home', 'chapter_selection',
+                         'chapter_introduction', 'game', 'scene_card_image'}
+CACHEABLE_ENDPOINTS = SESSIONLESS_ENDPOINTS | {'onboarding', 'role_selection', 'get_negotiation_state'}
+
+
+@app.before_request
+def bind_request_game_id():
+    # Correlation id on every log line of this request. Endpoints that never touch the
+    # session are skipped, since reading it makes Flask-Session add Vary: Cookie
+    if request.endpoint not in SESSIONLESS_ENDPOINTS:
+        bind_game_id(session.get('game_id'))
+
+
+def current_game():
+    """Last committed state of this session's game (read-only), or None."""
+    return GAMES.snapshot(session.get('game_id'), legacy_session=session)
+
+
+def game_command(name):
+    """Runs the enclosed block as the next serialized command on this session's game; yields its working state."""
+    return GAMES.command(session.get('game_id'), name, legacy_session=session)
+
+
+def game_seed(game_data):
+    return game_data.get('negotiation_state', {}).get('seed', game_data.get('game_id'))
+
+
+def seeded_rng(seed, *salt):
+    return random.Random(':'.join(str(part) for part in (seed, *salt)))
+
+
+def game_rng(game_data, *salt):
+    """
+    Random source for one game step, derived from the game's seed. Every draw a command makes
+    is reproducible from the seed and the logged commands, which is what makes replays deterministic.
+    """
+    return seeded_rng(game_seed(game_data), *salt)
 
 
 # --- Game Constants ---
@@ -69,6 +136,7 @@ INITIAL_TRUST = 50  # Default starting trust value (0-100)
 MAX_PLAYER_TOKENS = 12  # Maximum tokens the player can hold
 BASE_LEAK_CHANCE = 0.4 # 40% chance for pressure to leak
 POLARIZATION_SPREAD_IMPACT = 4 # Impact on others if pressure leaks
+MAX_INFLUENCE_BATCH = 10  # Actions accepted by one /influence/batch request
 
 INFLUENCE_ACTION_COSTS = {
     "gentle_persuasion": 1,
@@ -107,6 +175,12 @@ CONSENSUS_THRESHOLD_PERCENT = 0.60  # 60% of participants must be 'Support'
 INFLUENCE_THRESHOLD_PERCENT = 0.60  # 60% of *total influence* must come from 'Support'
 FAILURE_SUPPORT_THRESHOLD_PERCENT = 0.25  # If 'Support' participants are <= 25%, it's a failure
 CRITICAL_CLIMATE_THRESHOLD = 20  # If climate drops <= 20, it's a failure
+NPC_BATCH_SIZE = int(os.environ.get('LLM_NPC_BATCH_SIZE', 0))  # >1 asks for that many NPC replies per completion
+NPC_BATCH_TOKENS_PER_NPC = 220  # Completion budget per NPC in batched mode
+NPC_REPLY_LOG_FIELDS = ('response', 'score_delta', 'score_change', 'new_score', 'thought_process', 'source')  # Logged per NPC reply
+SPECULATIVE_PREP = os.environ.get('SPECULATIVE_PREP', '1') != '0'  # Pre-apply the round's event and warm the LLM pool
+SPECULATIVE_DRAFTS = os.environ.get('SPECULATIVE_DRAFTS', '0') == '1'  # Draft NPC replies from partial statements (costs tokens)
+ROUND_TIMING = os.environ.get('ROUND_TIMING', '0') == '1'  # Add a per-span timing block to AJAX round responses
 
 # Sample names for AI characters
 SAMPLE_NAMES = ["Alex", "Ben", "Casey", "Devin", "Erin", "Frankie", "Gabby", "Hayden", "Izzy", "Jamie", "Fatima Ahmed", "David Chen", "Maria Garcia", "Kenji Tanaka", "Chloe Dubois"]
@@ -136,6 +210,7 @@ MASTERPLAN_DATA = load_scenario_data(os.path.join('scenarios', 'masterplan.json'
 
 ROLES = SCENARIO_DATA.get('roles', {})
 MICRO_EVENTS = SCENARIO_DATA.get('micro_events', [])
+EVENT_DECK = EventDeck(MICRO_EVENTS)  # Alias tables built once per process
 CONTEXT = SCENARIO_DATA.get('context', {})
 
 # --- Onboarding Data (Added from Design Phase) ---
@@ -235,7 +310,7 @@ def onboarding():
         return redirect(url_for('role_selection'))
     
     data = ONBOARDING_DATA[role_id]
-    return render_template('onboarding.html', role=data)
+    return RENDER_CACHE.page('onboarding.html', key=role_id, private=True, role=data)
 
 @app.route('/customization', methods=['GET', 'POST'])
 def customization():
@@ -247,7 +322,7 @@ def customization():
     
     if request.method == 'POST':
         # 1. Create Player Profile
-        session['player_profile'] = {
+        player_profile = {
             'role_id': role_id,
             'role_name': data['role_name'],
             'portrait': data['portrait'],
@@ -271,28 +346,42 @@ def customization():
         # 2. Generate AI Opponents
         # We need to ensure generate_ai_opponents is available. 
         # If it's defined later in the file, this call works.
-        ai_opponents = generate_ai_opponents(role_id)
+        # Personas are rolled here (seeded per game) so round one has no generation work
+        game_seed = request.form.get('seed', type=int)
+        if game_seed is None:
+            game_seed = random.SystemRandom().randrange(2**32)
+        ai_opponents = generate_ai_opponents(role_id, random.Random(game_seed))
         
         # Set initial stances for AI
         for opponent in ai_opponents:
             opponent['stance'] = get_stance_category(opponent['stance_score'])
             
-        all_characters = ai_opponents + [session['player_profile']]
-        random.shuffle(all_characters)
-        session['characters'] = all_characters
+        all_characters = ai_opponents + [player_profile]
+        random.Random(f"{game_seed}:panel").shuffle(all_characters)  # Seeded like game_rng(game, 'panel'): same seed, same panel order
+        game = {'player_profile': player_profile}
+        create_characters(game, uuid.uuid4().hex, all_characters)
+        bind_game_id(game['game_id'])
+        game['role_index'] = build_role_index(all_characters)  # Positions are stable after the shuffle
 
         # 3. Initialize Negotiation State
-        session['negotiation_state'] = {
+        game['negotiation_state'] = {
             'round': 1,
+            'seed': game_seed,
             'history': [],
             'outcome': None,
             'negotiation_climate': 50,
+            'event_log': new_event_log(),
             'issues': {
                 'affordable_share': 35,
                 'cultural_venue_scale': 'medium',
                 'housing_location_mix': 'balanced'
             }
         }
+        GAMES.create(game['game_id'], game, events=[{
+            'type': 'game_created', 'seed': game_seed, 'role_id': role_id,
+            'profiles': PROFILE_STORE.get(game['game_id'])  # Makes the log self-contained for replays
+        }])
+        session['game_id'] = game['game_id']  # All other game state lives with the game's actor
         
         # 4. Start Game
         return redirect(url_for('home_gaming'))
@@ -378,29 +467,42 @@ def customization():
 # ]
 
 
-def trigger_and_apply_event(characters, climate_score, current_round):
+@timed('event_apply')
+def trigger_and_apply_event(characters, climate_score, current_round, issues=None, event_log=None, role_index=None,
+                            rng=random):
     """
     Checks if a random event should trigger based on EVENT_PROBABILITY.
-    If triggered, selects a random event, applies its effects to characters
-    and climate score, and returns the updated state and event text.
+    If triggered, draws a weighted event from EVENT_DECK (respecting cooldowns
+    and preconditions), applies its effects to characters and climate score,
+    and returns the updated state and event text.
+    Chained follow-ups scheduled in event_log fire without the probability roll.
     Handles stance clamping (0-100) and skip_round effect.
+    Pass game_rng(game, 'event', round) as rng so the draw is reproducible.
     """
     event_triggered_info = None
     event_text = None
+    if event_log is None:
+        event_log = new_event_log()
+    if role_index is None:
+        role_index = build_role_index(characters)
+
+    chosen_event = EVENT_DECK.pop_due_chain(current_round, climate_score, issues, event_log)
+    if chosen_event is None and rng.random() < EVENT_PROBABILITY:
+        chosen_event = EVENT_DECK.draw(current_round, climate_score, issues, event_log, rng)
 
-    if random.random() < EVENT_PROBABILITY:
-        chosen_event = random.choice(MICRO_EVENTS)
+    if chosen_event:
+        EVENT_DECK.record(chosen_event, current_round, event_log, rng)
         event_text = f"**Event Occurred (Round {current_round}):** {chosen_event['text']}"
         effects = chosen_event['effects']
         event_triggered_info = chosen_event  # Store for potential later use/logging
-        print(f"--- EVENT TRIGGERED: {chosen_event['id']} ---")  # Server log
+        log.info("Event triggered: %s (round %s)", chosen_event['id'], current_round)
 
         # Apply climate delta
         climate_delta = effects.get('climate_delta', 0)
         if climate_delta != 0:
             original_climate = climate_score
             climate_score = max(0, min(100, climate_score + climate_delta))
-            print(f"EVENT: Climate changed by {climate_delta} from {original_climate} to {climate_score}")
+            log.debug("Event: climate changed by %s from %s to %s", climate_delta, original_climate, climate_score)
 
         # Identify affected characters
         stance_delta = effects.get('stance_delta', 0)
@@ -412,14 +514,14 @@ def trigger_and_apply_event(characters, climate_score, current_round):
         if target_type == 'all':
             affected_chars_for_event = characters
         elif target_type == 'role' and target_role:
-            affected_chars_for_event = [char for char in characters if char['role_id'] == target_role]
+            affected_chars_for_event = [characters[pos] for pos in role_index.get(target_role, [])]
         elif target_type == 'role_specific' and target_role:
             # Find all eligible characters for the specific role
-            eligible_chars = [char for char in characters if char['role_id'] == target_role and not char.get(
-                'skipped_round')]  # Avoid affecting already skipped
+            eligible_chars = [characters[pos] for pos in role_index.get(target_role, [])
+                              if not characters[pos].get('skipped_round')]  # Avoid affecting already skipped
             if eligible_chars:
                 # Pick one randomly from eligible ones
-                char_to_affect = random.choice(eligible_chars)
+                char_to_affect = rng.choice(eligible_chars)
                 affected_chars_for_event = [char_to_affect]
 
         # Apply effects to identified characters
@@ -430,13 +532,13 @@ def trigger_and_apply_event(characters, climate_score, current_round):
                 char['stance_score'] = max(0, min(100, original_score + stance_delta))
                 # Recalculate stance category after score change
                 char['stance'] = get_stance_category(char['stance_score'])
-                print(
-                    f"EVENT: Stance for {char['name']} ({char['role_id']}) changed by {stance_delta} -> {char['stance_score']} ({char['stance']})")
+                log.debug("Event: stance for %s (%s) changed by %s -> %s (%s)",
+                          char['name'], char['role_id'], stance_delta, char['stance_score'], char['stance'])
 
             # Apply skip_round effect (only applies if target was role_specific)
             if apply_skip and target_type == 'role_specific':
                 char['skipped_round'] = True  # Mark character as skipping this round
-                print(f"EVENT: {char['name']} ({char['role_id']}) will skip this round due to event.")
+                log.debug("Event: %s (%s) will skip this round", char['name'], char['role_id'])
 
     # Return potentially modified characters, climate, and the event message
     return characters, climate_score, event_text, event_triggered_info
@@ -454,17 +556,17 @@ def get_stance_category(score):
 
 @app.route('/')
 def home():
-    return render_template('landing.html')
+    return RENDER_CACHE.page('landing.html', max_age=300)
 
 
 @app.route('/chapter_selection')
 def chapter_selection():
-    return render_template('chapter_selection.html')
+    return RENDER_CACHE.page('chapter_selection.html', max_age=300)
 
 
 @app.route('/chapter/1')
 def chapter_introduction():
-    return render_template('chapter_introduction.html')
+    return RENDER_CACHE.page('chapter_introduction.html', max_age=300)
 
 
 @app.route('/role_selection', methods=['GET', 'POST'])
@@ -481,8 +583,9 @@ def role_selection():
 
     # Clear any previous session data when returning to role selection
     session.pop('player_role_id', None)
-    session.pop('player_profile', None)
-    return render_template('role_selection.html', roles=ROLES)
+    session.pop('game_id', None)
+    # Revalidated each visit, so the pops above still run; private, since the reply can carry the session cookie
+    return RENDER_CACHE.page('role_selection.html', private=True, roles=ROLES)
 
 # Character Customization Route (Legacy - Redirecting to new flow if hit directly)
 @app.route('/customize', methods=['GET', 'POST'])
@@ -507,7 +610,7 @@ def test_custom():
 def negotiation_group():
     # This page is now less relevant in the main flow but can be kept for debugging
     # or showing the initial group before the first round starts.
-    characters = session.get('characters')
+    characters = load_characters(current_game() or {})
     if not characters:
         return redirect(url_for('role_selection'))  # Need characters setup first
 
@@ -518,14 +621,15 @@ def negotiation_group():
 
 @app.route('/home')
 def home_gaming():
-    if 'player_profile' not in session:
+    game = current_game()
+    if not game or 'player_profile' not in game:
          return redirect(url_for('role_selection'))
     
-    player = session['player_profile']
-    negotiation_state = session.get('negotiation_state', {})
+    player = game['player_profile']
+    negotiation_state = game.get('negotiation_state', {})
     current_round = negotiation_state.get('round', 1)
     climate_score = negotiation_state.get('negotiation_climate', 50)
-    characters = session.get('characters', [])
+    characters = load_characters(game)
     
     # Get top 3 stakeholders (excluding player)
     # For MVP, just take the first 3 AI characters
@@ -540,152 +644,214 @@ def home_gaming():
 
 @app.route('/characters')
 def characters_profiles():
-    if 'player_profile' not in session:
+    game = current_game()
+    if not game or 'player_profile' not in game:
          return redirect(url_for('role_selection'))
-    characters = session.get('characters', [])
+    characters = load_characters(game)
     return render_template('characters_profiles.html', characters=characters)
 
 @app.route('/negotiation', methods=['GET', 'POST'])
 def negotiation():
     # Ensure negotiation has been initialized
-    if 'negotiation_state' not in session or 'characters' not in session or 'player_profile' not in session:
+    game = current_game()
+    if not game or 'negotiation_state' not in game or 'characters' not in game or 'player_profile' not in game:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
              return jsonify({'status': 'error', 'message': "Session expired. Please reload."}), 403
         flash("Game session not found or incomplete. Please start a new game.", "error")
         return redirect(url_for('role_selection'))
 
-    negotiation_state = session['negotiation_state']
-    characters = session.get('characters', [])
-    player_profile = session.get('player_profile', None)
-    current_round = negotiation_state['round']
-
     if request.method == 'POST':
         try:
-            action = request.form.get('action')  # Check which button was pressed
-
-            if action == 'give_up':
-                negotiation_state['outcome'] = 'Player Gave Up'
-                negotiation_state['final_round'] = negotiation_state['round']  # Record when they gave up
-                flash('You have chosen to end the negotiation.', 'warning')
-                session['negotiation_state'] = negotiation_state
-                session.modified = True
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                     return jsonify({'status': 'redirect', 'url': url_for('negotiation')})
-                return redirect(url_for('negotiation'))
-
-            # If action wasn't 'give_up', assume 'submit_statement'
-            player_statement = request.form.get('player_statement', '').strip()
-            word_count = len(player_statement.split())
-
-            # --- Check Minimum Word Count --- #
-            if not player_statement:  # Handle empty submission separately if needed
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return jsonify({'status': 'error', 'message': "Please enter a statement."}), 400
-                flash('Please enter your statement.', 'warning')
-                return redirect(url_for('negotiation'))
-            elif word_count < MIN_STATEMENT_WORDS:
-                msg = f'Your statement must be at least {MIN_STATEMENT_WORDS} words long (currently {word_count}). Please elaborate.'
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return jsonify({'status': 'error', 'message': msg}), 400
-                flash(msg, 'error')
-                return redirect(url_for('negotiation'))
-
-            # --- Token Cost for Statement --- #
-            player_tokens = player_profile.get('influence_tokens', 0)
-            if player_tokens < 1:
-                msg = 'Not enough Influence Tokens to make a statement.'
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return jsonify({'status': 'error', 'message': msg}), 400
-                flash(msg, 'error')
-                return redirect(url_for('negotiation'))
-            else:
-                # Deduct token cost
-                player_profile['influence_tokens'] -= 1
-                # Also update the player character in the main list
-                for char in characters:
-                    if char.get('is_player'):
-                        char['influence_tokens'] = player_profile['influence_tokens']
-                        break
-                print(f"Player statement cost: 1 token. Remaining: {player_profile['influence_tokens']}")
-
-            # --- Proceed with round logic only if submitting and word count is met ---
-            player_id = session['player_profile']['id']
-
-            # --- Store previous stance *category* before potential updates --- #
-            # Note: We store the *category* derived from the score at the start of the round
-            for char in characters:
-                if not char.get('is_player'):  # Only for AI characters
-                    # Store category based on score *before* AI response potentially changes it
-                    char['previous_stance_category'] = get_stance_category(char.get('stance_score', 50))
-
-            if player_statement:
-                round_dialogue = {player_id: player_statement}  # Start round with player
-
-                # --- Clear Previous Skip Flags & Trigger/Apply Event --- #
-                for char in characters:
-                    char.pop('skipped_round', None)  # Remove flag from previous round if set
-
-                climate_score = negotiation_state.get('negotiation_climate', 50)
-                # Get current round *before* potential event happens
-                current_round = negotiation_state['round']
-                characters, climate_score, event_text, _ = trigger_and_apply_event(characters, climate_score, current_round)
-                negotiation_state['negotiation_climate'] = climate_score  # Update climate in state
-                if event_text:
+            round_reply = None
+            # The whole round is one command: a concurrent /influence or reload waits for it instead of being overwritten
+            with game_command('negotiation') as game:
+                negotiation_state = game['negotiation_state']
+                characters = load_characters(game)
+                player_profile = game['player_profile']
+
+                action = request.form.get('action')  # Check which button was pressed
+
+                if action == 'give_up':
+                    negotiation_state['outcome'] = 'Player Gave Up'
+                    negotiation_state['final_round'] = negotiation_state['round']  # Record when they gave up
+                    record_event('give_up', round=negotiation_state['round'])
+                    flash('You have chosen to end the negotiation.', 'warning')
+                    game['negotiation_state'] = negotiation_state
                     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                         pass # handled in json return
-                    else:
-                        flash(event_text, 'info')  # Display event message to player
+                         return jsonify({'status': 'redirect', 'url': url_for('negotiation')})
+                    return redirect(url_for('negotiation'))
 
-                ai_responses_data = get_ai_responses(characters, negotiation_state.get('history', []),
-                                                     player_statement, climate_score, negotiation_state.get('issues', {}))
-                round_dialogue.update({ai_id: data['response'] for ai_id, data in ai_responses_data.items()})
+                # If action wasn't 'give_up', assume 'submit_statement'
+                player_statement = request.form.get('player_statement', '').strip()
+                word_count = len(player_statement.split())
 
+                # --- Check Minimum Word Count --- #
+                if not player_statement:  # Handle empty submission separately if needed
+                    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                        return jsonify({'status': 'error', 'message': "Please enter a statement."}), 400
+                    flash('Please enter your statement.', 'warning')
+                    return redirect(url_for('negotiation'))
+                elif word_count < MIN_STATEMENT_WORDS:
+                    msg = f'Your statement must be at least {MIN_STATEMENT_WORDS} words long (currently {word_count}). Please elaborate.'
+                    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                        return jsonify({'status': 'error', 'message': msg}), 400
+                    flash(msg, 'error')
+                    return redirect(url_for('negotiation'))
+
+                # --- Token Cost for Statement --- #
+                player_tokens = player_profile.get('influence_tokens', 0)
+                if player_tokens < 1:
+                    msg = 'Not enough Influence Tokens to make a statement.'
+                    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                        return jsonify({'status': 'error', 'message': msg}), 400
+                    flash(msg, 'error')
+                    return redirect(url_for('negotiation'))
+                else:
+                    # Deduct token cost
+                    player_profile['influence_tokens'] -= 1
+                    # Also update the player character in the main list
+                    for char in characters:
+                        if char.get('is_player'):
+                            char['influence_tokens'] = player_profile['influence_tokens']
+                            break
+                    log.debug("Player statement cost: 1 token. Remaining: %s", player_profile['influence_tokens'])
+
+                # --- Proceed with round logic only if submitting and word count is met ---
+                player_id = player_profile['id']
+
+                # --- Store previous stance *category* before potential updates --- #
+                # Note: We store the *category* derived from the score at the start of the round
                 for char in characters:
-                    if not char.get('is_player') and char['id'] in ai_responses_data:
-                        char['stance_score'] = ai_responses_data[char['id']]['new_score']
-
-                total_score_change = sum(data.get('score_change', 0) for data in ai_responses_data.values())
-                ai_count = len(ai_responses_data)
-                if ai_count > 0:
-                    average_change = total_score_change / ai_count
-                    climate_change = round(average_change * 2)
-                    negotiation_state['negotiation_climate'] = max(0, min(100, climate_score + climate_change))
-
-                negotiation_state.setdefault('history', []).append(round_dialogue)
-                negotiation_state['round'] = current_round + 1
-
-                if negotiation_state['round'] > MAX_ROUNDS:
-                    negotiation_state['outcome'] = check_victory(characters, negotiation_state['negotiation_climate'],
-                                                                 negotiation_state.get('issues', {}), negotiation_state.get('history', []))
-
-                negotiation_state['issues'] = update_issues_based_on_stances(characters, negotiation_state.get('issues', {}))
-                try:
-                    requests.post("http://127.0.0.1:5006/apply-issue-update", json=negotiation_state['issues'], timeout=1)
-                except Exception as e:
-                    print(f"Could not send issue update to visualization: {e}")
-
-                session['negotiation_state'] = negotiation_state
-                session['characters'] = characters
-                session['player_profile'] = player_profile
-                session.modified = True
+                    if not char.get('is_player'):  # Only for AI characters
+                        # Store category based on score *before* AI response potentially changes it
+                        char['previous_stance_category'] = get_stance_category(char.get('stance_score', 50))
+
+                if player_statement:
+                    round_dialogue = {player_id: player_statement}  # Start round with player
+
+                    # --- Clear Previous Skip Flags & Trigger/Apply Event --- #
+                    for char in characters:
+                        char.pop('skipped_round', None)  # Remove flag from previous round if set
+
+                    climate_score = negotiation_state.get('negotiation_climate', 50)
+                    # Get current round *before* potential event happens
+                    current_round = negotiation_state['round']
+                    negotiation_state.setdefault('event_log', new_event_log())
+                    record_event('statement', round=current_round, text=player_statement)
+
+                    # Use the event (and NPC draft) prepared while the player was typing, if still valid
+                    prepared_event, draft = SPECULATIONS.take(game['game_id'],
+                                                              state_fingerprint(characters, negotiation_state), player_statement)
+                    if prepared_event:
+                        for char in characters:
+                            char.update(prepared_event['characters'].get(char['id'], {}))
+                        climate_score, event_text = prepared_event['climate'], prepared_event['event_text']
+                        event_id = prepared_event['event_id']
+                        negotiation_state['event_log'] = prepared_event['event_log']
+                    else:
+                        characters, climate_score, event_text, event_info = trigger_and_apply_event(
+                            characters, climate_score, current_round, negotiation_state.get('issues', {}),
+                            negotiation_state['event_log'], game.get('role_index'), game_rng(game, 'event', current_round))
+                        event_id = event_info['id'] if event_info else None
+                    negotiation_state['negotiation_climate'] = climate_score  # Update climate in state
+                    if event_id:
+                        record_event('event_triggered', round=current_round, event_id=event_id, climate=climate_score)
+                    if event_text:
+                        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                             pass # handled in json return
+                        else:
+                            flash(event_text, 'info')  # Display event message to player
+
+                    ai_responses_data = None
+                    if draft:
+                        try:
+                            with span('draft_wait'):
+                                ai_responses_data = draft.result()
+                        except Exception as e:
+                            log.warning("Speculative draft failed, generating normally: %s", e)
+                    if ai_responses_data is None:
+                        ai_responses_data = get_ai_responses(characters, negotiation_state.get('history', []),
+                                                             player_statement, climate_score, negotiation_state.get('issues', {}),
+                                                             game['game_id'], current_round, seed=game_seed(game))
+                    round_dialogue.update({ai_id: data['response'] for ai_id, data in ai_responses_data.items()})
+                    for ai_id, data in ai_responses_data.items():
+                        # Enough to answer the same NPC the same way when the game is replayed
+                        record_event('npc_reply', round=current_round, npc_id=ai_id,
+                                     **{field: data.get(field) for field in NPC_REPLY_LOG_FIELDS})
+
+                    for char in characters:
+                        if not char.get('is_player') and char['id'] in ai_responses_data:
+                            char['stance_score'] = ai_responses_data[char['id']]['new_score']
+
+                    total_score_change = sum(data.get('score_change', 0) for data in ai_responses_data.values())
+                    ai_count = len(ai_responses_data)
+                    if ai_count > 0:
+                        average_change = total_score_change / ai_count
+                        climate_change = round(average_change * 2)
+                        negotiation_state['negotiation_climate'] = max(0, min(100, climate_score + climate_change))
+
+                    negotiation_state.setdefault('history', []).append(round_dialogue)
+                    negotiation_state['round'] = current_round + 1
+
+                    if negotiation_state['round'] > MAX_ROUNDS:
+                        negotiation_state['outcome'] = check_victory(characters, negotiation_state['negotiation_climate'],
+                                                                     negotiation_state.get('issues', {}), negotiation_state.get('history', []),
+                                                                     negotiation_state.get('event_log'))
+
+                    # The update edits the nested issue dicts in place, so the comparison needs its own deep copy
+                    issues_before = copy.deepcopy(negotiation_state.get('issues', {}))
+                    negotiation_state['issues'] = update_issues_based_on_stances(characters, negotiation_state.get('issues', {}))
+                    if negotiation_state['issues'] != issues_before:
+                        record_event('issues_changed', round=current_round, issues=negotiation_state['issues'])
+                    record_event('round_finished', round=current_round, climate=negotiation_state['negotiation_climate'],
+                                 outcome=negotiation_state.get('outcome'))
+                    try:
+                        with span('issue_emit'):
+                            # Same broadcast /apply-issue-update does, without an HTTP round trip to ourselves
+                            socketio.emit('issue_update', negotiation_state['issues'])
+                            if negotiation_state['issues'] != issues_before and 'scene_id' in session:
+                                # Only the affordable-unit KPIs depend on the issues. They are this session's plan
+                                # figures, so they go to its ripple pages only, like scene_delta
+                                share = issues_before.get('affordable_housing', {}).get('share_percentage', DEFAULT_AFFORDABLE_SHARE)
+                                kpis, deltas = KPI_ENGINE.issue_update(scene_kpis(session_scene() or new_scene(), share),
+                                                                       negotiation_state['issues'])
+                                if deltas:
+                                    socketio.emit('kpi_update', {'kpis': kpis, 'deltas': deltas}, to=f"scene:{session['scene_id']}")
+                    except Exception as e:
+                        log.debug("Could not send issue update to visualization: %s", e)
+
+                    game['negotiation_state'] = negotiation_state
+                    store_characters(game, characters)
+                    game['player_profile'] = player_profile
+                    prepare_round_speculation(game)
                 
-                # --- Return JSON if AJAX request ---
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return jsonify({
-                        'status': 'success',
-                        'new_round': negotiation_state['round'],
-                        'climate_score': negotiation_state['negotiation_climate'],
-                        'history': format_history_as_messages(negotiation_state.get('history', [])),
-                        'player_tokens': player_profile.get('influence_tokens', 0),
-                        'event_text': event_text
-                    })
-
-            return redirect(url_for('negotiation'))
+                    # --- Return JSON if AJAX request (sent once the round is committed) ---
+                    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                        round_reply = {
+                            'status': 'success',
+                            'new_round': negotiation_state['round'],
+                            'climate_score': negotiation_state['negotiation_climate'],
+                            'player_tokens': player_profile.get('influence_tokens', 0),
+                            'event_text': event_text
+                        }
+
+                if round_reply is None:
+                    return redirect(url_for('negotiation'))
+
+            # Clients that send their cursor (`since`) get the new messages and changed stakeholders only
+            version, committed = GAMES.head(game['game_id'])
+            since = request.form.get('since', type=int)
+            if since is None:
+                round_reply.update(version=version,
+                                   history=format_history_as_messages(committed['negotiation_state'].get('history', [])))
+            else:
+                round_reply.update(GAME_FEED.payload(game['game_id'], version, committed, since))
+            if ROUND_TIMING:
+                round_reply['timing'] = timing_summary()
+            return jsonify(round_reply)
 
         except Exception as e:
-            import traceback
-            traceback.print_exc()
-            print(f"ERROR in negotiation route: {e}")
+            log.exception("Error in negotiation route: %s", e)
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return jsonify({'status': 'error', 'message': f"Server Error: {str(e)}"}), 500
             flash(f"An error occurred: {e}", "error")
@@ -693,28 +859,31 @@ def negotiation():
 
 
     # --- GET Request ---
-    regenerate_tokens_for_round(session)
+    with game_command('regenerate_tokens') as game:
+        regenerate_tokens_for_round(game)
+        previous_stances = game.pop('previous_stance', {})
+    version, game = GAMES.head(game['game_id'])  # Render exactly the state the cursor below refers to
+    prepare_round_speculation(game)
 
     characters_for_template = []
-    previous_stances = session.get('previous_stance', {})
-    for char in session.get('characters', []):
+    for char in load_characters(game):
         char_copy = char.copy()
         char_copy['previous_stance'] = previous_stances.get(char['id'])
         characters_for_template.append(char_copy)
-
-    session.pop('previous_stance', None)
     
     # Prepare state with formatted history for initial load
-    state_for_template = session.get('negotiation_state', {}).copy()
+    state_for_template = game.get('negotiation_state', {}).copy()
     if 'history' in state_for_template:
         state_for_template['history'] = format_history_as_messages(state_for_template['history'])
 
     return render_template('round_gaming.html',
                            state=state_for_template,
                            characters=characters_for_template,
-                           player_profile=session.get('player_profile', {}),
-                           climate_score=session.get('negotiation_state', {}).get('negotiation_climate', 50),
+                           player_profile=game.get('player_profile', {}),
+                           climate_score=game.get('negotiation_state', {}).get('negotiation_climate', 50),
                            max_rounds=MAX_ROUNDS,
+                           min_statement_words=MIN_STATEMENT_WORDS,
+                           version=version,
                            INFLUENCE_ACTION_COSTS=INFLUENCE_ACTION_COSTS)
 
 @app.route('/negotiation_mvp_demo')
@@ -778,25 +947,25 @@ def negotiation_mvp_demo():
 def negotiation_mvp():
     """New MVP interface for negotiation with integrated 3D visualization."""
     # Ensure negotiation has been initialized
-    if 'negotiation_state' not in session or 'characters' not in session or 'player_profile' not in session:
+    game = current_game()
+    if not game or 'negotiation_state' not in game or 'characters' not in game or 'player_profile' not in game:
         flash("Game session not found or incomplete. Please start a new game.", "error")
         return redirect(url_for('role_selection'))
 
-    negotiation_state = session['negotiation_state']
-    characters = session.get('characters', [])
-    player_profile = session.get('player_profile', None)
-    
-    # Regenerate tokens for GET requests
-    if request.method == 'GET':
-        regenerate_tokens_for_round(session)
-    
     # Process POST (same logic as regular negotiation)
     if request.method == 'POST':
         # Reuse the existing negotiation logic
         return negotiation()
+
+    # Regenerate tokens for GET requests
+    with game_command('regenerate_tokens') as game:
+        regenerate_tokens_for_round(game)
+    negotiation_state = game['negotiation_state']
+    player_profile = game.get('player_profile', None)
+    characters = load_characters(game)
     
     return render_template('negotiation_mvp.html',
-                           state=session.get('negotiation_state', {}),
+                           state=negotiation_state,
                            characters=characters,
                            player_profile=player_profile,
                            climate_score=negotiation_state.get('negotiation_climate', 50),
@@ -804,23 +973,53 @@ def negotiation_mvp():
 
 @app.route('/api/negotiation/state')
 def get_negotiation_state():
-    """API endpoint to get current negotiation state as JSON."""
-    if 'negotiation_state' not in session:
+    """
+    API endpoint to get current negotiation state as JSON.
+    With ?since=<version> (the 'version' of a previous reply) only new messages and changed
+    stakeholder fields are sent, and 304 Not Modified if nothing was committed since.
+    """
+    version, game = GAMES.head(session.get('game_id'), legacy_session=session)  # Consistent even while a round is running
+    if not game or 'negotiation_state' not in game:
         return jsonify({'error': 'No active negotiation'}), 404
-    
-    return jsonify({
-        'currentRound': session['negotiation_state'].get('round', 1),
-        'stakeholders': session.get('characters', []),
-        'playerProfile': session.get('player_profile', {}),
-        'climateScore': session['negotiation_state'].get('negotiation_climate', 50),
-        'messages': format_history_as_messages(session['negotiation_state'].get('history', [])),
-        'issues': session['negotiation_state'].get('issues', {})
-    })
 
-def format_history_as_messages(history):
-    """Convert dialogue history to message format for frontend."""
+    since = request.args.get('since', type=int)
+    etag = f"v{version}"
+    if since == version or etag in request.if_none_match:
+        GAME_FEED.not_modified()
+        response = Response(status=304)
+    else:
+        response = jsonify(GAME_FEED.payload(game['game_id'], version, game, since))
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # Always revalidated; unchanged state costs a 304
+    return response
+
+@app.route('/resume/<string:game_id>')
+def resume_game(game_id):
+    """Re-attaches this browser to an existing game (rebuilt from its snapshot and event log)."""
+    game = GAMES.snapshot(game_id)
+    if game is None:
+        flash("That game could not be found. Please start a new game.", "error")
+        return redirect(url_for('role_selection'))
+    session['game_id'] = game_id
+    session['player_role_id'] = game.get('player_profile', {}).get('role_id')
+    return redirect(url_for('negotiation'))
+
+@app.route('/api/games/<string:game_id>/log')
+def get_game_log(game_id):
+    """Audit trail of a game: its commands and domain events after ?since=<seq> (&patches=1 adds state patches)."""
+    if GAMES.snapshot(game_id) is None:
+        return jsonify({'error': 'Unknown game'}), 404
+    include_patches = request.args.get('patches') == '1'
+    records = GAMES.records(game_id, since=request.args.get('since', 0, type=int))
+    if not include_patches:
+        records = [{k: v for k, v in record.items() if k != 'patch'} for record in records]
+    return jsonify({'gameId': game_id, 'version': GAMES.version(game_id), 'records': records})
+
+def format_history_as_messages(history, start_round=0):
+    """Convert dialogue history (from start_round on) to message format for frontend."""
     messages = []
-    for round_idx, round_dialogue in enumerate(history):
+    for round_idx, round_dialogue in enumerate(history[start_round:], start_round):
         for char_id, statement in round_dialogue.items():
             is_player = char_id.startswith('player_')
             messages.append({
@@ -832,15 +1031,18 @@ def format_history_as_messages(history):
             })
     return messages
 
+GAME_FEED = GameFeed(format_history_as_messages, load_characters)  # Versioned, incremental state for polling clients
+
 @app.route('/profile/<string:char_id>')
 def view_profile(char_id):
     """Displays the profile details for a specific character."""
-    if 'characters' not in session:
+    game = current_game()
+    if not game or 'characters' not in game:
         # Or perhaps return a simple error page
         return "Character data not found in session. Please start a new game.", 404
 
     character_to_view = None
-    for char in session['characters']:
+    for char in load_characters(game):
         if char.get('id') == char_id:
             character_to_view = char
             break
@@ -878,155 +1080,378 @@ def format_history_for_prompt(history, characters_lookup):
     return prompt_history
 
 
-def get_ai_responses(characters, history, player_statement, climate_score, issues):
+def describe_npc_emotion(current_score, climate_score):
+    """Attitude description based on stance score, with a climate modifier."""
+    if current_score < 35: emotion = "Hostile / Defensive"
+    elif current_score < 45: emotion = "Skeptical / Wary"
+    elif current_score < 55: emotion = "Neutral / Waiting"
+    elif current_score < 70: emotion = "Interested / Constructive"
+    else: emotion = "Enthusiastic / Partnering"
+
+    if climate_score < 30: emotion += " (Tense Atmosphere)"
+    return emotion
+
+
+def plot_impact_for_role(role_id, plot_data):
+    """Simple sentiment based on role (Mock logic for now, can be expanded)."""
+    if role_id == 'community_activist' and 'luxury' in plot_data.get('ai_tags', []):
+        return "Negative (Symbol of Inequality)"
+    elif role_id == 'developer' and 'luxury' in plot_data.get('ai_tags', []):
+        return "Positive (High ROI)"
+    return "Neutral"
+
+
+@lru_cache(maxsize=None)
+def format_masterplan_for_role(role_id):
+    """Masterplan context with AI perception; MASTERPLAN_DATA is static, so this is built once per role."""
+    masterplan_context = "1. **The Map (Spatial Reality)**:\n"
+    for plot_id, plot_data in MASTERPLAN_DATA.items():
+        if 'description' in plot_data:
+            impact = plot_impact_for_role(role_id, plot_data)
+            masterplan_context += f"   - {plot_data['name']}: {plot_data['description']} -> Impact on you: {impact}\n"
+    return masterplan_context
+
+
+def format_issues_summary(issues):
+    return (
+        f"- Affordable Housing: {issues.get('affordable_housing', {}).get('share_percentage', 'N/A')}% share.\n"
+        f"- Cultural Venue: {issues.get('cultural_venue', {}).get('scale', 'N/A')} scale.\n"
+    )
+
+
+@timed('prompt_build')
+def build_npc_system_prompt(ai, persona, current_score, emotion, issues_summary):
+    """System prompt for a single NPC completion."""
+    role_objective = ROLES.get(ai['role_id'], {}).get('objective', 'To participate in the negotiation.')
+
+    # Inject Style Details
+    style_dna = STYLES.get(persona['style'], {})
+    style_desc = style_dna.get('desc', 'Standard')
+    style_keywords = ", ".join(style_dna.get('keywords', []))
+    style_grammar = style_dna.get('grammar', 'Standard English')
+
+    return (
+        f"[System]\n"
+        f"You are interacting in a high-stakes urban planning simulation called 'Ripple Effect'.\n"
+        f"Do not break character. Do not be polite unless your character is polite.\n\n"
+        f"[Character Profile]\n"
+        f"- Role: {ai['name']} ({ROLES.get(ai['role_id'], {}).get('name')})\n"
+        f"- Core Objective: {role_objective}\n"
+        f"- Backstory: {persona['bio']}\n"
+        f"- Deepest Fear (Pain Point): {persona['pain_point']}\n\n"
+        f"[Speaking Style Guidelines]\n"
+        f"- Description: {style_desc}\n"
+        f"- Syntax/Grammar: {style_grammar}\n"
+        f"- Key Vocabulary: {style_keywords}\n\n"
+        f"[Contextual Awareness]\n"
+        f"{format_masterplan_for_role(ai['role_id'])}\n"
+        f"2. **The Table (Negotiation State)**:\n"
+        f"   - Current Deal: {issues_summary.replace(chr(10), ', ')}\n"
+        f"   - Current Stance Score: {current_score}/100 ({emotion})\n"
+        f"   - Trust Level: {emotion}\n\n"
+        f"[Task]\n"
+        f"1. **Think First**: Analyze the player's proposal. Is it a distraction? Does it hurt your objective?\n"
+        f"2. **Select Strategy**: If trust is low, be skeptical. If high, be collaborative but demanding.\n"
+        f"3. **Draft Response**: Use your Style. MUST reference a specific Plot ID if relevant.\n\n"
+        f"[Output Format - JSON]\n"
+        f"Return a JSON object with keys: 'thought_process', 'dialogue', 'score_delta' (integer -10 to 10), 'animation_trigger' (optional string)."
+    )
+
+
+def build_npc_batch_prompt(group, issues_summary):
+    """System prompt asking for several NPC replies at once; shared context appears only once."""
+    plots = "".join(f"   - {plot_data['name']}: {plot_data['description']}\n"
+                    for plot_data in MASTERPLAN_DATA.values() if 'description' in plot_data)
+    profiles = ""
+    for npc in group:
+        ai, persona = npc['ai'], npc['persona']
+        style_dna = STYLES.get(persona['style'], {})
+        impacts = [f"{plot_data['name']}: {plot_impact_for_role(ai['role_id'], plot_data)}"
+                   for plot_data in MASTERPLAN_DATA.values()
+                   if 'description' in plot_data and plot_impact_for_role(ai['role_id'], plot_data) != "Neutral"]
+        profiles += (
+            f"- id: {ai['id']}; name: {ai['name']} ({ROLES.get(ai['role_id'], {}).get('name')})\n"
+            f"  Core Objective: {ROLES.get(ai['role_id'], {}).get('objective', 'To participate in the negotiation.')}\n"
+            f"  Backstory: {persona['bio']}\n"
+            f"  Deepest Fear (Pain Point): {persona['pain_point']}\n"
+            f"  Speaking Style: {style_dna.get('desc', 'Standard')} Grammar: {style_dna.get('grammar', 'Standard English')} "
+            f"Vocabulary: {', '.join(style_dna.get('keywords', []))}\n"
+            f"  Current Stance Score: {npc['current_score']}/100 ({npc['emotion']})\n"
+            f"  Plot impacts: {'; '.join(impacts) if impacts else 'All neutral'}\n"
+        )
+
+    return (
+        f"[System]\n"
+        f"You are voicing several characters in a high-stakes urban planning simulation called 'Ripple Effect'.\n"
+        f"Each character reacts independently, in their own voice. Do not break character. "
+        f"Do not be polite unless the character is polite.\n\n"
+        f"[Shared Context]\n"
+        f"1. **The Map (Spatial Reality)**:\n{plots}\n"
+        f"2. **The Table (Negotiation State)**:\n"
+        f"   - Current Deal: {issues_summary.replace(chr(10), ', ')}\n\n"
+        f"[Characters]\n{profiles}\n"
+        f"[Task]\n"
+        f"For EACH character: think about whether the player's proposal hurts their objective, pick a strategy "
+        f"(skeptical when trust is low, collaborative but demanding when high) and reply in their style, "
+        f"referencing a specific Plot ID if relevant.\n\n"
+        f"[Output Format - JSON]\n"
+        f"Return a JSON object {{\"npcs\": {{\"<id>\": {{\"thought_process\": ..., \"dialogue\": ..., "
+        f"\"score_delta\": integer -10 to 10}}}}}} with exactly one entry per character id listed above."
+    )
+
+
+def parse_npc_reply(ai, persona, reply_json, current_score, source='llm'):
+    """
+    Turns an NPC's JSON reply into a responses_data entry. Raises ValueError if it is malformed.
+    source ('llm', 'template' or 'fallback') is kept so a logged game can be replayed faithfully.
+    """
+    if not isinstance(reply_json, dict):
+        raise ValueError("reply is not a JSON object")
+    ai_dialogue = reply_json.get('dialogue', '...')
+    if not isinstance(ai_dialogue, str) or not ai_dialogue.strip():
+        raise ValueError("missing dialogue")
+    thought_process = reply_json.get('thought_process', '')
+    score_delta = max(-10, min(10, int(reply_json.get('score_delta', 0))))
+    score_change = score_delta
+
+    # Apply sensitivity from global ROLES
+    sensitivity = ROLES.get(ai['role_id'], {}).get('ai_response_sensitivity', 1.0)
+    score_change = int(score_change * sensitivity)
+
+    # Clamp score
+    new_score = max(0, min(100, current_score + score_change))
+
+    log.debug("%s thought: %s", ai['name'], thought_process)
+    log.debug("%s says: \"%.50s...\" (score %s)", ai['name'], ai_dialogue, score_change)
+
+    return {
+        'response': ai_dialogue,
+        'new_score': new_score,
+        'score_change': score_change,
+        'score_delta': score_delta,  # As the model sent it, before role sensitivity
+        'source': source,
+        'persona_summary': persona['summary'],
+        'thought_process': thought_process # Optional: Store for debugging/display
+    }
+
+
+def request_npc_batch(provider, group, history_text, player_statement, issues_summary, model="gpt-4o-mini",
+                      priority=PRIORITY_INTERACTIVE, game_id=None):
+    """
+    One completion for a group of NPCs. Returns {npc_id: entry} for the entries
+    that validated; anything missing or malformed is left for individual calls.
+    """
+    results = {}
+    try:
+        log.debug("Sending batched JSON request for %d NPCs", len(group))
+        reply_text = provider.complete(
+            model=model,
+            messages=[
+                {"role": "system", "content": build_npc_batch_prompt(group, issues_summary)},
+                {"role": "user", "content": f"Dialogue History:\n{history_text}\n\nPlayer says: \"{player_statement}\""}
+            ],
+            max_tokens=NPC_BATCH_TOKENS_PER_NPC * len(group),
+            timeout=max(MODEL_TIERS[npc['tier']]['timeout'] for npc in group),  # A slow batch falls back to individual calls
+            temperature=0.9,
+            response_format={"type": "json_object"},
+            priority=priority,
+            coalesce_key=f"{game_id}:{'+'.join(npc['ai']['id'] for npc in group)}" if game_id else None
+        )
+        replies = json.loads(reply_text).get('npcs', {})
+    except Exception as e:
+        log.warning("Batched request failed, falling back to individual calls: %s", e)
+        return results
+
+    for npc in group:
+        ai = npc['ai']
+        try:
+            results[ai['id']] = parse_npc_reply(ai, npc['persona'], replies.get(ai['id']), npc['current_score'])
+        except (ValueError, TypeError) as e:
+            log.info("Malformed batched entry for %s (%s); retrying individually", ai['name'], e)
+    return results
+
+
+@timed('npc_responses')
+def get_ai_responses(characters, history, player_statement, climate_score, issues, game_id=None, current_round=1,
+                     priority=PRIORITY_INTERACTIVE, seed=None):
     """
     Generates responses using the DNA Persona Engine.
+    game_id lets duplicate in-flight requests for the same NPC (e.g. a double submit) share one LLM call.
+    seed (game_seed()) rolls DNA for legacy characters that have none, the same way every round and replay.
+    priority is PRIORITY_BACKGROUND for speculative drafts.
+    Each NPC is routed to a model tier (agents/npc_routing.py) by influence, stance volatility and current_round.
+    With NPC_BATCH_SIZE > 1, NPCs are first asked in groups (per tier) with one completion per group.
     """
-    print("\n--- Generating AI Responses (Persona Engine Active) --- ")
+    log.debug("Generating AI responses")
     active_ai_characters = [c for c in characters if not c.get('is_player') and not c.get('skipped_round')]
 
     responses_data = {}
-    client = None
-    try:
-        client = OpenAI()
-    except Exception as e:
-        print(f"Warning: OpenAI client failed. Error: {e}")
+    provider = get_llm_provider()  # Shared across requests; see llm/provider.py
+    llm_ready = provider.available()
 
     # Prepare history
     char_lookup = {c['id']: c for c in characters}
     history_text = format_history_for_prompt(history, char_lookup)
+    issues_summary = format_issues_summary(issues)
 
+    # --- 1. PERSONA RETRIEVAL (DNA rolled at game creation, text rendered on demand) ---
+    # --- 2. DYNAMIC EMOTION CALCULATION ---
+    prepared = []
     for ai in active_ai_characters:
-        # --- 1. PERSONA GENERATION / RETRIEVAL ---
-        if 'persona' not in ai:
-            print(f"  [System] Generating new DNA for {ai['name']}...")
-            ai['persona'] = generate_dna_persona(ai['role_id'], ai['name'])
-        
-        persona = ai['persona']
-        
-        # --- 2. DYNAMIC EMOTION CALCULATION ---
         current_score = ai.get('stance_score', 50)
-        
-        # Attitude description based on score
-        if current_score < 35: emotion = "Hostile / Defensive"
-        elif current_score < 45: emotion = "Skeptical / Wary"
-        elif current_score < 55: emotion = "Neutral / Waiting"
-        elif current_score < 70: emotion = "Interested / Constructive"
-        else: emotion = "Enthusiastic / Partnering"
-        
-        # Climate modifier
-        if climate_score < 30: emotion += " (Tense Atmosphere)"
-        
-        # --- 3. PROMPT ENGINEERING (ULTIMATE VERSION) ---
-        issues_summary = (
-            f"- Affordable Housing: {issues.get('affordable_housing', {}).get('share_percentage', 'N/A')}% share.\n"
-            f"- Cultural Venue: {issues.get('cultural_venue', {}).get('scale', 'N/A')} scale.\n"
-        )
-        
-        role_objective = ROLES.get(ai['role_id'], {}).get('objective', 'To participate in the negotiation.')
-        
-        # Inject Style Details
-        style_dna = STYLES.get(persona['style'], {})
-        style_desc = style_dna.get('desc', 'Standard')
-        style_keywords = ", ".join(style_dna.get('keywords', []))
-        style_grammar = style_dna.get('grammar', 'Standard English')
-
-        # Inject Masterplan Context with AI Perception (Simple Logic)
-        masterplan_context = "1. **The Map (Spatial Reality)**:\n"
-        for plot_id, plot_data in MASTERPLAN_DATA.items():
-            if 'description' in plot_data:
-                # Simple sentiment based on role (Mock logic for now, can be expanded)
-                impact = "Neutral"
-                if ai['role_id'] == 'community_activist' and 'luxury' in plot_data.get('ai_tags', []):
-                    impact = "Negative (Symbol of Inequality)"
-                elif ai['role_id'] == 'developer' and 'luxury' in plot_data.get('ai_tags', []):
-                    impact = "Positive (High ROI)"
-                
-                masterplan_context += f"   - {plot_data['name']}: {plot_data['description']} -> Impact on you: {impact}\n"
-
-        system_prompt = (
-            f"[System]\n"
-            f"You are interacting in a high-stakes urban planning simulation called 'Ripple Effect'.\n"
-            f"Do not break character. Do not be polite unless your character is polite.\n\n"
-            f"[Character Profile]\n"
-            f"- Role: {ai['name']} ({ROLES.get(ai['role_id'], {}).get('name')})\n"
-            f"- Core Objective: {role_objective}\n"
-            f"- Backstory: {persona['bio']}\n"
-            f"- Deepest Fear (Pain Point): {persona['pain_point']}\n\n"
-            f"[Speaking Style Guidelines]\n"
-            f"- Description: {style_desc}\n"
-            f"- Syntax/Grammar: {style_grammar}\n"
-            f"- Key Vocabulary: {style_keywords}\n\n"
-            f"[Contextual Awareness]\n"
-            f"{masterplan_context}\n"
-            f"2. **The Table (Negotiation State)**:\n"
-            f"   - Current Deal: {issues_summary.replace(chr(10), ', ')}\n"
-            f"   - Current Stance Score: {current_score}/100 ({emotion})\n"
-            f"   - Trust Level: {emotion}\n\n"
-            f"[Task]\n"
-            f"1. **Think First**: Analyze the player's proposal. Is it a distraction? Does it hurt your objective?\n"
-            f"2. **Select Strategy**: If trust is low, be skeptical. If high, be collaborative but demanding.\n"
-            f"3. **Draft Response**: Use your Style. MUST reference a specific Plot ID if relevant.\n\n"
-            f"[Output Format - JSON]\n"
-            f"Return a JSON object with keys: 'thought_process', 'dialogue', 'score_delta' (integer -10 to 10), 'animation_trigger' (optional string)."
-        )
-
-        if not client:
-            # Mock Fallback
-            responses_data[ai['id']] = {
+        prepared.append({
+            'ai': ai,
+            'persona': persona_for(ai, seeded_rng(game_id if seed is None else seed, 'persona', ai['id'])),
+            'current_score': current_score,
+            'emotion': describe_npc_emotion(current_score, climate_score),
+            'tier': route_npc(ai, current_round, MAX_ROUNDS)
+        })
+
+    if not llm_ready:
+        # Mock Fallback
+        for npc in prepared:
+            persona = npc['persona']
+            responses_data[npc['ai']['id']] = {
                 'response': f"[Mock {persona['style']} Voice]: I am a {persona['summary']}. I hear you say '{player_statement}' but my pain point is real.",
-                'new_score': current_score,
-                'score_change': 0
+                'new_score': npc['current_score'],
+                'score_change': 0,
+                'source': 'mock'
             }
+        return responses_data
+
+    # --- 3. TEMPLATE TIER (local, no LLM call) ---
+    for npc in prepared:
+        if MODEL_TIERS[npc['tier']]['model'] == TEMPLATE_MODEL:
+            started = time.perf_counter()
+            reply = template_reply(npc['ai'], npc['persona'], player_statement)
+            responses_data[npc['ai']['id']] = parse_npc_reply(npc['ai'], npc['persona'], reply, npc['current_score'], 'template')
+            record_tier_call(npc['tier'], time.perf_counter() - started, template=True)
+
+    # --- 4. BATCHED MODE (optional, one group per model) ---
+    if NPC_BATCH_SIZE > 1:
+        by_model = {}
+        for npc in prepared:
+            if npc['ai']['id'] not in responses_data:
+                by_model.setdefault(MODEL_TIERS[npc['tier']]['model'], []).append(npc)
+        for model, pending in by_model.items():
+            if len(pending) < 2:
+                continue
+            for start in range(0, len(pending), NPC_BATCH_SIZE):
+                group = pending[start:start + NPC_BATCH_SIZE]
+                responses_data.update(request_npc_batch(provider, group, history_text, player_statement, issues_summary,
+                                                        model, priority, game_id))
+
+    # --- 5. INDIVIDUAL CALLS (default, and fallback for malformed batch entries) ---
+    for npc in prepared:
+        ai, persona, current_score = npc['ai'], npc['persona'], npc['current_score']
+        if ai['id'] in responses_data:
             continue
+        tier = MODEL_TIERS[npc['tier']]
+        system_prompt = build_npc_system_prompt(ai, persona, current_score, npc['emotion'], issues_summary)
 
+        started = time.perf_counter()
         try:
-            print(f"  [System] Sending JSON request to OpenAI for {ai['name']}...")
-            completion = client.chat.completions.create(
-                model="gpt-4o-mini", # Switched to 4o-mini for speed/cost/availability
+            log.debug("Sending JSON request for %s (%s: %s)", ai['name'], npc['tier'], tier['model'])
+            reply_text = provider.complete(
+                model=tier['model'],
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"Dialogue History:\n{history_text}\n\nPlayer says: \"{player_statement}\""}
                 ],
-                max_tokens=250,
+                max_tokens=tier['max_tokens'],
+                timeout=tier['timeout'],
                 temperature=0.9,
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                priority=priority,
+                coalesce_key=f"{game_id}:{ai['id']}" if game_id else None
             )
-            
-            ai_response_json = json.loads(completion.choices[0].message.content)
-            
-            # --- 4. PARSE JSON RESPONSE ---
-            ai_dialogue = ai_response_json.get('dialogue', '...')
-            thought_process = ai_response_json.get('thought_process', '')
-            score_change = int(ai_response_json.get('score_delta', 0))
-            
-            # Apply sensitivity from global ROLES
-            sensitivity = ROLES.get(ai['role_id'], {}).get('ai_response_sensitivity', 1.0)
-            score_change = int(score_change * sensitivity)
-            
-            # Clamp score
-            new_score = max(0, min(100, current_score + score_change))
-            
-            print(f"  -> {ai['name']} Thought: {thought_process}")
-            print(f"  -> {ai['name']} Says: \"{ai_dialogue[:50]}...\" (Score: {score_change})")
-            
-            responses_data[ai['id']] = {
-                'response': ai_dialogue,
-                'new_score': new_score,
-                'score_change': score_change,
-                'persona_summary': persona['summary'],
-                'thought_process': thought_process # Optional: Store for debugging/display
-            }
+            with span('json_parse'):
+                responses_data[ai['id']] = parse_npc_reply(ai, persona, json.loads(reply_text), current_score)
+            record_tier_call(npc['tier'], time.perf_counter() - started)
 
         except Exception as e:
-            print(f"  Error generating response for {ai['name']}: {e}")
+            log.warning("Error generating response for %s: %s", ai['name'], e)
+            if npc['tier'] in FALLBACK_TIERS:
+                # Over its latency budget or an unparseable reply: a non-decisive NPC answers from the template instead
+                reply = template_reply(ai, persona, player_statement)
+                responses_data[ai['id']] = parse_npc_reply(ai, persona, reply, current_score, 'fallback')
+                record_tier_call(npc['tier'], time.perf_counter() - started, template=True, fallback=True)
+                continue
             # Return the error as the response so we can see it in the UI
             error_msg = f"[System Error]: {str(e)}"
-            responses_data[ai['id']] = {'response': error_msg, 'new_score': current_score, 'score_change': 0}
+            responses_data[ai['id']] = {'response': error_msg, 'new_score': current_score, 'score_change': 0, 'source': 'error'}
+
+    # Keep panel order regardless of which path answered each NPC
+    return {npc['ai']['id']: responses_data[npc['ai']['id']] for npc in prepared}
+
+# --- Speculative Round Preparation --- #
+@timed('speculation_prepare')
+def prepare_round_speculation(game_data):
+    """
+    Gets the upcoming round ready while the player types: draws and applies its
+    event on copies of the state and warms the LLM connection pool. The POST
+    handler uses the result only if the round's inputs are unchanged.
+    """
+    game_id = game_data.get('game_id')
+    negotiation_state = game_data.get('negotiation_state')
+    if not SPECULATIVE_PREP or not game_id or not negotiation_state or negotiation_state.get('outcome'):
+        return
+    characters = load_characters(game_data)
+    fingerprint = state_fingerprint(characters, negotiation_state)
+    if SPECULATIONS.fingerprint(game_id) == fingerprint:
+        return  # Already prepared; keep the same event draw (no re-rolling by reloading)
+
+    # Mirror the POST handler's pre-event steps on copies
+    spec_characters = copy.deepcopy(characters)
+    for char in spec_characters:
+        char.pop('skipped_round', None)
+    event_log = copy.deepcopy(negotiation_state.get('event_log') or new_event_log())
+    current_round = negotiation_state.get('round', 1)
+    spec_characters, climate_score, event_text, event_info = trigger_and_apply_event(
+        spec_characters, negotiation_state.get('negotiation_climate', 50), current_round,
+        negotiation_state.get('issues', {}), event_log, game_data.get('role_index'),
+        game_rng(game_data, 'event', current_round))  # Same draw the POST would make
+
+    SPECULATIONS.put(game_id, fingerprint, {
+        'event': {
+            'characters': {c['id']: {'stance_score': c['stance_score'], 'stance': c.get('stance'),
+                                     'skipped_round': c.get('skipped_round', False)} for c in spec_characters},
+            'climate': climate_score,
+            'event_text': event_text,
+            'event_id': event_info['id'] if event_info else None,
+            'event_log': event_log
+        },
+        'context': {
+            'game_id': game_id,
+            'round': current_round,
+            'characters': spec_characters,
+            'history': copy.deepcopy(negotiation_state.get('history', [])),
+            'climate': climate_score,
+            'issues': copy.deepcopy(negotiation_state.get('issues', {})),
+            'seed': game_seed(game_data)
+        }
+    })
+    SPECULATION_EXECUTOR.submit(get_llm_provider().warm)
+
+
+def start_npc_draft(context, statement):
+    """Drafts the NPC replies for a prepared round in the background; returns a Future."""
+    return SPECULATION_EXECUTOR.submit(
+        run_with_game_id, context['game_id'], get_ai_responses, copy.deepcopy(context['characters']), context['history'], statement,
+        context['climate'], context['issues'], context['game_id'], context['round'], PRIORITY_BACKGROUND, context.get('seed'))
 
-    return responses_data
+
+@socketio.on('draft_statement')
+def handle_draft_statement(data):
+    """Debounced partial statement from the round page; drafts NPC replies if it is long enough to submit."""
+    game_id = session.get('game_id')
+    text = (data or {}).get('text', '').strip()
+    if not SPECULATIVE_DRAFTS or not game_id or len(text.split()) < MIN_STATEMENT_WORDS:
+        return
+    SPECULATIONS.draft(game_id, text, start_npc_draft)
 
 # --- Victory Check Logic --- #
+@timed('issue_update')
 def update_issues_based_on_stances(characters, current_issues):
     """Adjusts sub-issues based on the weighted stances and polarization of all characters."""
     net_forces = {
@@ -1072,29 +1497,29 @@ def update_issues_based_on_stances(characters, current_issues):
     elif net_forces['cultural_venue_scale'] < -5 and current_scale_index > 0:
         new_issues['cultural_venue']['scale'] = scale_map[current_scale_index - 1]
 
-    print(f"--- Issues Updated ---")
-    print(f"  Affordable Housing Share: {new_issues['affordable_housing'].get('share_percentage')}% (Force: {net_forces['affordable_housing_share']:.2f})")
-    print(f"  Cultural Venue Scale: {new_issues['cultural_venue'].get('scale')} (Force: {net_forces['cultural_venue_scale']:.2f})")
+    log.debug("Issues updated: affordable housing share %s%% (force %.2f), cultural venue scale %s (force %.2f)",
+              new_issues['affordable_housing'].get('share_percentage'), net_forces['affordable_housing_share'],
+              new_issues['cultural_venue'].get('scale'), net_forces['cultural_venue_scale'])
 
     return new_issues
 
-def regenerate_tokens_for_round(session_data):
+def regenerate_tokens_for_round(game_data):
     """Regenerates influence tokens for all characters at the start of a round."""
-    characters = session_data.get('characters', [])
-    player_profile = session_data.get('player_profile', {})
-    current_round = session_data.get('negotiation_state', {}).get('round', 1)
+    characters = load_characters(game_data)
+    player_profile = game_data.get('player_profile', {})
+    current_round = game_data.get('negotiation_state', {}).get('round', 1)
 
     if current_round <= 1: # No regeneration on the first round
         return
 
-    print(f"--- Regenerating Tokens for Round {current_round} ---")
+    log.debug("Regenerating tokens for round %s", current_round)
     
     # Check for regen penalty
-    regen_penalty = session_data.get('regen_penalty', False)
+    regen_penalty = game_data.get('regen_penalty', False)
     if regen_penalty:
         player_regen = 1
-        session_data['regen_penalty'] = False # Reset after applying
-        print("  Player penalized: +1 token this round.")
+        game_data['regen_penalty'] = False # Reset after applying
+        log.debug("Player penalized: +1 token this round")
     else:
         player_regen = 2
     
@@ -1111,15 +1536,16 @@ def regenerate_tokens_for_round(session_data):
             new_tokens = min(current_tokens + player_regen, max_tokens)
             char['influence_tokens'] = new_tokens
             if player_profile: player_profile['influence_tokens'] = new_tokens
-            print(f"  Player tokens: {current_tokens} + {player_regen} -> {new_tokens} (Max: {max_tokens})")
+            log.debug("Player tokens: %s + %s -> %s (max %s)", current_tokens, player_regen, new_tokens, max_tokens)
         else:
             new_tokens = min(current_tokens + npc_regen, max_tokens)
             char['influence_tokens'] = new_tokens
 
-    session_data['characters'] = characters
-    session_data['player_profile'] = player_profile
+    store_characters(game_data, characters)
+    game_data['player_profile'] = player_profile
+    record_event('tokens_regenerated', round=current_round, player_regen=player_regen)
 
-def check_victory(characters, climate_score, issues, history):
+def check_victory(characters, climate_score, issues, history, event_log=None):
     """Determines the outcome based on a more complex set of rules for the Canada Water scenario."""
 
     # --- Pre-computation of final state ---
@@ -1129,12 +1555,10 @@ def check_victory(characters, climate_score, issues, history):
     affordable_share = issues.get('affordable_share', 0)
     cultural_venue = issues.get('cultural_venue_scale', 'none')
 
-    # Check for the council policy change event having occurred
+    # Check for the council policy change event having occurred (O(1) via the event log)
     affordable_floor = 35
-    for round_history in history:
-        if 'event' in round_history and round_history['event']['id'] == 'council_policy_change':
-            affordable_floor = 40
-            break
+    if event_log and 'council_policy_change' in event_log.get('fired', {}):
+        affordable_floor = 40
 
     # --- Rule 1: Automatic Failures ---
     if climate_score <= CRITICAL_CLIMATE_THRESHOLD:
@@ -1159,17 +1583,20 @@ def check_victory(characters, climate_score, issues, history):
     return f"Compromise Deal: The negotiation ended in a balanced compromise. The final plan includes {affordable_share}% affordable housing and a '{cultural_venue}' scale cultural venue. While not a clear win for any single party, the project moves forward."
 
 
-def generate_backstory(ai_profile):
+def generate_backstory(ai_profile, rng=random):
     """Generates a natural language backstory from a personality profile."""
     p = ai_profile['personality']
     return (
-        f"{ai_profile['name']} is {random.choice(['a', 'an'])} {p['age_group']} {p['occupation']} who {p['identity_tag']} and {p['household']}. "
+        f"{ai_profile['name']} is {rng.choice(['a', 'an'])} {p['age_group']} {p['occupation']} who {p['identity_tag']} and {p['household']}. "
         f"They have a {p['community_orientation']} worldview with {p['assertiveness']} assertiveness and {p['risk_tolerance']} risk tolerance. "
         f"In discussions, they tend to be {p['negotiation_style']}."
     )
 
-def generate_ai_opponents(player_role_id):
-    """Generates a list of AI-controlled opponents based on the roles and multipliers in the scenario file."""
+def generate_ai_opponents(player_role_id, rng=random):
+    """
+    Generates a list of AI-controlled opponents based on the roles and multipliers in the scenario file.
+    Pass a seeded random.Random as rng to make the whole panel (including persona DNA) reproducible.
+    """
     opponents = []
     opponent_id_counter = 0
     used_names = set()
@@ -1182,15 +1609,15 @@ def generate_ai_opponents(player_role_id):
         num_to_create = multipliers.get(role_id, 1)
 
         for i in range(num_to_create):
-            name = random.choice(SAMPLE_NAMES)
+            name = rng.choice(SAMPLE_NAMES)
             while name in used_names:
-                name = random.choice(SAMPLE_NAMES)
+                name = rng.choice(SAMPLE_NAMES)
             used_names.add(name)
 
             stance_dist = role_data.get('stance_distribution', {STANCES["neutral"]: 1})
             possible_stances = list(stance_dist.keys())
             weights = list(stance_dist.values())
-            chosen_initial_stance = random.choices(possible_stances, weights=weights, k=1)[0]
+            chosen_initial_stance = rng.choices(possible_stances, weights=weights, k=1)[0]
 
             chosen_initial_score = {
                 STANCES["support"]: INITIAL_SUPPORT_SCORE,
@@ -1211,27 +1638,28 @@ def generate_ai_opponents(player_role_id):
                 'influence_tokens': role_data['initial_influence_tokens'],
                 'max_tokens': 8, # NPC max tokens
                 'trust_value': role_data.get('initial_trust', INITIAL_TRUST),
-                'age': random.choice([28, 35, 42, 45, 53, 58, 62, 67]),
-                'gender': random.choice(['Male', 'Female']),
-                'local_resident': random.choice(['Yes', 'No']),
-                'has_children': random.choice(['Yes', 'No']),
-                'marital_status': random.choice(['Single', 'Married', 'Divorced', 'Widowed']),
+                'age': rng.choice([28, 35, 42, 45, 53, 58, 62, 67]),
+                'gender': rng.choice(['Male', 'Female']),
+                'local_resident': rng.choice(['Yes', 'No']),
+                'has_children': rng.choice(['Yes', 'No']),
+                'marital_status': rng.choice(['Single', 'Married', 'Divorced', 'Widowed']),
                 'personality': {
-                    'assertiveness': random.choice(PERSONALITY_TRAITS['assertiveness']),
-                    'risk_tolerance': random.choice(PERSONALITY_TRAITS['risk_tolerance']),
-                    'community_orientation': random.choice(PERSONALITY_TRAITS['community_orientation']),
-                    'age_group': random.choice(LIFE_SITUATION_SEEDS['age_group']),
-                    'household': random.choice(LIFE_SITUATION_SEEDS['household']),
-                    'occupation': random.choice(LIFE_SITUATION_SEEDS['occupation']),
-                    'identity_tag': random.choice(LIFE_SITUATION_SEEDS['identity_tag']),
-                    'negotiation_style': random.choice(NEGOTIATION_STYLES)
+                    'assertiveness': rng.choice(PERSONALITY_TRAITS['assertiveness']),
+                    'risk_tolerance': rng.choice(PERSONALITY_TRAITS['risk_tolerance']),
+                    'community_orientation': rng.choice(PERSONALITY_TRAITS['community_orientation']),
+                    'age_group': rng.choice(LIFE_SITUATION_SEEDS['age_group']),
+                    'household': rng.choice(LIFE_SITUATION_SEEDS['household']),
+                    'occupation': rng.choice(LIFE_SITUATION_SEEDS['occupation']),
+                    'identity_tag': rng.choice(LIFE_SITUATION_SEEDS['identity_tag']),
+                    'negotiation_style': rng.choice(NEGOTIATION_STYLES)
                 }
             }
-            ai_profile['num_children'] = random.choice([1, 2, 3, 4]) if ai_profile['has_children'] == 'Yes' else 0
+            ai_profile['num_children'] = rng.choice([1, 2, 3, 4]) if ai_profile['has_children'] == 'Yes' else 0
             ai_profile['objective'] = role_data.get('objective', 'To influence the outcome.')
-            ai_profile['backstory'] = generate_backstory(ai_profile)
+            ai_profile['backstory'] = generate_backstory(ai_profile, rng)
             ai_profile['polarization_score'] = 0 # Initialize polarization
             ai_profile['previous_stance_category'] = ai_profile['stance']  # Initialize previous stance
+            ai_profile['persona_dna'] = roll_persona_dna(role_id, rng)  # Compact indices; see persona_for()
             opponents.append(ai_profile)
             opponent_id_counter += 1
 
@@ -1242,18 +1670,84 @@ def generate_ai_opponents(player_role_id):
 def influence():
     action = request.form.get('action')
     target_id = request.form.get('target_id')
-    
+
+    # Runs as one command on the game, so it cannot interleave with (or be overwritten by) a round in flight
+    with game_command('influence') as game:
+        if game is None:
+            return jsonify({'success': False, 'message': 'Game session not found.'}), 403
+        characters = load_characters(game)
+        result, status = apply_influence_action(game, characters, action, target_id)
+        if result['success']:
+            store_characters(game, characters)
+            prepare_round_speculation(game)  # Stances moved; re-prepare the round
+        return jsonify(result), status
+
+
+class InfluenceBatchRejected(Exception):
+    """Raised inside a batch's command so that none of its actions are committed."""
+
+
+@app.route('/influence/batch', methods=['POST'])
+def influence_batch():
+    """
+    Applies an ordered list of influence actions as one command:
+        {"actions": [{"action": "gentle_persuasion", "target_id": "ai_1"}, ...], "since": <version>}
+    Costs, penalties, leaks and polarization follow the same rules as consecutive /influence
+    calls, but the characters are loaded, stored and re-speculated once and the game commits once.
+    All or nothing: if an action fails, none is applied and its index is reported.
+    The reply has per-action results plus the state delta since `since` (see GameFeed).
+    """
+    payload = request.get_json(silent=True) or {}
+    actions = payload.get('actions')
+    if (not isinstance(actions, list) or not 0 < len(actions) <= MAX_INFLUENCE_BATCH
+            or not all(isinstance(step, dict) for step in actions)):
+        return jsonify({'success': False,
+                        'message': f'Expected a list of 1-{MAX_INFLUENCE_BATCH} actions with action and target_id.'}), 400
+
+    results = []
+    try:
+        with game_command('influence_batch') as game:
+            if game is None:
+                return jsonify({'success': False, 'message': 'Game session not found.'}), 403
+            base_version = GAMES.version(game['game_id'])  # The commit this batch builds on (its lock is held)
+            characters = load_characters(game)
+            characters_by_id = {char['id']: char for char in characters}
+            for step in actions:
+                result, status = apply_influence_action(game, characters, step.get('action'), step.get('target_id'),
+                                                        characters_by_id)
+                results.append(result)
+                if not result['success']:
+                    raise InfluenceBatchRejected(status)
+            store_characters(game, characters)
+            prepare_round_speculation(game)
+    except InfluenceBatchRejected as rejected:
+        return jsonify({'success': False, 'message': results[-1]['message'], 'failed_index': len(results) - 1,
+                        'results': results}), rejected.args[0]
+
+    version, committed = GAMES.head(game['game_id'])
+    since = payload.get('since', base_version)
+    return jsonify({'success': True, 'results': results,
+                    **GAME_FEED.payload(game['game_id'], version, committed, since if isinstance(since, int) else None)})
+
+
+def apply_influence_action(game, characters, action, target_id, characters_by_id=None):
+    """
+    Applies one influence action to the game's working state and to `characters` (from
+    load_characters; the caller stores them). Returns (result, HTTP status).
+    """
     # --- 1. Initialize/Get History ---
-    if 'player_action_history' not in session:
-        session['player_action_history'] = []
-    history = session['player_action_history']
+    if 'player_action_history' not in game:
+        game['player_action_history'] = []
+    history = game['player_action_history']
 
     # --- 2. Find Target ---
-    characters = session.get('characters', [])
-    target_npc = next((char for char in characters if char['id'] == target_id), None)
+    if characters_by_id is not None:
+        target_npc = characters_by_id.get(target_id)
+    else:
+        target_npc = next((char for char in characters if char['id'] == target_id), None)
 
     if not target_npc:
-        return jsonify({'success': False, 'message': 'Target NPC not found.'}), 404
+        return {'success': False, 'message': 'Target NPC not found.'}, 404
 
     target_role_id = target_npc.get('role_id')
     role_data = ROLES.get(target_role_id, {})
@@ -1285,24 +1779,24 @@ def influence():
     final_cost = math.ceil(final_cost)
 
     # --- 4. Check Affordability ---
-    player_profile = session.get('player_profile', {})
+    player_profile = game.get('player_profile', {})
     if not player_profile:
-         return jsonify({'success': False, 'message': 'Player profile not found.'}), 400
+         return {'success': False, 'message': 'Player profile not found.'}, 400
          
     if player_profile.get('influence_tokens', 0) < final_cost:
-        return jsonify({'success': False, 'message': f'Not enough tokens. Cost: {final_cost}'}), 400
+        return {'success': False, 'message': f'Not enough tokens. Cost: {final_cost}'}, 400
 
     # --- 5. Apply Penalties (Regen) ---
     # If player uses strong twice in a row
     if action == 'strong_persuasion' and history and history[-1] == 'strong_persuasion':
-        session['regen_penalty'] = True
-        print("PENALTY: Consecutive strong persuasion triggered regen penalty.")
+        game['regen_penalty'] = True
+        log.info("Penalty: consecutive strong persuasion triggered regen penalty")
 
     # --- 6. Update History ---
     history.append(action)
     if len(history) > 5:
         history.pop(0)
-    session['player_action_history'] = history # Save back to session
+    game['player_action_history'] = history
 
     # --- 7. Calculate Effects ---
     action_effect = INFLUENCE_ACTION_EFFECTS.get(action, {})
@@ -1318,9 +1812,11 @@ def influence():
         pol_mod = role_data.get('polarization_modifier', 1.0)
         leak_chance = BASE_LEAK_CHANCE * pol_mod
         
-        if random.random() < leak_chance:
+        # Numbered per pressure action, so a replay leaks exactly when the original game did
+        game['action_count'] = game.get('action_count', 0) + 1
+        if game_rng(game, 'leak', game['action_count']).random() < leak_chance:
             leak_occurred = True
-            print(f"!!! Pressure LEAKED! Chance: {leak_chance:.2f}. Spreading opposition...")
+            log.info("Pressure leaked (chance %.2f); spreading opposition", leak_chance)
             
             # Spread impact to others
             for char in characters:
@@ -1328,7 +1824,7 @@ def influence():
                     old_s = char.get('stance_score', 50)
                     char['stance_score'] = max(0, min(100, old_s - POLARIZATION_SPREAD_IMPACT))
                     char['stance'] = get_stance_category(char['stance_score'])
-                    print(f"  -> {char['name']} reacted to leak: {old_s} -> {char['stance_score']}")
+                    log.debug("%s reacted to leak: %s -> %s", char['name'], old_s, char['stance_score'])
                     
         # Also update target's polarization score tracking (internal metric)
         target_npc['polarization_score'] = max(0, min(100, target_npc.get('polarization_score', 0) + 10))
@@ -1346,21 +1842,24 @@ def influence():
     new_stance = get_stance_category(target_npc['stance_score'])
     target_npc['stance'] = new_stance
 
-    print(
-        f"Applied '{action}' to {target_npc['name']}. Cost: {final_cost}. Stance: {old_stance_score} -> {target_npc['stance_score']} ({new_stance}). Trust: {old_trust} -> {target_npc['trust_value']}")
+    log.debug("Applied '%s' to %s. Cost: %s. Stance: %s -> %s (%s). Trust: %s -> %s", action, target_npc['name'],
+              final_cost, old_stance_score, target_npc['stance_score'], new_stance, old_trust, target_npc['trust_value'])
 
     # Deduct tokens
     player_profile['influence_tokens'] -= final_cost
-    session['player_profile'] = player_profile
+    game['player_profile'] = player_profile
     
     # Sync with characters list
     for char in characters:
         if char.get('is_player'):
             char['influence_tokens'] = player_profile['influence_tokens']
             break
-    session['characters'] = characters
+    record_event('influence', action=action, target_id=target_id, cost=final_cost, leaked=leak_occurred,
+                 stance_score=target_npc['stance_score'], trust_value=target_npc['trust_value'])
     
-    return jsonify({'success': True, 'message': f'Action applied. Cost: {final_cost}T.'})
+    return {'success': True, 'message': f'Action applied. Cost: {final_cost}T.', 'action': action,
+            'target_id': target_id, 'cost': final_cost, 'leaked': leak_occurred,
+            'tokens_left': player_profile['influence_tokens']}, 200
 
 
 # --- 2D Visualization (Ripple Effect) ---
@@ -1368,22 +1867,104 @@ def influence():
 @app.route('/ripple')
 def ripple_view():
     """Serves the main page for the 2D visualization and initializes history."""
-    if 'history' not in session:
-        # On first visit, load the pristine data and set up history
-        with open('static/scene.json', 'r') as f:
-            original_data = json.load(f)
-        session['history'] = {
-            'pristine': original_data,
+    if session_scene() is None:
+        # On first visit the scene is the shared pristine one: an empty overlay, no copy
+        session['scene'] = new_scene()
+        session['scene_history'] = {
             'undo_stack': [],
             'redo_stack': []
         }
-        # The 'current' state is what we'll show and modify
-        session['current_scene'] = original_data
+        session['scene_journal'] = []
+    session.setdefault('scene_id', uuid.uuid4().hex)  # Socket.IO room for this session's scene deltas
+    request_scene_card(session_scene())
     return render_template('ripple.html')
 
 
-def interpret_command_with_ai(command, client, entities):
+def scene_card_key(scene):
+    """Content key of a scene overlay's card: the version is left out, so an undo finds its earlier card."""
+    return content_key('ripple', {'modified': scene['modified'], 'removed': sorted(scene['removed'])})
+
+
+def request_scene_card(scene, fmt='png'):
+    """Schedules the scene's preview card in the background (no-op if cached or rendering); returns its key."""
+    return SCENE_CARDS.request(scene_card_key(scene), lambda: polygons_from_entities(scene_entities(scene)), fmt)
+
+
+def session_scene():
+    """The session's scene overlay (scene_store.py), or None before the ripple page was opened."""
+    if 'scene' not in session and 'current_scene' in session:
+        # Sessions from before overlays kept full copies of the scene; keep only what differs from the pristine one
+        history = session.pop('history', {})
+        current = session.pop('current_scene')
+        session['scene'] = scene_from_entities(current.get('entities', []), current.get('version', 0))
+        session['scene_history'] = {stack: [scene_from_entities(s.get('entities', [])) for s in history.get(stack, [])]
+                                    for stack in ('undo_stack', 'redo_stack')}
+        session.setdefault('scene_journal', [])
+    return session.get('scene')
+
+
+def commit_session_scene(new_scene):
+    """
+    Makes new_scene the session's current scene under the next version, journals what
+    changed and pushes that delta to the session's ripple pages. Returns the journal entry.
+    """
+    journal = session.get('scene_journal', [])
+    old_scene = session_scene()
+    share = affordable_share()
+    kpis_before = scene_kpis(old_scene, share)  # Also brings the session's running totals up to old_scene
+    entry = commit_scene(old_scene, new_scene, journal)
+    session['scene'] = new_scene
+    session['scene_journal'] = journal
+    if entry is not None:
+        request_scene_card(new_scene)  # Rendered while the page applies the delta
+        # Only the entities this commit touched are measured
+        totals = KPI_ENGINE.apply_scene_change(session['scene_kpis']['by_use'], old_scene, new_scene,
+                                               [*entry['added'], *entry['removed'], *entry['modified']])
+        session['scene_kpis'] = {'version': entry['version'], 'by_use': totals}
+        kpis = scene_kpis(new_scene, share)
+        if 'scene_id' in session:
+            delta = scene_delta(new_scene, journal, entry['version'] - 1)
+            delta.update(kpis=kpis, kpi_deltas=kpi_deltas(kpis_before, kpis))  # SceneUpdate.kpis / .deltas
+            socketio.emit('scene_delta', delta, to=f"scene:{session['scene_id']}")
+    return entry
+
+
+def affordable_share():
+    """The negotiated affordable housing share of this session's game, or the default without one."""
+    game = current_game()
+    issues = (game or {}).get('negotiation_state', {}).get('issues', {})
+    return issues.get('affordable_housing', {}).get('share_percentage', DEFAULT_AFFORDABLE_SHARE)
+
+
+def scene_kpis(scene, share=None):
+    """
+    KPIs of a scene overlay (kpis.py). The session keeps the running per-use footprint totals of
+    its current scene; they are only rebuilt (from what the overlay touched) if they are missing.
+    """
+    share = affordable_share() if share is None else share
+    record = session.get('scene_kpis')
+    if record is None or record.get('version') != scene.get('version', 0):
+        if scene is not session.get('scene'):
+            return KPI_ENGINE.derive(KPI_ENGINE.scene_totals(scene), share)
+        record = session['scene_kpis'] = {'version': scene.get('version', 0), 'by_use': KPI_ENGINE.scene_totals(scene)}
+    return KPI_ENGINE.derive(record['by_use'], share)
+
+
+@socketio.on('scene_subscribe')
+def handle_scene_subscribe(data=None):
+    """The ripple page joins its scene's room; it catches up on missed versions via /get-scene?since=."""
+    scene_id = session.get('scene_id')
+    if scene_id:
+        join_room(f"scene:{scene_id}")
+
+
+def interpret_command_with_ai(command, provider, entities):
     """ Uses an LLM to interpret the user's command into a structured format. """
+    # Common command shapes are parsed locally against the scene's vocabulary; only the rest costs an LLM call
+    interpreted = parse_plan_command(command, entities)
+    record_plan_command(interpreted is not None, clarify=interpreted is not None and interpreted['action'] == 'clarify')
+    if interpreted is not None:
+        return interpreted
 
     # Create a simplified list of entities for the prompt
     entity_list_for_prompt = []
@@ -1398,33 +1979,40 @@ def interpret_command_with_ai(command, client, entities):
     The user's plan contains the following entities:
     {chr(10).join(entity_list_for_prompt)}
 
-    You must support three types of actions:
+    You must support five types of actions:
     1. 'change': To change all entities from one layer/type to another.
        - JSON: {{"action": "change", "source": "<source_type>", "destination": "<destination_type>"}}
     2. 'remove': To delete all entities on a specific layer/type.
        - JSON: {{"action": "remove", "layer": "<layer_to_remove>"}}
     3. 'update_params': To modify the parameters of a SINGLE entity, identified by its ID.
        - JSON: {{"action": "update_params", "target_id": "<entity_id>", "params": {{"width": <new_width>, "length": <new_length>}}}}
+    4. 'scale': To grow or shrink every entity on a layer (or a single entity) in place by a factor.
+       - JSON: {{"action": "scale", "layer": "<layer>", "factor": <factor>}} or {{"action": "scale", "target_id": "<entity_id>", "factor": <factor>}}
+    5. 'rotate': To rotate every entity on a layer as one block (or a single entity) by an angle in degrees.
+       - JSON: {{"action": "rotate", "layer": "<layer>", "degrees": <degrees>}} or {{"action": "rotate", "target_id": "<entity_id>", "degrees": <degrees>}}
 
     Examples:
     - User: "change all hospitals to schools" -> {{"action": "change", "source": "hospital", "destination": "school"}}
     - User: "remove the residential areas" -> {{"action": "remove", "layer": "residential"}}
     - User: "make hotel-0 smaller, 20 by 30" -> {{"action": "update_params", "target_id": "hotel-0", "params": {{"width": 20, "length": 30}}}}
+    - User: "scale all residential by 10%" -> {{"action": "scale", "layer": "residential", "factor": 1.1}}
+    - User: "rotate the hotels 15 degrees" -> {{"action": "rotate", "layer": "hotel", "degrees": 15}}
     - User: "reduce the size of btr-2" -> You must ask for specific dimensions.
 
     IMPORTANT: For 'update_params', you MUST have specific numerical dimensions. If the user is vague (e.g., "make it smaller"), you must ask for clarification by returning a 'clarify' action.
     - Clarification JSON: {{"action": "clarify", "message": "What specific dimensions should I set for [entity_id]?"}}
     """
 
-    response = client.chat.completions.create(
+    reply_text = provider.complete(
         model="gpt-4-turbo",
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": command}
         ],
+        temperature=0, # Command parsing should be deterministic (and therefore cacheable)
         response_format={"type": "json_object"}
     )
-    return json.loads(response.choices[0].message.content)
+    return json.loads(reply_text)
 
 @app.route('/update-plan', methods=['POST'])
 def update_plan():
@@ -1434,16 +2022,19 @@ def update_plan():
         return jsonify({'status': 'error', 'message': 'No command provided'}), 400
 
     try:
+        current_scene = session_scene()
+        if current_scene is None:
+            return jsonify({'status': 'error', 'message': 'No plan loaded. Open the ripple view first.'}), 400
+
                 # --- AI Interpretation Step ---
-        client = OpenAI()
-        interpreted_action = interpret_command_with_ai(command, client, session.get('current_scene', {}).get('entities', []))
+        interpreted_action = interpret_command_with_ai(command, get_llm_provider(), list(scene_entities(current_scene)))
         action = interpreted_action.get('action')
 
-        current_scene = session.get('current_scene', {})
-        import copy
-        new_scene = copy.deepcopy(current_scene)
+        # Copy-on-write: only the entities the command touches are copied into the new overlay
+        scene_edit = SceneEdit(current_scene)
+        new_scene = scene_edit.scene
 
-        history = session['history']
+        history = session['scene_history']
         history['undo_stack'].append(current_scene)
         history['redo_stack'].clear()
 
@@ -1453,8 +2044,9 @@ def update_plan():
         if action == 'change':
             source = interpreted_action.get('source')
             dest = interpreted_action.get('destination')
-            for entity in new_scene['entities']:
+            for entity in scene_edit.entities():
                 if entity['type'] == source:
+                    entity = scene_edit.edit(entity['id'])
                     entity['type'] = dest
                     entity['layer'] = dest # Keep layer and type in sync
                     modified = True
@@ -1465,10 +2057,11 @@ def update_plan():
 
         elif action == 'remove':
             layer_to_remove = interpreted_action.get('layer')
-            original_count = len(new_scene['entities'])
-            new_scene['entities'] = [e for e in new_scene['entities'] if e['layer'] != layer_to_remove]
-            if len(new_scene['entities']) < original_count:
-                modified = True
+            for entity in scene_edit.entities():
+                if entity['layer'] == layer_to_remove:
+                    scene_edit.remove(entity['id'])
+                    modified = True
+            if modified:
                 message = f'Removed all entities on layer "{layer_to_remove}".'
             else:
                 message = f'Layer "{layer_to_remove}" not found.'
@@ -1476,15 +2069,34 @@ def update_plan():
         elif action == 'update_params':
             target_id = interpreted_action.get('target_id')
             new_params = interpreted_action.get('params')
-            for entity in new_scene['entities']:
-                if entity['id'] == target_id:
-                    entity['params'].update(new_params)
-                    modified = True
-                    break
+            entity = scene_edit.edit(target_id)
+            if entity is not None:
+                apply_params([entity], [{**entity['params'], **new_params}])  # Outline follows the new size
+                modified = True
             if modified:
                 message = f'Updated parameters for entity "{target_id}".'
             else:
                 message = f'Entity "{target_id}" not found.'
+
+        elif action in ('scale', 'rotate'):
+            # Bulk geometry edit: all targets are transformed in one batch
+            layer, target_id = interpreted_action.get('layer'), interpreted_action.get('target_id')
+            targets = [scene_edit.edit(e['id']) for e in scene_edit.entities()
+                       if (e['id'] == target_id if target_id else e['layer'] == layer)]
+            subject = f'entity "{target_id}"' if target_id else f'layer "{layer}"'
+            if targets:
+                params_list = [entity['params'] for entity in targets]
+                if action == 'scale':
+                    factor = float(interpreted_action.get('factor', 1))
+                    apply_params(targets, scaled_params(params_list, factor))
+                    message = f'Scaled {len(targets)} entities on {subject} by {factor:g}x.'
+                else:
+                    degrees = float(interpreted_action.get('degrees', 0))
+                    apply_params(targets, rotated_params(params_list, degrees))
+                    message = f'Rotated {subject} by {degrees:g} degrees.'
+                modified = True
+            else:
+                message = f'No entities found for {subject}.'
         
         elif action == 'clarify':
             # This is a non-modifying action, just return the AI's message
@@ -1496,22 +2108,73 @@ def update_plan():
             history['undo_stack'].pop() # Revert history push
             return jsonify({'status': 'info', 'message': message})
 
-        session['current_scene'] = new_scene
-        session['history'] = history
-        return jsonify({'status': 'success', 'message': message})
+        session['scene_history'] = history
+        commit_session_scene(new_scene)
+        return jsonify({'status': 'success', 'message': message, 'version': new_scene['version']})
 
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'Could not process command: {str(e)}'}), 500
 
 @app.route('/get-scene', methods=['GET'])
 def get_scene():
-    """ Returns the current scene data from the session. """
-    return jsonify(session.get('current_scene', {}))
+    """
+    Returns the current scene data from the session.
+    With ?since=<version> only the entities added, removed or modified since then (see scene_journal.py).
+    """
+    scene = session_scene()
+    if scene is None:
+        return jsonify({})
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify(materialize(scene))
+    return jsonify(scene_delta(scene, session.get('scene_journal', []), since))
+
+@app.route('/api/scene-card', methods=['GET'])
+def get_scene_card():
+    """
+    Preview cards (models.SceneCard as JSON) for the current scene and the states undo/redo would
+    restore: image URL, whether it is rendered yet, the last change and KPIs. Missing cards are
+    scheduled, never waited for; poll again or load the URL once 'ready' is true.
+    """
+    scene = session_scene()
+    if scene is None:
+        return jsonify({'error': 'No plan loaded'}), 404
+    fmt = request.args.get('format', 'png')
+    if fmt not in CARD_FORMATS:
+        return jsonify({'error': f"Unknown format; use one of {sorted(CARD_FORMATS)}"}), 400
+
+    def describe(state):
+        key = request_scene_card(state, fmt)
+        return {'key': key, 'ready': SCENE_CARDS.get(key, fmt) is not None,
+                'url': url_for('scene_card_image', key=key, fmt=fmt)}
+
+    history = session.get('scene_history', {})
+    journal = session.get('scene_journal', [])
+    last_change = journal[-1] if journal else {}
+    cards = {'current': {**describe(scene), 'version': scene.get('version', 0), 'kpis': scene_kpis(scene),
+                         'deltas': {kind: len(last_change.get(kind, [])) for kind in ('added', 'removed', 'modified')}}}
+    for name, stack in (('undo', 'undo_stack'), ('redo', 'redo_stack')):
+        if history.get(stack):
+            cards[name] = describe(history[stack][-1])
+    return jsonify(cards)
+
+@app.route('/scene-card/<string:key>.<string:fmt>', methods=['GET'])
+def scene_card_image(key, fmt):
+    """A rendered card by content key; immutable, since the key is a hash of what it shows."""
+    image = SCENE_CARDS.get(key, fmt) if fmt in CARD_FORMATS else None
+    if image is None:
+        return jsonify({'error': 'Card not rendered (yet)'}), 404
+    response = Response(image, mimetype=CARD_FORMATS[fmt][1])
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/history/<action>', methods=['POST'])
 def handle_history(action):
     """ Handles undo, redo, and reset actions. """
-    history = session.get('history', {})
+    session_scene()  # Converts a pre-overlay session
+    history = session.get('scene_history', {})
     if not history:
         return jsonify({'status': 'error', 'message': 'No history available.'}), 400
 
@@ -1519,44 +2182,47 @@ def handle_history(action):
         if not history['undo_stack']:
             return jsonify({'status': 'info', 'message': 'Nothing to undo.'})
         # Move current state to redo stack
-        history['redo_stack'].append(session['current_scene'])
+        history['redo_stack'].append(session['scene'])
         # Pop from undo stack to become the new current state
-        session['current_scene'] = history['undo_stack'].pop()
+        commit_session_scene(history['undo_stack'].pop())
         message = 'Undo successful.'
     
     elif action == 'redo':
         if not history['redo_stack']:
             return jsonify({'status': 'info', 'message': 'Nothing to redo.'})
         # Move current state to undo stack
-        history['undo_stack'].append(session['current_scene'])
+        history['undo_stack'].append(session['scene'])
         # Pop from redo stack to become the new current state
-        session['current_scene'] = history['redo_stack'].pop()
+        commit_session_scene(history['redo_stack'].pop())
         message = 'Redo successful.'
 
     elif action == 'reset':
-        # Restore the pristine, original data
-        session['current_scene'] = history['pristine']
+        # Restore the pristine, original data: an empty overlay
+        commit_session_scene(new_scene())
         history['undo_stack'].clear()
         history['redo_stack'].clear()
         message = 'Plan has been reset to its original state.'
 
     elif action == 'show_original':
         # This is a temporary view, does not change the history
-        return jsonify(history.get('pristine', {}))
+        return Response(PRISTINE.json_bytes(), mimetype='application/json')
 
     else:
         return jsonify({'status': 'error', 'message': 'Invalid history action.'}), 400
 
-    session['history'] = history
-    return jsonify({'status': 'success', 'message': message})
+    session['scene_history'] = history
+    return jsonify({'status': 'success', 'message': message, 'version': session['scene'].get('version', 0)})
 
 # --- Main Execution ---
 
 @app.after_request
 def add_header(response):
     """
-    Add headers to force the browser to not cache static files.
+    Game-state pages and APIs must never be served from a cache. Static files and
+    render-cached pages keep their ETags so browsers revalidate cheaply instead.
     """
+    if request.endpoint in CACHEABLE_ENDPOINTS and response.status_code in (200, 304):
+        return response
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
@@ -1589,6 +2255,25 @@ def add_header(response):
 #     """Renders the main p5.js visualization page."""
 #     return render_template('visualization.html')
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of request, span and LLM call histograms."""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/traces')
+def get_recent_traces():
+    """The most recent per-request timing traces (newest last)."""
+    return jsonify(list(RECENT_TRACES))
+
+@app.route('/api/llm/stats')
+def get_llm_stats():
+    """Reports LLM client (connection reuse, retries), response cache, per-tier routing and game actor counters for this process."""
+    provider = get_llm_provider()
+    return jsonify({'provider': provider.name, 'client': provider.report(), 'cache': RESPONSE_CACHE.report(),
+                    'routing': routing_report(), 'speculation': SPECULATIONS.report(),
+                    'games': GAMES.report(), 'feed': GAME_FEED.report(), 'plan_commands': plan_command_report(),
+                    'scene_cards': SCENE_CARDS.report(), 'kpis': KPI_ENGINE.report()})
+
 @app.route('/apply-issue-update', methods=['POST'])
 def apply_issue_update():
     data = request.json or {}
@@ -1633,7 +2318,7 @@ def get_masterplan_data():
 @app.route('/game')
 def game():
     """Unified two-column interface for negotiation + visualization."""
-    return render_template('integrated_view.html')
+    return RENDER_CACHE.page('integrated_view.html', max_age=300)
 
 if __name__ == '__main__':
     # Make sure to create a .env file with your OPENAI_API_KEY
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Speculative Round Preparation ---
+# While the player composes a statement the server would otherwise sit idle.
+# When a round becomes playable we pre-apply its random event on copies of
+# the state and warm the LLM pool; with drafts enabled, a debounced partial
+# statement pushed over Socket.IO also starts the NPC replies in the
+# background. Everything is tied to a fingerprint of the round's inputs:
+# when the player submits, the prepared work is used only if the fingerprint
+# (and, for drafts, the exact statement) still matches, otherwise discarded.
+
+SPECULATION_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='speculation')
+
+
+def state_fingerprint(characters, negotiation_state):
+    """Hash of everything the event draw and NPC prompts read at the start of a round."""
+    payload = {
+        'round': negotiation_state.get('round'),
+        'climate': negotiation_state.get('negotiation_climate'),
+        'issues': negotiation_state.get('issues', {}),
+        'history': len(negotiation_state.get('history', [])),
+        'event_log': negotiation_state.get('event_log'),
+        'characters': [
+            (c['id'], c.get('stance_score'), c.get('trust_value'), c.get('polarization_score'))
+            for c in characters
+        ]
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def normalize_statement(text):
+    return ' '.join(text.split())
+
+
+class SpeculationStore:
+    """Per-game prepared rounds, bounded like PROFILE_STORE's memory cache."""
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._entries = OrderedDict()  # game_id -> entry
+        self._lock = threading.RLock()  # Draft callbacks may run inline while held
+        self.stats = {'prepared': 0, 'event_hits': 0, 'stale': 0,
+                      'drafts_started': 0, 'draft_hits': 0, 'drafts_discarded': 0}
+
+    def fingerprint(self, game_id):
+        with self._lock:
+            entry = self._entries.get(game_id)
+            return entry['fingerprint'] if entry else None
+
+    def put(self, game_id, fingerprint, prepared):
+        """prepared: {'event': {...}, 'context': {...}} for the round identified by fingerprint."""
+        with self._lock:
+            if game_id in self._entries:
+                self._discard_draft(self._entries[game_id])
+            self._entries[game_id] = {'fingerprint': fingerprint, **prepared, 'draft': None, 'pending_text': None}
+            self._entries.move_to_end(game_id)
+            while len(self._entries) > self.capacity:
+                _, evicted = self._entries.popitem(last=False)
+                self._discard_draft(evicted)
+            self.stats['prepared'] += 1
+
+    def draft(self, game_id, text, start):
+        """
+        Starts start(context, text) -> Future for this game's prepared round unless the
+        same statement is already drafted. At most one draft runs per game; newer text
+        waits and replaces any older waiting text.
+        """
+        text = normalize_statement(text)
+        with self._lock:
+            entry = self._entries.get(game_id)
+            if entry is None:
+                return False
+            draft = entry['draft']
+            if draft and draft['text'] == text:
+                return False
+            if draft and not draft['future'].done():
+                entry['pending_text'] = text
+                return False
+            self._start_draft(game_id, entry, text, start)
+            return True
+
+    def _start_draft(self, game_id, entry, text, start):
+        if entry['draft']:
+            self.stats['drafts_discarded'] += 1
+        future = start(entry['context'], text)
+        entry['draft'] = {'text': text, 'future': future}
+        entry['pending_text'] = None
+        self.stats['drafts_started'] += 1
+        future.add_done_callback(lambda _: self._on_draft_done(game_id, entry, start))
+
+    def _on_draft_done(self, game_id, entry, start):
+        with self._lock:
+            if self._entries.get(game_id) is not entry:
+                return
+            pending = entry['pending_text']
+            if pending and pending != entry['draft']['text']:
+                self._start_draft(game_id, entry, pending, start)
+
+    def _discard_draft(self, entry):
+        if entry['draft']:
+            self.stats['drafts_discarded'] += 1
+
+    def take(self, game_id, fingerprint, statement):
+        """
+        Removes this game's prepared round. Returns (event, draft_future); either is None
+        if the state moved on since preparation or the draft was for different text.
+        """
+        with self._lock:
+            entry = self._entries.pop(game_id, None)
+            if entry is None:
+                return None, None
+            if entry['fingerprint'] != fingerprint:
+                self.stats['stale'] += 1
+                self._discard_draft(entry)
+                return None, None
+            self.stats['event_hits'] += 1
+            draft = entry['draft']
+            if draft and draft['text'] == normalize_statement(statement):
+                self.stats['draft_hits'] += 1
+                return entry['event'], draft['future']
+            self._discard_draft(entry)
+            return entry['event'], None
+
+    def report(self):
+        with self._lock:
+            return {**self.stats, 'games': len(self._entries)}
+
+
+SPECULATIONS = SpeculationStore()
@@ -0,0 +1,207 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# --- Timing Spans & Metrics ---
+# Each request gets a trace (a list of timed spans) held in a context
+# variable; span() times a block, appends it to the current trace and feeds a
+# histogram. LLM calls are recorded with queue time, time to first byte,
+# total time and token usage. Histograms and counters are rendered in the
+# Prometheus text format by render_prometheus() for /metrics; no client
+# library is needed.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, series in items:
+            label_text = ','.join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{label_text}}} {series[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            label_text = ','.join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            lines.append(f'{self.name}{{{label_text}}} {value}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram('ripple_http_request_seconds', 'Request handling time by endpoint.', ('endpoint',))
+SPAN_SECONDS = Histogram('ripple_span_seconds', 'Time spent in instrumented hot-path spans.', ('span',))
+LLM_QUEUE_SECONDS = Histogram('ripple_llm_queue_seconds', 'Time waiting on the LLM rate limiter.', ('model',))
+LLM_FIRST_BYTE_SECONDS = Histogram('ripple_llm_first_byte_seconds', 'Time to first response byte of an LLM call.', ('model',))
+LLM_CALL_SECONDS = Histogram('ripple_llm_call_seconds', 'Total LLM call time including retries.', ('model',))
+LLM_TOKENS = Counter('ripple_llm_tokens_total', 'LLM tokens by direction.', ('model', 'direction'))
+METRICS = (REQUEST_SECONDS, SPAN_SECONDS, LLM_QUEUE_SECONDS, LLM_FIRST_BYTE_SECONDS, LLM_CALL_SECONDS, LLM_TOKENS)
+
+RECENT_TRACES = deque(maxlen=50)
+
+
+# --- Traces ---
+
+def start_trace(name):
+    trace = {'name': name, 'started': time.time(), '_t0': time.perf_counter(), 'spans': []}
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def finish_trace():
+    """Closes the current trace, keeps it in RECENT_TRACES and returns its total seconds."""
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    _current_trace.set(None)
+    trace['total'] = round(time.perf_counter() - trace.pop('_t0'), 6)
+    RECENT_TRACES.append(trace)
+    return trace['total']
+
+
+def _add_span(name, seconds, attrs):
+    SPAN_SECONDS.observe(seconds, name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace['spans'].append({'span': name, 'seconds': round(seconds, 6), **attrs})
+
+
+@contextmanager
+def span(name, **attrs):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_span(name, time.perf_counter() - started, attrs)
+
+
+def timed(name):
+    """Decorator form of span() for whole functions."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_call(model, queue_seconds, first_byte_seconds, total_seconds, tokens_in=None, tokens_out=None):
+    LLM_QUEUE_SECONDS.observe(queue_seconds, model)
+    if first_byte_seconds is not None:
+        LLM_FIRST_BYTE_SECONDS.observe(first_byte_seconds, model)
+    LLM_CALL_SECONDS.observe(total_seconds, model)
+    if tokens_in is not None:
+        LLM_TOKENS.inc(tokens_in, model, 'in')
+    if tokens_out is not None:
+        LLM_TOKENS.inc(tokens_out, model, 'out')
+    _add_span('llm_call', total_seconds, {
+        'model': model,
+        'queue': round(queue_seconds, 6),
+        'first_byte': round(first_byte_seconds, 6) if first_byte_seconds is not None else None,
+        'tokens_in': tokens_in,
+        'tokens_out': tokens_out
+    })
+
+
+def timing_summary(trace=None):
+    """Per-span totals of a trace, for the optional timing block in AJAX responses."""
+    trace = trace or _current_trace.get()
+    if trace is None:
+        return None
+    totals = {}
+    for entry in trace['spans']:
+        totals[entry['span']] = round(totals.get(entry['span'], 0.0) + entry['seconds'], 6)
+    elapsed = trace.get('total')
+    if elapsed is None:
+        elapsed = round(time.perf_counter() - trace['_t0'], 6)
+    return {'elapsed': elapsed, 'totals': totals, 'spans': trace['spans']}
+
+
+def render_prometheus():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --- Flask integration ---
+
+def instrument_app(app):
+    """Starts a trace per request and times Flask-Session load/save as spans."""
+    from flask import request
+
+    interface = app.session_interface
+    open_session, save_session = interface.open_session, interface.save_session
+
+    def timed_open_session(app_, req):
+        # Sessions open before before_request, so the trace starts here
+        start_trace(f"{req.method} {req.path}")
+        with span('session_load'):
+            return open_session(app_, req)
+
+    def timed_save_session(app_, session, response):
+        with span('session_save'):
+            return save_session(app_, session, response)
+
+    interface.open_session = timed_open_session
+    interface.save_session = timed_save_session
+
+    @app.teardown_request
+    def _finish_request_trace(exc):
+        total = finish_trace()
+        if total is not None:
+            REQUEST_SECONDS.observe(total, request.endpoint or 'unknown')
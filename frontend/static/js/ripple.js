@@ -4,6 +4,7 @@ let initialScale = 1;
 let worldBounds;
 let hoveredItem = null;
 let selectedItem = null;
+let scene = { version: null, entities: new Map() }; // Editable scene, kept in sync by version deltas
 
 const colors = {
     buildings: [50, 50, 50],
@@ -38,6 +39,17 @@ function setup() {
 
     socket.on('connect', () => {
         console.log('Socket.IO connected!');
+        socket.emit('scene_subscribe');
+        syncScene(); // Catch up on anything committed while disconnected
+    });
+
+    socket.on('scene_delta', (delta) => {
+        // A delta only applies on top of the version it was computed from; otherwise fetch what is missing
+        if (delta.full || delta.since === scene.version) {
+            applySceneDelta(delta);
+        } else {
+            syncScene();
+        }
     });
 
     socket.on('issue_update', (data) => {
@@ -46,6 +58,44 @@ function setup() {
     });
 }
 
+// --- Scene Sync ---
+function applySceneDelta(delta) {
+    if (delta.full || !('since' in delta)) {
+        scene.entities = new Map(delta.entities.map(entity => [entity.id, entity]));
+    } else {
+        delta.removed.forEach(id => scene.entities.delete(id));
+        delta.added.concat(delta.modified).forEach(entity => scene.entities.set(entity.id, entity));
+    }
+    scene.version = delta.version;
+}
+
+function syncScene() {
+    const query = scene.version === null ? '' : `?since=${scene.version}`;
+    return fetch(`/get-scene${query}`)
+        .then(response => response.json())
+        .then(applySceneDelta)
+        .catch(error => console.error('Error syncing scene:', error));
+}
+
+function postSceneAction(url, body) {
+    const status = document.getElementById('status-message');
+    // The resulting delta arrives over Socket.IO; the reply only carries the status message
+    return fetch(url, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(body || {}) })
+        .then(response => response.json())
+        .then(data => { status.textContent = data.message || ''; })
+        .catch(error => { status.textContent = `Error: ${error}`; });
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const input = document.getElementById('command-input');
+    document.getElementById('submit-command').addEventListener('click', () => {
+        if (input.value.trim()) postSceneAction('/update-plan', { command: input.value.trim() });
+    });
+    document.getElementById('undo-button').addEventListener('click', () => postSceneAction('/history/undo'));
+    document.getElementById('redo-button').addEventListener('click', () => postSceneAction('/history/redo'));
+    document.getElementById('reset-button').addEventListener('click', () => postSceneAction('/history/reset'));
+});
+
 function draw() {
     background(250);
 
@@ -0,0 +1,127 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+# --- Configuration ---
+# Fingerprints everything under frontend/static into frontend/static/dist:
+#   images/home/bg_texture.png -> dist/images/home/bg_texture.<hash>.png
+# Text assets also get .gz (and .br when the `brotli` package is installed)
+# siblings, and with --webp large PNGs get a resized WebP variant (needs
+# Pillow). dist/manifest.json maps original names to the built files; the
+# server (backend/assets.py) uses it to emit hashed URLs served as immutable.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATIC_DIR = os.path.join(PROJECT_ROOT, 'frontend', 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+
+SKIP_DIRS = {'dist', '3d_client', '3d_data'}  # 3D assets have their own routes
+TEXT_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.html', '.geojson', '.txt'}
+MIN_COMPRESS_BYTES = 1024
+HASH_LENGTH = 12
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(relative_path, digest, extension=None):
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest}{extension or ext}"
+
+
+def compress_text(source, target):
+    """Writes target.gz (and target.br if brotli is available); returns the encodings written."""
+    with open(source, 'rb') as f:
+        data = f.read()
+    if len(data) < MIN_COMPRESS_BYTES:
+        return []
+    encodings = []
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        with open(target + '.gz', 'wb') as f:
+            f.write(gz)
+        encodings.append('gzip')
+    try:
+        import brotli
+    except ImportError:
+        return encodings
+    br = brotli.compress(data, quality=11)
+    if len(br) < len(data):
+        with open(target + '.br', 'wb') as f:
+            f.write(br)
+        encodings.append('br')
+    return encodings
+
+
+def convert_webp(source, target, max_width, quality):
+    from PIL import Image
+    with Image.open(source) as image:
+        if image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+        image.save(target, 'WEBP', quality=quality, method=6)
+
+
+def build(webp=False, max_width=1600, quality=82, webp_min_bytes=200_000):
+    if webp:
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            print("Pillow is not installed; skipping WebP variants (pip install Pillow).")
+            webp = False
+
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    manifest = {}
+    original_bytes = built_bytes = 0
+
+    for directory, subdirs, files in os.walk(STATIC_DIR):
+        relative_dir = os.path.relpath(directory, STATIC_DIR)
+        if relative_dir == '.':
+            subdirs[:] = [d for d in subdirs if d not in SKIP_DIRS]
+        for filename in sorted(files):
+            source = os.path.join(directory, filename)
+            relative_path = os.path.normpath(os.path.join(relative_dir, filename)).replace(os.sep, '/')
+            digest = content_hash(source)
+            entry = {'path': hashed_name(relative_path, digest)}
+
+            target = os.path.join(DIST_DIR, entry['path'])
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+            size = os.path.getsize(source)
+            original_bytes += size
+            built_bytes += size
+
+            ext = os.path.splitext(filename)[1].lower()
+            if ext in TEXT_EXTENSIONS:
+                entry['encodings'] = compress_text(source, target)
+            elif webp and ext == '.png' and size >= webp_min_bytes:
+                entry['webp'] = hashed_name(relative_path, digest, '.webp')
+                convert_webp(source, os.path.join(DIST_DIR, entry['webp']), max_width, quality)
+                webp_size = os.path.getsize(os.path.join(DIST_DIR, entry['webp']))
+                print(f"  {relative_path}: {size // 1024} KB -> {webp_size // 1024} KB WebP")
+            manifest[relative_path] = entry
+
+    with open(os.path.join(DIST_DIR, 'manifest.json'), 'w') as f:
+        json.dump({'version': 1, 'assets': manifest}, f, indent=1, sort_keys=True)
+    print(f"Built {len(manifest)} assets into {os.path.relpath(DIST_DIR, PROJECT_ROOT)} "
+          f"({original_bytes / 1e6:.1f} MB of sources).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fingerprint and pre-compress frontend/static into frontend/static/dist.")
+    parser.add_argument('--webp', action='store_true', help="Also write resized WebP variants of large PNGs (requires Pillow)")
+    parser.add_argument('--max-width', type=int, default=1600, help="Maximum WebP width in pixels")
+    parser.add_argument('--quality', type=int, default=82, help="WebP quality (0-100)")
+    args = parser.parse_args()
+    build(webp=args.webp, max_width=args.max_width, quality=args.quality)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# --- Configuration ---
+# Measures how long `import server` takes in a fresh interpreter (what a new
+# worker pays before it can serve), using python -X importtime.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BACKEND_DIR = os.path.join(PROJECT_ROOT, 'backend')
+
+
+def profile_import(module):
+    """Returns {module_name: (self_us, cumulative_us)} for one cold import."""
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, LLM_PROVIDER=os.environ.get('LLM_PROVIDER', 'mock'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True)
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the backend server module.")
+    parser.add_argument('--module', default='server')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="Slowest top-level imports to list")
+    args = parser.parse_args()
+
+    totals = []
+    timings = {}
+    for _ in range(args.runs):
+        timings = profile_import(args.module)
+        totals.append(timings[args.module][1] / 1000)
+
+    print(f"import {args.module}: median {statistics.median(totals):.1f} ms "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}, {args.runs} runs)")
+    print(f"\nSlowest imports (cumulative ms, last run):")
+    slowest = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (_, cumulative_us) in slowest[1:args.top + 1]:
+        print(f"  {cumulative_us / 1000:8.1f}  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+# --- Configuration ---
+# Replays a logged game (.flask_session/games/<game_id>.log.jsonl) through
+# the server with the recorded NPC replies (see backend/game_replay.py).
+# Exits non-zero if the replayed state diverges from the log, so it can gate
+# changes to game logic; --runs > 1 repeats the replay for timing.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BACKEND_DIR = os.path.join(PROJECT_ROOT, 'backend')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic replay of a logged game.")
+    parser.add_argument('game', help="Game id, or path to a <game_id>.log.jsonl file")
+    parser.add_argument('--games-dir', default=os.path.join(PROJECT_ROOT, '.flask_session', 'games'))
+    parser.add_argument('--runs', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="Print the full report of the last run as JSON")
+    args = parser.parse_args()
+
+    log_path = args.game if args.game.endswith('.jsonl') else os.path.join(args.games_dir, f"{args.game}.log.jsonl")
+    log_path = os.path.abspath(log_path)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['SPECULATIVE_DRAFTS'] = '0'
+    os.chdir(PROJECT_ROOT)  # Scenario files are loaded relative to the project root
+    sys.path.insert(0, BACKEND_DIR)
+    import server
+    from characters import PROFILE_STORE
+    from game_actor import GAMES
+    from game_log import read_records
+    from game_replay import replay_game
+
+    records = list(read_records(log_path))
+    if not records:
+        sys.exit(f"No log records in {log_path}")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Replayed games are throwaway; keep them out of the real game directory
+        GAMES.directory = os.path.join(scratch, 'games')
+        PROFILE_STORE.directory = os.path.join(scratch, 'profiles')
+        reports = [replay_game(server.app, records) for _ in range(args.runs)]
+        GAMES.flush()
+
+    report = reports[-1]
+    if args.json:
+        print(json.dumps(report, indent=1))
+    replayed = sorted(r['replayed_ms'] for r in reports)
+    print(f"{report['commands']} commands; recorded {report['recorded_ms']:.0f} ms, "
+          f"replayed median {replayed[len(replayed) // 2]:.0f} ms over {args.runs} run(s)")
+    if report['diverged_at'] is not None:
+        step = next(s for s in report['steps'] if s['seq'] == report['diverged_at'])
+        print(f"DIVERGED at seq {step['seq']} ({step['command']}): {json.dumps(step['diff'])[:400]}")
+        sys.exit(1)
+    print("Replay matches the log.")
+
+
+if __name__ == '__main__':
+    main()